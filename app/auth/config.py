@@ -6,10 +6,15 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 天
 
+# 管理員 token（管理 API 與請求剖析用，未設定時停用）
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 # Google OAuth 配置
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 GOOGLE_DISCOVERY_URL = "https://accounts.google.com/.well-known/openid_configuration"
+# token 驗證端點，可用環境變數指向本機替身服務（壓測用）
+GOOGLE_TOKENINFO_URL = os.getenv("GOOGLE_TOKENINFO_URL", "https://oauth2.googleapis.com/tokeninfo")
 
 # 允許的來源 (CORS)
 ALLOWED_ORIGINS = [
@@ -1,32 +1,40 @@
+import hmac
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Union, Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from passlib.hash import bcrypt
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, status, Depends, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from auth.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
-from database import get_db
+from auth.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, ADMIN_TOKEN
+from database import get_read_db
 from models.auth_models import User
 
-# 密碼加密設定
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """密碼加密設定（passlib 與 bcrypt 在第一次驗證或產生密碼時才載入）"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # JWT Bearer Token 設定
 security = HTTPBearer()
+# 未登入也可呼叫的路由（缺少 token 時不回傳 403）
+optional_security = HTTPBearer(auto_error=False)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """驗證密碼"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """產生密碼雜湊"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """建立 JWT token"""
+    # jose 會一併載入 cryptography，延後到第一次使用時匯入
+    from jose import jwt
+    
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -39,15 +47,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 def verify_token(token: str) -> Optional[dict]:
     """驗證 JWT token"""
+    from jose import JWTError, jwt
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     """驗證使用者帳號密碼"""
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
     if not user or not user.password_hash:
         return None
     if not verify_password(password, user.password_hash):
@@ -56,7 +67,7 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> User:
     """取得當前認證的使用者"""
     token = credentials.credentials
@@ -75,7 +86,7 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
         
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = await db.get(User, int(user_id))
     if user is None:
         raise credentials_exception
         
@@ -87,4 +98,26 @@ async def get_current_active_user(
     """取得當前活躍的使用者"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="帳號未啟用")
-    return current_user
\ No newline at end of file
+    return current_user
+
+def get_optional_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> Optional[int]:
+    """未強制登入的路由：帶有效 token 時回傳使用者 id（只驗證 token，不查詢資料庫），否則為 None"""
+    if credentials is None:
+        return None
+    payload = verify_token(credentials.credentials)
+    if payload is None or payload.get("sub") is None:
+        return None
+    return int(payload["sub"])
+
+def verify_admin_token(token: Optional[str]) -> bool:
+    """驗證管理員 token（未設定 ADMIN_TOKEN 時一律拒絕）"""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """管理 API 需帶上 `X-Admin-Token` 標頭"""
+    if not verify_admin_token(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="需要管理員權限")
\ No newline at end of file
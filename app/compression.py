@@ -0,0 +1,158 @@
+import os
+import zlib
+from typing import Optional, Dict, List
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 壓縮設定
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_CONTENT_TYPES = [
+    content_type.strip()
+    for content_type in os.getenv(
+        "COMPRESSION_CONTENT_TYPES",
+        "application/json,application/x-ndjson,text/csv,text/plain,text/html"
+    ).split(",")
+    if content_type.strip()
+]
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# brotli 品質 11 對動態內容太慢，4–5 的壓縮率已接近 gzip 9 且速度較快
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """依 Accept-Encoding 選擇 br 或 gzip（同權重時優先 br），都不接受時回傳 None"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    wildcard = weights.get("*", 0.0)
+    br = weights.get("br", wildcard)
+    gzip = weights.get("gzip", wildcard)
+    if br > 0 and br >= gzip:
+        return "br"
+    if gzip > 0:
+        return "gzip"
+    return None
+
+class StreamCompressor:
+    """逐段壓縮；每段都會 flush，串流回應不需等待完整內容"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31：輸出 gzip 格式（含標頭與 CRC）
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            output = self.compressor.process(data)
+            return output + (self.compressor.finish() if final else self.compressor.flush())
+        output = self.compressor.compress(data)
+        return output + self.compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """
+    依 Accept-Encoding 以 brotli 或 gzip 壓縮回應
+
+    只壓縮允許清單中的內容類型；完整回應小於門檻時不壓縮。串流回應逐段壓縮，
+    不會把整個內容暫存在記憶體中（已知長度且小於門檻時同樣略過）
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        content_types: Optional[List[str]] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = content_types or COMPRESSION_CONTENT_TYPES
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await CompressionResponder(self, encoding, send)(scope, receive)
+
+    def should_compress(self, headers: Headers) -> bool:
+        """依回應標頭判斷是否可能壓縮（內容類型、是否已編碼、已知長度）"""
+        if "content-encoding" in headers:
+            return False
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if media_type not in self.content_types:
+            return False
+        content_length = headers.get("content-length")
+        return content_length is None or int(content_length) >= self.minimum_size
+
+class CompressionResponder:
+    """包裝單一請求的 send：延後送出回應標頭，等看到第一段內容再決定是否壓縮"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive):
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            self.passthrough = not self.middleware.should_compress(Headers(raw=message["headers"]))
+            if self.passthrough:
+                await self.send(message)
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            # 第一段內容：完整回應太小就直接送出
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = StreamCompressor(self.encoding)
+            headers = MutableHeaders(scope=self.start_message)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            compressed = self.compressor.compress(body, final=not more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(compressed))
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            return
+
+        await self.send({
+            "type": "http.response.body",
+            "body": self.compressor.compress(body, final=not more_body),
+            "more_body": more_body,
+        })
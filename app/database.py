@@ -1,27 +1,159 @@
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from databases import Database
+import asyncio
+import os
+import zlib
+from sqlalchemy import event, make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
 
-# SQLite 資料庫檔案路徑
-DATABASE_URL = "sqlite:///./kolog.db"
+try:
+    import fcntl
+except ImportError:  # Windows 不支援多 worker，略過初始化鎖
+    fcntl = None
 
-# SQLAlchemy 引擎
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# 資料庫連接字串（預設使用 aiosqlite 異步驅動的 SQLite 檔案）
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./kolog.db")
 
-# 會話工廠
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# SQLite 效能設定（僅在 SQLite 資料庫時套用）
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # 256 MB
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # 負數代表 KiB，約 64 MB
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+# 連線池設定：單一寫入連線、多個讀取連線
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+def _sqlite_pragmas(read_only: bool):
+    """建立連線時套用的 SQLite PRAGMA 設定"""
+    pragmas = [
+        f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+        f"PRAGMA temp_store={SQLITE_TEMP_STORE}",
+    ]
+    if read_only:
+        # 讀取連線禁止寫入，避免誤用造成寫鎖競爭
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+def _create_engine(pool_size: int, read_only: bool = False):
+    """建立異步引擎並註冊 SQLite 連線設定"""
+    new_engine = create_async_engine(
+        DATABASE_URL,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+
+    if IS_SQLITE:
+        pragmas = _sqlite_pragmas(read_only)
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return new_engine
+
+# SQLAlchemy 異步引擎：寫入端只有一條連線，由連線池在行程內排隊，避免 "database is locked"
+write_engine = _create_engine(pool_size=1)
+read_engine = _create_engine(pool_size=DB_READ_POOL_SIZE, read_only=IS_SQLITE)
+
+# 異步會話工廠（commit 後不讓物件過期，避免在回應序列化時觸發延遲載入）
+WriteSessionLocal = async_sessionmaker(write_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # Base 模型
 Base = declarative_base()
 
-# 異步資料庫連接（用於 FastAPI）
-database = Database(DATABASE_URL)
+def _create_missing_indexes(conn):
+    """
+    為既有資料表補建新增的索引（create_all 不會修改已存在的表格）
 
-# Dependency 函式
-def get_db():
-    db = SessionLocal()
+    唯一索引需先由 after_create 遷移清除重複資料；仍有重複時指出索引與欄位後停止啟動
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(conn, checkfirst=True)
+            except IntegrityError as e:
+                columns = ", ".join(column.name for column in index.columns)
+                raise RuntimeError(
+                    f"無法建立唯一索引 {index.name}：資料表 {table.name} 有重複的 ({columns})，"
+                    "請先合併或刪除重複的資料列後再啟動"
+                ) from e
+
+def _schema_fingerprint(conn) -> int:
+    """所有資料表與索引 DDL 的 CRC32（存入 SQLite 的 user_version，需為 31 位元正整數）"""
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        statements.append(str(CreateTable(table).compile(dialect=conn.dialect)))
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            statements.append(str(CreateIndex(index).compile(dialect=conn.dialect)))
+    return zlib.crc32("\n".join(statements).encode()) & 0x7FFFFFFF
+
+def _create_schema(conn) -> bool:
+    """schema 與上次建立時不同才執行 create_all 與補建索引，回傳是否有執行"""
+    fingerprint = _schema_fingerprint(conn)
+    if IS_SQLITE and conn.exec_driver_sql("PRAGMA user_version").scalar() == fingerprint:
+        return False
+    Base.metadata.create_all(conn)
+    _create_missing_indexes(conn)
+    if IS_SQLITE:
+        conn.exec_driver_sql(f"PRAGMA user_version = {fingerprint}")
+    return True
+
+def _init_lock_path():
+    """SQLite 資料庫檔案旁的初始化鎖（記憶體資料庫與其他資料庫不需要）"""
+    if not IS_SQLITE or fcntl is None:
+        return None
+    database = make_url(DATABASE_URL).database
+    if not database or database == ":memory:" or database.startswith("file:"):
+        return None
+    return f"{database}.init.lock"
+
+async def init_db() -> bool:
+    """
+    建立資料庫表格（於應用啟動時執行）
+
+    多個 worker 同時啟動時以檔案鎖排隊，第一個 worker 建立 schema 後，其餘 worker 比對 user_version
+    即略過，不會同時執行 DDL（兩個行程同時 create_all 會遇到 "table already exists"）
+    """
+    lock_path = _init_lock_path()
+    lock_file = open(lock_path, "a") if lock_path else None
     try:
-        yield db
+        if lock_file is not None:
+            # 等待鎖時不阻塞事件迴圈
+            await asyncio.to_thread(fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+        async with write_engine.begin() as conn:
+            return await conn.run_sync(_create_schema)
     finally:
-        db.close()
\ No newline at end of file
+        if lock_file is not None:
+            # 關閉檔案即釋放鎖
+            lock_file.close()
+
+async def close_db():
+    """釋放所有資料庫連線（於應用關閉時執行）"""
+    await write_engine.dispose()
+    await read_engine.dispose()
+
+# Dependency 函式
+async def get_db():
+    """寫入用的資料庫會話"""
+    async with WriteSessionLocal() as db:
+        yield db
+
+async def get_read_db():
+    """唯讀的資料庫會話"""
+    async with ReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, Set, TypeVar
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from metrics import REQUEST_CANCELLATIONS
+
+# 各類路由的處理時限（秒），包含所有外部服務呼叫
+DEADLINE_AI = float(os.getenv("DEADLINE_AI", "45"))
+DEADLINE_UPSTREAM = float(os.getenv("DEADLINE_UPSTREAM", "20"))
+
+# 服務本身會依剩餘時間設定逾時；超過時限後再等這麼久仍未完成才強制中止
+DEADLINE_GRACE = 1.0
+
+# 設有時限的路由；其餘路由不經過此中介層
+ROUTE_DEADLINES = {
+    "/api/v1/analysis/gemini": DEADLINE_AI,
+    "/api/v1/youtube/transcript": DEADLINE_UPSTREAM,
+    "/api/v1/youtube/metadata": DEADLINE_UPSTREAM,
+}
+
+# 取消原因（task.cancel 的訊息，UpstreamCall 以此區分浪費的外部呼叫）
+CANCEL_DISCONNECT = "client_disconnect"
+CANCEL_DEADLINE = "deadline"
+
+# 目前請求的截止時間（time.monotonic），None 表示不限
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+# 脫離請求繼續執行的工作（保留參照，避免執行中被回收）
+_detached: Set[asyncio.Task] = set()
+
+T = TypeVar("T")
+
+def time_left(default: float) -> float:
+    """
+    外部呼叫可用的逾時秒數：不超過 default，也不超過目前請求剩餘的時間
+
+    已超過時限時丟出 504；可在工作執行緒中呼叫（asyncio.to_thread 會複製 context）
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise HTTPException(status_code=504, detail="處理逾時，請稍後再試")
+    return min(default, remaining)
+
+async def detached(awaitable: Awaitable[T]) -> T:
+    """
+    執行結果會寫入共用快取的工作：用戶端中斷連線時不取消，讓結果仍可供之後的請求使用
+
+    截止時間仍然有效（context 會一併帶入）
+    """
+    task = asyncio.ensure_future(awaitable)
+    _detached.add(task)
+    task.add_done_callback(_forget)
+    return await asyncio.shield(task)
+
+def _forget(task: asyncio.Task):
+    _detached.discard(task)
+    # 呼叫端已離開時沒有人取得結果，讀取例外避免 "exception was never retrieved" 警告
+    if not task.cancelled():
+        task.exception()
+
+class DeadlineMiddleware:
+    """
+    為昂貴路由設定處理時限，並在用戶端中斷連線時取消處理中的工作（含進行中的外部呼叫）
+
+    請求本文先完整讀入，之後由背景等待 http.disconnect；路由若仍在等待外部服務，
+    以 task.cancel 中止，httpx 會關閉連線，不再等待回應
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        budget = ROUTE_DEADLINES.get(scope["path"].rstrip("/")) if scope["type"] == "http" else None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        # 先讀完本文，之後的 receive 只會收到中斷連線
+        messages = []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] == "http.disconnect" or not message.get("more_body", False):
+                break
+        if messages[-1]["type"] == "http.disconnect":
+            REQUEST_CANCELLATIONS.inc((scope["path"], CANCEL_DISCONNECT))
+            return
+
+        disconnected = asyncio.Event()
+
+        async def replay_receive() -> Message:
+            if messages:
+                return messages.pop(0)
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        response_started = False
+        response_complete = False
+
+        async def send_wrapper(message: Message):
+            nonlocal response_started, response_complete
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        token = _deadline.set(time.monotonic() + budget)
+        try:
+            app_task = asyncio.create_task(self.app(scope, replay_receive, send_wrapper))
+        finally:
+            _deadline.reset(token)
+        disconnect_task = asyncio.create_task(receive())
+
+        try:
+            done, _ = await asyncio.wait(
+                {app_task, disconnect_task}, timeout=budget + DEADLINE_GRACE, return_when=asyncio.FIRST_COMPLETED
+            )
+            if app_task in done or response_complete:
+                # 回應送完後伺服器也會回報 http.disconnect，此時路由可能還在清理相依項（例如關閉資料庫 session），不取消
+                await app_task
+                return
+
+            reason = CANCEL_DISCONNECT if disconnect_task in done else CANCEL_DEADLINE
+            REQUEST_CANCELLATIONS.inc((scope["path"], reason))
+            if reason == CANCEL_DISCONNECT:
+                disconnected.set()
+                scope["client_disconnected"] = True
+            app_task.cancel(reason)
+            try:
+                await app_task
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+            if reason == CANCEL_DEADLINE and not response_started:
+                response = JSONResponse({"error": "處理逾時，請稍後再試", "success": False}, status_code=504)
+                await response(scope, replay_receive, send)
+        finally:
+            disconnect_task.cancel()
+            if not app_task.done():
+                # 中介層本身被取消（例如伺服器關閉）時一併取消路由
+                app_task.cancel()
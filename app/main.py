@@ -1,11 +1,46 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import uvicorn
+from fastapi.responses import JSONResponse, ORJSONResponse
 
-from database import engine, Base
-from models import auth_models
-from routers import transcript, analysis, metadata, auth, user_stocks
+from database import init_db, close_db, write_engine, read_engine
+from shared_state import shared_store
+from compression import CompressionMiddleware
+from quota import QuotaMiddleware, QUOTA_ENABLED
+from deadline import DeadlineMiddleware
+from metrics import MetricsMiddleware, instrument_engine, monitor_event_loop, render_metrics
+from profiling import ProfilingMiddleware, profiling_enabled
+from models import auth_models, analysis_models, market_models
+from routers import transcript, analysis, metadata, auth, user_stocks, mentions, leaderboard, search, admin
+from services.channel_watcher_service import ChannelWatcherService, run_channel_watcher
+from services.ticker_service import TickerService
+from services.usage_service import UsageService, run_usage_writer
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """應用啟動與關閉流程"""
+    # 建立資料庫表格（多 worker 時只有第一個 worker 會執行）
+    await init_db()
+    # 代號資料檔以 mmap 開啟，內容由作業系統依需要讀入，各 worker 共用同一份頁面快取
+    TickerService.load()
+    loop_monitor = asyncio.create_task(monitor_event_loop())
+    # 預先抓取與分析監看頻道的新影片（未設定 WATCH_CHANNELS 時不啟動）
+    watcher = asyncio.create_task(run_channel_watcher()) if ChannelWatcherService.enabled() else None
+    # Gemini 呼叫紀錄在背景批次寫入
+    usage_writer = asyncio.create_task(run_usage_writer())
+    yield
+    loop_monitor.cancel()
+    if watcher is not None:
+        watcher.cancel()
+    usage_writer.cancel()
+    await UsageService.flush()
+    await close_db()
+    shared_store.close()
+
+# SQL 執行時間指標
+instrument_engine(write_engine.sync_engine, "write")
+instrument_engine(read_engine.sync_engine, "read")
 
 # 建立 FastAPI 應用
 app = FastAPI(
@@ -13,9 +48,19 @@ app = FastAPI(
     description="獨立的 Python 後端，提供 YouTube 影片分析和逐字稿服務",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    # 未直接回傳 ModelResponse 的路由仍經 response_model 驗證，輸出改用 orjson
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
+# 昂貴路由的處理時限，用戶端中斷連線時取消進行中的外部呼叫（在配額檢查之內，被拒絕的請求不會進來）
+app.add_middleware(DeadlineMiddleware)
+
+# 昂貴路由的請求配額（加在 CORS 之前，429 回應也會帶上 CORS 標頭）
+if QUOTA_ENABLED:
+    app.add_middleware(QuotaMiddleware)
+
 # CORS 配置
 app.add_middleware(
     CORSMiddleware,
@@ -26,14 +71,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    # 讓前端讀得到分頁、快取驗證與配額標頭
+    expose_headers=[
+        "ETag", "X-Next-After-Id",
+        "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy", "Retry-After",
+    ],
 )
 
-# 建立資料庫表格
-Base.metadata.create_all(bind=engine)
+# 回應壓縮（brotli / gzip），逐字稿與分析結果通常是數十 KB 的文字
+app.add_middleware(CompressionMiddleware)
+
+# 請求剖析（未設定 ADMIN_TOKEN 且 PROFILE_SAMPLE_RATE 為 0 時不掛載）
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
+# 路由延遲與狀態碼指標（最外層，包含壓縮時間）
+app.add_middleware(MetricsMiddleware)
 
 # 註冊路由
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
 app.include_router(user_stocks.router, prefix="/api/v1/user/stocks", tags=["user-stocks"])
+app.include_router(mentions.router, prefix="/api/v1/mentions", tags=["mentions"])
+app.include_router(leaderboard.router, prefix="/api/v1/leaderboard", tags=["leaderboard"])
+app.include_router(search.router, prefix="/api/v1/search", tags=["search"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 app.include_router(transcript.router, prefix="/api/v1", tags=["transcript"])
 app.include_router(analysis.router, prefix="/api/v1", tags=["analysis"])
 app.include_router(metadata.router, prefix="/api/v1", tags=["metadata"])
@@ -52,6 +113,11 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "youtube-analysis-api"}
 
+# Prometheus 指標
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # 全域異常處理
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -72,6 +138,8 @@ async def general_exception_handler(request, exc):
     )
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -0,0 +1,295 @@
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 事件迴圈延遲的取樣間隔（秒）
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.5"))
+
+# 延遲直方圖的區間上限（秒）
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# 所有指標（依註冊順序輸出）
+REGISTRY: List["Metric"] = []
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    """組出 Prometheus 標籤字串，例如 {method="GET",route="/"}"""
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    """
+    指標基底類別
+
+    指標只在事件迴圈執行緒上更新，不加鎖；每組標籤值第一次出現時建立一筆資料，
+    之後的更新只是就地累加
+    """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return lines
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labelvalues: Tuple[str, ...] = (), amount: float = 1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in self.values.items()
+        ]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, labelvalues: Tuple[str, ...] = ()):
+        self.values[labelvalues] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # 每組標籤：[各區間次數..., +Inf 區間次數, 總和]（區間次數不累計，輸出時才累加）
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, labelvalues: Tuple[str, ...] = ()):
+        counts = self.values.get(labelvalues)
+        if counts is None:
+            counts = self.values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, counts in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {counts[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+def render_metrics() -> str:
+    """以 Prometheus 文字格式輸出所有指標"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# 路由
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP 請求處理時間", ("method", "route")
+)
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP 請求數（依狀態碼）", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "處理中的 HTTP 請求數"
+)
+
+# 配額（outcome: allowed / throttled / error）
+QUOTA_DECISIONS = Counter(
+    "quota_decisions_total", "配額檢查結果（error 表示共用儲存失敗、直接放行）", ("route_class", "outcome")
+)
+
+# 外部服務
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds", "外部服務呼叫時間（outcome: ok / http_4xx / http_5xx / error / cancelled）",
+    ("upstream", "outcome")
+)
+
+# 被取消的請求與浪費的外部呼叫（reason: client_disconnect / deadline）
+REQUEST_CANCELLATIONS = Counter(
+    "http_request_cancellations_total", "因用戶端中斷連線或超過時限而中止的請求數", ("route", "reason")
+)
+UPSTREAM_CANCELLED = Counter(
+    "upstream_cancelled_total", "進行中被取消、結果不會被使用的外部服務呼叫數", ("upstream", "reason")
+)
+
+# Gemini 用量
+GEMINI_TOKENS = Counter(
+    "gemini_tokens_total", "Gemini 使用的 token 數（kind: prompt / output / cached）", ("kind",)
+)
+USAGE_RECORDS = Counter(
+    "model_usage_records_total", "模型呼叫紀錄的寫入結果（result: written / retry / dropped）", ("result",)
+)
+
+# 分析結果重複使用
+ANALYSIS_REUSE = Counter(
+    "analysis_reuse_total", "分析請求的快取結果（outcome: exact / similar / miss）", ("outcome",)
+)
+
+# 股票代號驗證
+TICKER_UNIVERSE_SYMBOLS = Gauge(
+    "ticker_universe_symbols", "代號資料檔中的代號數（0 表示未載入，只檢查代號格式）"
+)
+TICKER_VALIDATION = Counter(
+    "ticker_validation_total", "Gemini 回傳代號的驗證結果（outcome: valid / normalized / alias / rejected）", ("outcome",)
+)
+
+# 頻道監看
+WATCHER_POLLS = Counter(
+    "channel_watcher_polls_total", "頻道上傳清單輪詢次數（result: modified / not_modified / error）", ("result",)
+)
+WATCHER_VIDEOS = Counter(
+    "channel_watcher_videos_total", "預先處理的新影片數（outcome: analyzed / prefetched / failed）", ("outcome",)
+)
+
+# 資料庫
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL 執行時間", ("engine", "operation"), buckets=DB_BUCKETS
+)
+DB_ERRORS = Counter(
+    "db_errors_total", "SQL 執行錯誤數", ("engine",)
+)
+
+# 事件迴圈
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "事件迴圈排程延遲（實際喚醒時間與預期的差距）"
+)
+
+class MetricsMiddleware:
+    """記錄每個路由的處理時間與狀態碼；路由以路徑樣板為標籤（例如 /api/v1/user/stocks/{stock_id}）"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            HTTP_REQUESTS_IN_PROGRESS.inc(amount=-1)
+            route = scope.get("route")
+            if route is not None:
+                path = route.path
+            elif "endpoint" in scope:
+                # 非 APIRoute 的固定路徑（例如 /docs）
+                path = scope["path"]
+            else:
+                # 未匹配的路徑（掃描、404）合併為同一個標籤，避免標籤數量無限增長
+                path = "unmatched"
+            labels = (scope["method"], path)
+            if scope.get("client_disconnected"):
+                # 用戶端已中斷連線、沒有送出回應（同 nginx 的 499）
+                status_code = 499
+            HTTP_REQUEST_DURATION.observe(duration, labels)
+            HTTP_REQUESTS.inc(labels + (str(status_code),))
+
+class UpstreamCall:
+    """
+    量測一次外部服務呼叫
+
+    用法：
+        with UpstreamCall("gemini") as call:
+            response = await client.post(...)
+            call.status(response.status_code)
+    """
+    __slots__ = ("upstream", "outcome", "started")
+
+    def __init__(self, upstream: str):
+        self.upstream = upstream
+        self.outcome = "ok"
+        self.started = 0.0
+
+    def status(self, status_code: int):
+        if status_code >= 500:
+            self.outcome = "http_5xx"
+        elif status_code >= 400:
+            self.outcome = "http_4xx"
+
+    def __enter__(self) -> "UpstreamCall":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        if exc_type is not None and issubclass(exc_type, asyncio.CancelledError):
+            # 取消原因由 task.cancel(msg) 帶入（見 deadline.DeadlineMiddleware）
+            self.outcome = "cancelled"
+            UPSTREAM_CANCELLED.inc((self.upstream, exc.args[0] if exc and exc.args else "cancelled"))
+        elif exc_type is not None:
+            self.outcome = "error"
+        UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - self.started, (self.upstream, self.outcome))
+        return False
+
+def _operation(statement: str) -> str:
+    """SQL 的動作類型（只看開頭關鍵字，避免以整段 SQL 作為標籤）"""
+    for operation in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+        if statement.startswith(operation):
+            return operation
+    return "OTHER"
+
+def instrument_engine(engine: Engine, name: str):
+    """在同步引擎（AsyncEngine.sync_engine）上註冊 SQL 計時事件"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            DB_QUERY_DURATION.observe(time.perf_counter() - started, (name, _operation(statement)))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        DB_ERRORS.inc((name,))
+
+async def monitor_event_loop(interval: Optional[float] = None):
+    """定期量測事件迴圈延遲：sleep 實際花費的時間超出預期的部分即為延遲"""
+    interval = interval or EVENT_LOOP_LAG_INTERVAL
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - started - interval, 0.0))
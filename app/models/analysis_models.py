@@ -0,0 +1,278 @@
+import hashlib
+import sqlite3
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Index, LargeBinary, UniqueConstraint, DDL, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import func
+from database import Base
+
+def content_hash(content: str) -> str:
+    """分析內容的雜湊（analysis_blobs 的主鍵）"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+class AnalysisBlob(Base):
+    """影片分析 JSON，依內容雜湊去重：多筆追蹤股票引用同一份分析時只存一次"""
+    __tablename__ = "analysis_blobs"
+    __table_args__ = {'extend_existing': True}
+
+    hash = Column(String(64), primary_key=True)
+    content = Column(Text, nullable=False)
+    # 引用此分析的 user_stocks 筆數，降到 0 時刪除
+    ref_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class StockMention(Base):
+    """
+    從影片分析結果拆出的個股提及紀錄（StockAnalysis / MentionedCompany 各一列）
+
+    依分析內容（analysis_blobs）儲存：多位使用者追蹤同一份分析時只有一組提及，
+    分析第一次寫入時建立，引用數歸零時一併刪除
+    """
+    __tablename__ = "stock_mentions"
+    __table_args__ = (
+        # 同一份分析的第幾筆提及
+        UniqueConstraint("analysis_hash", "ordinal", name="uq_stock_mentions_analysis_ordinal"),
+        # 常見查詢：某股票在某段期間的看多 / 看空提及
+        Index("ix_stock_mentions_symbol_sentiment_date", "symbol", "sentiment", "mentioned_at"),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_hash = Column(String(64), ForeignKey("analysis_blobs.hash", ondelete="CASCADE"), nullable=False)
+    ordinal = Column(Integer, nullable=False)
+
+    # 來源影片
+    video_id = Column(String(20), nullable=True, index=True)
+    video_url = Column(String(500), nullable=True)
+
+    # 提及內容
+    source = Column(String(20), nullable=False)  # stock_analysis / mentioned_company
+    symbol = Column(String(20), nullable=True, index=True)  # MentionedCompany 沒有股票代號
+    company_name = Column(String(255), nullable=True)
+    sentiment = Column(String(10), nullable=True, index=True)
+    mention_type = Column(String(20), nullable=True, index=True)
+    confidence = Column(Integer, nullable=True, index=True)
+
+    # 影片發布日期（若分析資料未提供則使用分析時間）
+    mentioned_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class Video(Base):
+    """YouTube 影片資訊（頻道、發布時間），由元數據 API 寫入"""
+    __tablename__ = "videos"
+    __table_args__ = {'extend_existing': True}
+
+    video_id = Column(String(20), primary_key=True)
+    channel_id = Column(String(64), nullable=True, index=True)
+    channel_title = Column(String(255), nullable=True)
+    title = Column(String(500), nullable=True)
+    published_at = Column(DateTime(timezone=True), nullable=True, index=True)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class CallOutcome(Base):
+    """單一影片對單一股票的看多 / 看空判斷，在固定天數後的實際表現"""
+    __tablename__ = "call_outcomes"
+    __table_args__ = (
+        UniqueConstraint("video_id", "symbol", "horizon_days", name="uq_call_outcomes_video_symbol_horizon"),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(String(20), nullable=False)
+    symbol = Column(String(20), nullable=False)
+    horizon_days = Column(Integer, nullable=False)
+    channel_id = Column(String(64), nullable=False, index=True)
+
+    sentiment = Column(String(10), nullable=False)
+    confidence = Column(Integer, nullable=True)
+    published_at = Column(DateTime(timezone=True), nullable=False)
+
+    entry_price = Column(Float, nullable=False)
+    exit_price = Column(Float, nullable=False)
+    stock_return = Column(Float, nullable=False)
+    benchmark_return = Column(Float, nullable=True)
+    # 依判斷方向調整後的報酬（看空時取負值）
+    call_return = Column(Float, nullable=False)
+    excess_return = Column(Float, nullable=True)
+    hit = Column(Boolean, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ChannelScore(Base):
+    """頻道在某個觀察天數下的累積準確度（預先計算的排行榜）"""
+    __tablename__ = "channel_scores"
+    __table_args__ = (
+        Index("ix_channel_scores_horizon_hit_rate", "horizon_days", "hit_rate"),
+        Index("ix_channel_scores_horizon_excess", "horizon_days", "avg_excess_return"),
+        {'extend_existing': True},
+    )
+
+    channel_id = Column(String(64), primary_key=True)
+    horizon_days = Column(Integer, primary_key=True)
+    channel_title = Column(String(255), nullable=True)
+
+    calls = Column(Integer, nullable=False, default=0)
+    hits = Column(Integer, nullable=False, default=0)
+    sum_return = Column(Float, nullable=False, default=0.0)
+    excess_calls = Column(Integer, nullable=False, default=0)
+    sum_excess_return = Column(Float, nullable=False, default=0.0)
+
+    hit_rate = Column(Float, nullable=True)
+    avg_return = Column(Float, nullable=True)
+    avg_excess_return = Column(Float, nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ModelCall(Base):
+    """每次呼叫 Gemini 的 token 用量、延遲與結果（由 UsageService 在背景批次寫入）"""
+    __tablename__ = "model_calls"
+    __table_args__ = (
+        # 依使用者 / API key 彙總時多半會限定期間
+        Index("ix_model_calls_user_created", "user_id", "created_at"),
+        Index("ix_model_calls_api_key_created", "api_key_hash", "created_at"),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    model = Column(String(64), nullable=False)
+    prompt_version = Column(String(16), nullable=False)
+    source = Column(String(20), nullable=False)  # request / watcher
+    outcome = Column(String(20), nullable=False, index=True)  # ok / http_4xx / http_5xx / invalid_response / timeout / cancelled / error
+    latency_ms = Column(Float, nullable=False)
+
+    # Gemini usageMetadata；呼叫失敗時為空
+    prompt_tokens = Column(Integer, nullable=True)
+    output_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)
+    total_tokens = Column(Integer, nullable=True)
+
+    # 呼叫者：登入的使用者與 Gemini API key 的雜湊（不保存原始 key）
+    user_id = Column(Integer, nullable=True)
+    api_key_hash = Column(String(32), nullable=True)
+
+    # 分析的內容
+    transcript_hash = Column(String(64), nullable=False)
+    transcript_chars = Column(Integer, nullable=False)
+    video_url = Column(String(500), nullable=True)
+
+class Transcript(Base):
+    """影片逐字稿：全文與各段的開始秒數、在全文中的起始位置（little-endian float32 / uint32 陣列）"""
+    __tablename__ = "transcripts"
+    __table_args__ = {'extend_existing': True}
+
+    video_id = Column(String(20), primary_key=True)
+    language = Column(String(20), nullable=True)
+    text = Column(Text, nullable=False)
+    starts = Column(LargeBinary, nullable=False)
+    offsets = Column(LargeBinary, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class SearchDocument(Base):
+    """全文搜尋文件：每支影片一筆，id 即 search_index（FTS5）的 rowid"""
+    __tablename__ = "search_documents"
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True)
+    video_id = Column(String(20), nullable=False, unique=True)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# FTS5 全文索引（SQLAlchemy 無法以 Column 描述虛擬表，於建立資料表時一併建立）
+SEARCH_INDEX_COLUMNS = ["title", "transcript", "summary", "reasoning", "key_points", "context_quote"]
+
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        + ", ".join(SEARCH_INDEX_COLUMNS)
+        + ", tokenize='unicode61 remove_diacritics 2')"
+    ).execute_if(dialect="sqlite"),
+)
+
+
+# 舊版 schema 遷移批次大小
+MIGRATION_BATCH_SIZE = 1000
+
+def _collapse_inline_analyses(target, connection, **kw):
+    """
+    舊版 user_stocks.youtube_analysis 直接存放分析 JSON：補上 analysis_hash 欄位，
+    相同內容合併為一筆 analysis_blobs，最後移除舊欄位（create_all 不會修改已存在的表格）
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(user_stocks)")}
+    if "youtube_analysis" not in columns:
+        return
+    if "analysis_hash" not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE user_stocks ADD COLUMN analysis_hash VARCHAR(64) REFERENCES analysis_blobs (hash)"
+        )
+
+    last_id = 0
+    while True:
+        rows = connection.exec_driver_sql(
+            "SELECT id, youtube_analysis FROM user_stocks "
+            "WHERE id > ? AND youtube_analysis IS NOT NULL AND analysis_hash IS NULL ORDER BY id LIMIT ?",
+            (last_id, MIGRATION_BATCH_SIZE),
+        ).all()
+        if not rows:
+            break
+        blobs = {}
+        for _, content in rows:
+            blob = blobs.setdefault(content_hash(content), [content, 0])
+            blob[1] += 1
+        connection.exec_driver_sql(
+            "INSERT INTO analysis_blobs (hash, content, ref_count) VALUES (?, ?, ?) "
+            "ON CONFLICT (hash) DO UPDATE SET ref_count = ref_count + excluded.ref_count",
+            [(digest, content, count) for digest, (content, count) in blobs.items()],
+        )
+        connection.exec_driver_sql(
+            "UPDATE user_stocks SET analysis_hash = ? WHERE id = ?",
+            [(content_hash(content), stock_id) for stock_id, content in rows],
+        )
+        last_id = rows[-1][0]
+
+    # SQLite 3.35 起支援 DROP COLUMN；較舊的版本清空舊欄位，釋出的頁面之後會重複使用
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        connection.exec_driver_sql("ALTER TABLE user_stocks DROP COLUMN youtube_analysis")
+    else:
+        connection.exec_driver_sql("UPDATE user_stocks SET youtube_analysis = NULL")
+
+event.listen(Base.metadata, "after_create", _collapse_inline_analyses)
+
+def _rekey_stock_mentions(target, connection, **kw):
+    """
+    舊版 stock_mentions 以 user_stock_id 對應追蹤股票（同一份分析每位使用者各一組）：
+    重建為依 analysis_hash 儲存；提及紀錄為空時（新建或重建後）由 analysis_blobs 分批產生
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    from services.mention_service import MentionService
+
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(stock_mentions)")}
+    if "user_stock_id" in columns:
+        connection.exec_driver_sql("DROP TABLE stock_mentions")
+        StockMention.__table__.create(connection)
+    elif connection.exec_driver_sql("SELECT 1 FROM stock_mentions LIMIT 1").first() is not None:
+        return
+
+    last_hash = ""
+    while True:
+        blobs = connection.exec_driver_sql(
+            "SELECT hash, content FROM analysis_blobs WHERE hash > ? ORDER BY hash LIMIT ?",
+            (last_hash, MIGRATION_BATCH_SIZE),
+        ).all()
+        if not blobs:
+            break
+        rows = [row for digest, content in blobs for row in MentionService.mention_rows(digest, content)]
+        if rows:
+            connection.execute(sqlite_insert(StockMention.__table__).on_conflict_do_nothing(), rows)
+        last_hash = blobs[-1][0]
+
+event.listen(Base.metadata, "after_create", _rekey_stock_mentions)
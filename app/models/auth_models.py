@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean
-from sqlalchemy.orm import relationship
+from collections import Counter
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Index, event, insert, select
+from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.sql import func
 from database import Base
+from models.analysis_models import AnalysisBlob, MIGRATION_BATCH_SIZE
 
 class User(Base):
     __tablename__ = "users"
@@ -19,7 +21,13 @@ class User(Base):
 
 class UserStock(Base):
     __tablename__ = "user_stocks"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # 同一使用者不可重複追蹤同一支股票
+        Index("ix_user_stocks_user_id_symbol", "user_id", "symbol", unique=True),
+        # 追蹤清單依 id 分頁（keyset pagination）
+        Index("ix_user_stocks_user_id_id", "user_id", "id"),
+        {'extend_existing': True},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -34,13 +42,144 @@ class UserStock(Base):
     start_price = Column(Float, nullable=False)
     currency = Column(String(10), nullable=False)
     
-    # YouTube 分析資料（選填）
-    youtube_analysis = Column(Text, nullable=True)  # JSON 格式存儲
+    # YouTube 分析資料（選填）：內容存於 analysis_blobs，以雜湊引用
+    analysis_hash = Column(String(64), ForeignKey("analysis_blobs.hash"), nullable=True, index=True)
+    # 讀取時以子查詢取回 JSON 內容；寫入時需透過 AnalysisStoreService 設定 analysis_hash，
+    # 直接指定此屬性只影響記憶體中的物件（供同一請求內的提及與彙總計算使用），不會寫入資料庫
+    youtube_analysis = column_property(
+        select(AnalysisBlob.content)
+        .where(AnalysisBlob.hash == analysis_hash)
+        .correlate_except(AnalysisBlob)
+        .scalar_subquery(),
+        expire_on_flush=False,
+    )
     
     # 時間戳記
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+class PortfolioSummaryBucket(Base):
+    """使用者追蹤清單的彙總統計，由新增 / 更新 / 刪除時遞增維護"""
+    __tablename__ = "portfolio_summary_buckets"
+    __table_args__ = {'extend_existing': True}
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    dimension = Column(String(20), primary_key=True)  # stocks / currency / sentiment
+    key = Column(String(20), primary_key=True)  # 例如 USD、bullish；stocks 維度固定為 all
+    count = Column(Integer, nullable=False, default=0)
+    total_start_price = Column(Float, nullable=False, default=0.0)
+
+class UserDataVersion(Base):
+    """使用者資料版本號，追蹤清單或個人資料變更時遞增，用於 ETag 條件式請求"""
+    __tablename__ = "user_data_versions"
+    __table_args__ = {'extend_existing': True}
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
 # 在類別定義完成後設定關聯
 User.tracked_stocks = relationship("UserStock", back_populates="user", cascade="all, delete-orphan")
-UserStock.user = relationship("User", back_populates="tracked_stocks")
\ No newline at end of file
+UserStock.user = relationship("User", back_populates="tracked_stocks")
+
+def _merge_duplicate_stocks(target, connection, **kw):
+    """
+    建立 (user_id, symbol) 唯一索引前合併舊資料中重複追蹤的股票（否則建立索引時啟動失敗）：
+    保留最早的一筆（起始日期與價格），缺少的自訂名稱與分析取自較新的重複項目，其餘刪除並釋放分析引用，
+    受影響使用者的彙總重新計算、資料版本號加一
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    indexed = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_user_stocks_user_id_symbol'"
+    ).first()
+    if indexed is not None:
+        return
+    groups = connection.exec_driver_sql(
+        "SELECT user_id, symbol FROM user_stocks GROUP BY user_id, symbol HAVING COUNT(*) > 1"
+    ).all()
+    if not groups:
+        return
+
+    released: Counter = Counter()
+    removed_ids = []
+    for user_id, symbol in groups:
+        keeper, *duplicates = connection.exec_driver_sql(
+            "SELECT id, custom_name, analysis_hash FROM user_stocks WHERE user_id = ? AND symbol = ? ORDER BY id",
+            (user_id, symbol),
+        ).all()
+        newest_first = duplicates[::-1]
+        custom_name = keeper.custom_name or next((row.custom_name for row in newest_first if row.custom_name), None)
+        analysis_hash = keeper.analysis_hash
+        if analysis_hash is None:
+            analysis_hash = next((row.analysis_hash for row in newest_first if row.analysis_hash), None)
+            if analysis_hash is not None:
+                # 保留的項目接手這份分析的一個引用
+                released[analysis_hash] -= 1
+        released.update(row.analysis_hash for row in duplicates if row.analysis_hash)
+        connection.exec_driver_sql(
+            "UPDATE user_stocks SET custom_name = ?, analysis_hash = ? WHERE id = ?",
+            (custom_name, analysis_hash, keeper.id),
+        )
+        removed_ids.extend(row.id for row in duplicates)
+
+    for start in range(0, len(removed_ids), MIGRATION_BATCH_SIZE):
+        connection.exec_driver_sql(
+            "DELETE FROM user_stocks WHERE id = ?", [(stock_id,) for stock_id in removed_ids[start:start + MIGRATION_BATCH_SIZE]]
+        )
+    released = {digest: count for digest, count in released.items() if count > 0}
+    if released:
+        connection.exec_driver_sql(
+            "UPDATE analysis_blobs SET ref_count = ref_count - ? WHERE hash = ?",
+            [(count, digest) for digest, count in released.items()],
+        )
+        orphans = [
+            (digest,) for digest in released
+            if connection.exec_driver_sql("SELECT ref_count FROM analysis_blobs WHERE hash = ?", (digest,)).scalar() <= 0
+        ]
+        if orphans:
+            connection.exec_driver_sql("DELETE FROM stock_mentions WHERE analysis_hash = ?", orphans)
+            connection.exec_driver_sql("DELETE FROM analysis_blobs WHERE hash = ?", orphans)
+
+    user_ids = sorted({user_id for user_id, _ in groups})
+    _rebuild_summaries(connection, user_ids)
+    connection.exec_driver_sql(
+        "INSERT INTO user_data_versions (user_id, version) VALUES (?, 1) "
+        "ON CONFLICT (user_id) DO UPDATE SET version = version + 1",
+        [(user_id,) for user_id in user_ids],
+    )
+
+event.listen(Base.metadata, "after_create", _merge_duplicate_stocks)
+
+def _rebuild_summaries(connection, user_ids):
+    """由 user_stocks 重新計算使用者的彙總桶"""
+    from services.summary_service import SummaryService
+
+    for user_id in user_ids:
+        stocks = connection.exec_driver_sql(
+            "SELECT s.symbol, s.currency, s.start_price, b.content FROM user_stocks s "
+            "LEFT JOIN analysis_blobs b ON b.hash = s.analysis_hash WHERE s.user_id = ?",
+            (user_id,),
+        ).all()
+        connection.exec_driver_sql("DELETE FROM portfolio_summary_buckets WHERE user_id = ?", (user_id,))
+        rows = SummaryService.bucket_rows(user_id, [(1, SummaryService.buckets(*stock)) for stock in stocks])
+        if rows:
+            connection.execute(insert(PortfolioSummaryBucket.__table__), rows)
+
+def _backfill_summaries(target, connection, **kw):
+    """
+    有追蹤股票卻沒有彙總桶的使用者（彙總桶加入前就已存在的資料）補算彙總，
+    否則之後的遞增更新會從 0 開始累加、刪除時扣成負數
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    while True:
+        user_ids = connection.exec_driver_sql(
+            "SELECT DISTINCT user_id FROM user_stocks "
+            "WHERE user_id NOT IN (SELECT user_id FROM portfolio_summary_buckets) LIMIT ?",
+            (MIGRATION_BATCH_SIZE,),
+        ).scalars().all()
+        if not user_ids:
+            break
+        _rebuild_summaries(connection, user_ids)
+
+event.listen(Base.metadata, "after_create", _backfill_summaries)
\ No newline at end of file
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, UniqueConstraint
+from sqlalchemy.sql import func
+from database import Base
+
+class StockPrice(Base):
+    """個股每日收盤價（由價格來源定期更新）"""
+    __tablename__ = "stock_prices"
+    __table_args__ = (
+        UniqueConstraint("symbol", "date", name="uq_stock_prices_symbol_date"),
+        {'extend_existing': True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(20), nullable=False)
+    date = Column(Date, nullable=False)
+    close = Column(Float, nullable=False)
+    currency = Column(String(10), nullable=True)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
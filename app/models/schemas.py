@@ -1,6 +1,6 @@
 from pydantic import BaseModel, HttpUrl, Field, EmailStr
-from typing import List, Optional, Literal
-from datetime import datetime
+from typing import List, Optional, Literal, Dict
+from datetime import datetime, date
 
 # 基本回應模型
 class BaseResponse(BaseModel):
@@ -40,6 +40,7 @@ class YouTubeMetadata(BaseModel):
     published_at: str
     description: str
     channel_title: str
+    channel_id: Optional[str] = None
     thumbnails: YouTubeThumbnails
 
 class MetadataResponse(BaseResponse):
@@ -52,6 +53,7 @@ class AnalysisRequest(BaseModel):
     transcript: str = Field(..., description="影片逐字稿內容")
     api_key: str = Field(..., description="Google Gemini API Key")
     video_url: HttpUrl = Field(..., description="YouTube 影片 URL")
+    allow_similar: bool = Field(True, description="逐字稿與已分析的影片高度相似時直接沿用該分析；設為 false 強制重新分析")
 
 class StockAnalysis(BaseModel):
     symbol: str
@@ -63,12 +65,19 @@ class StockAnalysis(BaseModel):
     keyPoints: List[str] = Field(..., alias="key_points")
     identificationReason: Optional[str] = Field(None, alias="identification_reason")
     contextQuote: Optional[str] = Field(None, alias="context_quote")
+    # 引文在影片中的秒數與從該處播放的連結（找不到逐字稿分段或引文時為空）
+    quoteTimestamp: Optional[float] = Field(None, alias="quote_timestamp")
+    quoteUrl: Optional[str] = Field(None, alias="quote_url")
 
 class MentionedCompany(BaseModel):
     companyName: str = Field(..., alias="company_name")
+    # 公司名稱在代號資料檔中有對應的上市代號時填入
+    symbol: Optional[str] = None
     context: str
     mentionType: Optional[Literal["PRIMARY", "CASE_STUDY", "COMPARISON", "MENTION"]] = Field(None, alias="mention_type")
     confidence: int = Field(..., ge=0, le=100)
+    quoteTimestamp: Optional[float] = Field(None, alias="quote_timestamp")
+    quoteUrl: Optional[str] = Field(None, alias="quote_url")
 
 class GeminiAnalysisResult(BaseModel):
     videoTitle: Optional[str] = Field(None, alias="video_title")
@@ -79,8 +88,14 @@ class GeminiAnalysisResult(BaseModel):
     videoUrl: HttpUrl = Field(..., alias="video_url")
     analyzedAt: datetime = Field(..., alias="analyzed_at")
 
+class ReusedAnalysis(BaseModel):
+    """沿用的其他影片分析來源（相同或相似逐字稿）"""
+    videoUrl: str = Field(..., alias="video_url")
+    similarity: float
+
 class AnalysisResponse(BaseResponse):
     analysis: Optional[GeminiAnalysisResult] = None
+    reusedFrom: Optional[ReusedAnalysis] = Field(None, alias="reused_from")
     success: bool = True
 
 # 認證相關 schemas
@@ -122,6 +137,19 @@ class UserStockCreate(BaseModel):
     currency: str
     youtube_analysis: Optional[str] = None  # JSON 字串
 
+class UserStockListItem(BaseModel):
+    """追蹤清單項目（依 fields 參數只回傳部分欄位）"""
+    id: int
+    symbol: Optional[str] = None
+    company_name: Optional[str] = None
+    custom_name: Optional[str] = None
+    start_tracking_date: Optional[datetime] = None
+    start_price: Optional[float] = None
+    currency: Optional[str] = None
+    youtube_analysis: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class UserStockResponse(BaseModel):
     id: int
     symbol: str
@@ -134,5 +162,111 @@ class UserStockResponse(BaseModel):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+    class Config:
+        from_attributes = True
+
+class UserStockImportError(BaseModel):
+    row: int  # 檔案中的資料列編號（從 1 開始，不含 CSV 標題列）
+    symbol: Optional[str] = None
+    error: str
+
+class UserStockImportResponse(BaseResponse):
+    imported: int = 0
+    errors: List[UserStockImportError] = []
+    success: bool = True
+
+class StockPerformance(BaseModel):
+    id: int
+    symbol: str
+    start_price: float
+    latest_price: Optional[float] = None
+    latest_price_date: Optional[date] = None
+    return_pct: Optional[float] = None  # 報酬率（%）
+    max_drawdown_pct: Optional[float] = None  # 追蹤期間最大回撤（%）
+    days_held: int
+
+class CurrencySummary(BaseModel):
+    count: int
+    total_start_price: float
+
+class PortfolioSummary(BaseModel):
+    stock_count: int
+    currencies: Dict[str, CurrencySummary]
+    sentiments: Dict[str, int]  # bullish / bearish / neutral / none（無分析資料）
+
+# 個股提及查詢相關 schemas
+class StockMentionResponse(BaseModel):
+    id: int
+    video_id: Optional[str] = None
+    video_url: Optional[str] = None
+    source: Literal["stock_analysis", "mentioned_company"]
+    symbol: Optional[str] = None
+    company_name: Optional[str] = None
+    sentiment: Optional[Literal["bullish", "bearish", "neutral"]] = None
+    mention_type: Optional[Literal["PRIMARY", "CASE_STUDY", "COMPARISON", "MENTION"]] = None
+    confidence: Optional[int] = None
+    mentioned_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# KOL 準確度排行榜相關 schemas
+class ChannelScoreResponse(BaseModel):
+    channel_id: str
+    channel_title: Optional[str] = None
+    horizon_days: int
+    calls: int
+    hits: int
+    hit_rate: Optional[float] = None
+    avg_return: Optional[float] = None  # 依判斷方向調整後的平均報酬
+    avg_excess_return: Optional[float] = None  # 相對大盤的平均超額報酬
+
+    class Config:
+        from_attributes = True
+
+# 全文搜尋相關 schemas
+class SearchResult(BaseModel):
+    video_id: str
+    score: float  # BM25 分數，越高越相關
+    snippet: str  # 以 <mark></mark> 標示關鍵字的摘錄
+
+# 管理 API 相關 schemas
+class ProfileInfo(BaseModel):
+    name: str  # 檔名，亦即回應標頭 X-Profile-Id 的值
+    format: Literal["speedscope", "pstats"]
+    size: int
+    created_at: datetime
+class UsageSummary(BaseModel):
+    key: Optional[str] = None  # 依維度為日期、使用者 id、API key 雜湊等；None 表示未登入或無 API key
+    calls: int
+    errors: int  # outcome 不是 ok 的呼叫數
+    prompt_tokens: int
+    output_tokens: int
+    cached_tokens: int
+    total_tokens: int
+    avg_prompt_tokens: Optional[float] = None
+    max_prompt_tokens: Optional[int] = None
+    avg_latency_ms: Optional[float] = None
+    max_latency_ms: Optional[float] = None
+    estimated_cost: float  # 美元，依 GEMINI_PRICE_* 估算
+
+class ModelCallResponse(BaseModel):
+    id: int
+    created_at: datetime
+    model: str
+    prompt_version: str
+    source: str
+    outcome: str
+    latency_ms: float
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    user_id: Optional[int] = None
+    api_key_hash: Optional[str] = None
+    transcript_hash: str
+    transcript_chars: int
+    video_url: Optional[str] = None
+
     class Config:
         from_attributes = True
\ No newline at end of file
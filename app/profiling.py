@@ -0,0 +1,211 @@
+import asyncio
+import cProfile
+import json
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from auth.config import ADMIN_TOKEN
+from auth.utils import verify_admin_token
+
+# 效能剖析設定
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0–1，依比例隨機剖析請求
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sampling")  # sampling（speedscope JSON）/ cprofile（pstats）
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))
+
+# 觸發剖析的標頭，值需為管理員 token
+PROFILE_HEADER = "x-profile"
+
+PROFILE_EXTENSIONS = {"sampling": ".speedscope.json", "cprofile": ".pstats"}
+PROFILE_NAME_PATTERN = re.compile(r"^[\w.-]+\.(speedscope\.json|pstats)$")
+
+def profiling_enabled() -> bool:
+    """未設定管理員 token 且取樣率為 0 時不掛載中介層，完全沒有額外成本"""
+    return bool(ADMIN_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+class SamplingProfiler:
+    """
+    以背景執行緒定期取樣事件迴圈執行緒的呼叫堆疊，輸出 speedscope 格式
+
+    事件迴圈同時處理的其他請求也會出現在取樣中；等待外部服務時迴圈閒置，會顯示在 selector 的 select
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.frames: List[Dict[str, Any]] = []
+        self.frame_index: Dict[Any, int] = {}
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _stack(self, frame) -> List[int]:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            index = self.frame_index.get(code)
+            if index is None:
+                index = self.frame_index[code] = len(self.frames)
+                self.frames.append({"name": code.co_qualname, "file": code.co_filename, "line": code.co_firstlineno})
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = self._stack(frame)
+            elapsed = (now - last) * 1000
+            last = now
+            # 連續相同的堆疊合併為一筆，保留時間順序
+            if self.samples and self.samples[-1] == stack:
+                self.weights[-1] += elapsed
+            else:
+                self.samples.append(stack)
+                self.weights.append(elapsed)
+
+    def save(self, path: str, name: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "$schema": "https://www.speedscope.app/file-format-schema.json",
+                "shared": {"frames": self.frames},
+                "profiles": [{
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": self.duration * 1000,
+                    "samples": self.samples,
+                    "weights": self.weights,
+                }],
+                "name": name,
+                "activeProfileIndex": 0,
+                "exporter": "kolog-backend",
+            }, f)
+
+class DeterministicProfiler:
+    """cProfile 剖析整段請求期間事件迴圈執行緒上的所有呼叫，輸出 pstats"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def save(self, path: str, name: str):
+        self.profile.dump_stats(path)
+
+class ProfileStore:
+    """剖析結果檔案的存放與清理"""
+
+    @staticmethod
+    def filename(profile_id: str, method: str, path: str) -> str:
+        slug = re.sub(r"[^\w]+", "_", path).strip("_")[:80] or "root"
+        timestamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        return f"{timestamp}-{profile_id}-{method}-{slug}{PROFILE_EXTENSIONS[PROFILE_MODE]}"
+
+    @staticmethod
+    def list() -> List[Dict[str, Any]]:
+        """依時間由新到舊列出剖析結果"""
+        if not os.path.isdir(PROFILE_DIR):
+            return []
+        profiles = []
+        for entry in os.scandir(PROFILE_DIR):
+            if entry.is_file() and PROFILE_NAME_PATTERN.match(entry.name):
+                stat = entry.stat()
+                profiles.append({
+                    "name": entry.name,
+                    "format": "speedscope" if entry.name.endswith(".speedscope.json") else "pstats",
+                    "size": stat.st_size,
+                    "created_at": datetime.fromtimestamp(stat.st_mtime),
+                })
+        profiles.sort(key=lambda profile: profile["name"], reverse=True)
+        return profiles
+
+    @staticmethod
+    def path(name: str) -> Optional[str]:
+        """取得剖析結果的檔案路徑（只接受本目錄下符合命名規則的檔案）"""
+        if not PROFILE_NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(PROFILE_DIR, name)
+        return path if os.path.isfile(path) else None
+
+    @staticmethod
+    def save(profiler, filename: str, name: str):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.save(os.path.join(PROFILE_DIR, filename), name)
+        # 只保留最新的 PROFILE_MAX_FILES 筆
+        for profile in ProfileStore.list()[PROFILE_MAX_FILES:]:
+            os.remove(os.path.join(PROFILE_DIR, profile["name"]))
+
+class ProfilingMiddleware:
+    """
+    剖析帶有 `X-Profile: <管理員 token>` 標頭的請求，或依 PROFILE_SAMPLE_RATE 隨機剖析
+
+    同一時間只剖析一個請求；剖析結果的檔名會放在回應標頭 `X-Profile-Id`
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.active = False
+
+    def should_profile(self, scope: Scope) -> bool:
+        if self.active:
+            return False
+        token = Headers(scope=scope).get(PROFILE_HEADER)
+        if token is not None and verify_admin_token(token):
+            return True
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = secrets.token_hex(6)
+        filename = ProfileStore.filename(profile_id, scope["method"], scope["path"])
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = filename
+            await send(message)
+
+        profiler = (
+            DeterministicProfiler() if PROFILE_MODE == "cprofile" else SamplingProfiler(PROFILE_INTERVAL_MS / 1000)
+        )
+        self.active = True
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            self.active = False
+            await asyncio.to_thread(ProfileStore.save, profiler, filename, f"{scope['method']} {scope['path']}")
@@ -0,0 +1,123 @@
+import math
+import os
+import sqlite3
+from typing import Dict, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from auth.utils import verify_token
+from metrics import QUOTA_DECISIONS
+from shared_state import shared_store
+
+# 配額設定，格式為「次數/秒數」：可連續送出的次數（桶容量），以及補滿所需的秒數；0 表示不限制
+QUOTA_ENABLED = os.getenv("QUOTA_ENABLED", "true").lower() == "true"
+QUOTA_LIMITS = {
+    # 每次都會呼叫 Gemini
+    "ai": os.getenv("QUOTA_AI", "10/60"),
+    # 抓取 YouTube 逐字稿與元數據
+    "upstream": os.getenv("QUOTA_UPSTREAM", "30/60"),
+    # 登入與註冊（bcrypt 雜湊、Google token 驗證）
+    "auth": os.getenv("QUOTA_AUTH", "20/60"),
+}
+# 位於反向代理之後時改用 X-Forwarded-For 的第一個位址作為用戶端 IP
+QUOTA_TRUST_FORWARDED = os.getenv("QUOTA_TRUST_FORWARDED", "false").lower() == "true"
+
+# 受配額限制的路由；其餘路由（/health、/api/v1/user/stocks 等）不檢查，不增加任何成本
+ROUTE_CLASSES = {
+    "/api/v1/analysis/gemini": "ai",
+    "/api/v1/youtube/transcript": "upstream",
+    "/api/v1/youtube/metadata": "upstream",
+    "/api/v1/auth/login": "auth",
+    "/api/v1/auth/register": "auth",
+    "/api/v1/auth/google": "auth",
+}
+
+def parse_limit(value: str) -> Optional[Tuple[int, float]]:
+    """解析「次數/秒數」，回傳 (桶容量, 每秒補充數)；0 或空字串表示不限制"""
+    count, _, period = value.partition("/")
+    capacity = int(count or 0)
+    if capacity <= 0:
+        return None
+    return capacity, capacity / float(period or 60)
+
+LIMITS: Dict[str, Tuple[int, float]] = {
+    route_class: limit
+    for route_class, limit in ((name, parse_limit(value)) for name, value in QUOTA_LIMITS.items())
+    if limit is not None
+}
+
+def quota_identity(scope: Scope) -> str:
+    """
+    配額計算的對象：已登入的使用者 → 用戶端 IP
+
+    未登入的呼叫者一律以 IP 計算；不採用呼叫者自行提供、未經驗證的標頭（例如 API key），
+    否則每次換一個值就能取得新的桶
+    """
+    headers = Headers(scope=scope)
+    authorization = headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        payload = verify_token(authorization[7:])
+        if payload is not None and payload.get("sub") is not None:
+            return f"user:{payload['sub']}"
+
+    if QUOTA_TRUST_FORWARDED:
+        forwarded = headers.get("x-forwarded-for")
+        if forwarded:
+            return "ip:" + forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+def quota_headers(capacity: int, rate: float, tokens: float, period: float) -> Dict[str, str]:
+    """RateLimit 標頭（IETF draft-ietf-httpapi-ratelimit-headers）：Reset 為桶補滿所需秒數"""
+    return {
+        "RateLimit-Limit": str(capacity),
+        "RateLimit-Remaining": str(int(tokens)),
+        "RateLimit-Reset": str(math.ceil((capacity - tokens) / rate)),
+        "RateLimit-Policy": f"{capacity};w={round(period)}",
+    }
+
+class QuotaMiddleware:
+    """
+    依路由類別與呼叫者（使用者 / IP）以 token bucket 限制昂貴路由的請求頻率
+
+    桶存放在 shared_store，多個 worker 共用同一份配額；桶補滿後即過期清除，記憶體用量有上限。
+    共用儲存暫時無法使用時直接放行，不因配額檢查讓請求失敗
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        route_class = ROUTE_CLASSES.get(scope["path"].rstrip("/")) if scope["type"] == "http" else None
+        limit = LIMITS.get(route_class) if route_class else None
+        if limit is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        capacity, rate = limit
+        try:
+            allowed, tokens = await shared_store.take(f"quota:{route_class}:{quota_identity(scope)}", capacity, rate)
+        except sqlite3.Error:
+            QUOTA_DECISIONS.inc((route_class, "error"))
+            await self.app(scope, receive, send)
+            return
+
+        headers = quota_headers(capacity, rate, tokens, capacity / rate)
+        if not allowed:
+            QUOTA_DECISIONS.inc((route_class, "throttled"))
+            headers["Retry-After"] = str(math.ceil((1 - tokens) / rate))
+            response = JSONResponse(
+                {"error": "請求過於頻繁，請稍後再試", "success": False}, status_code=429, headers=headers
+            )
+            await response(scope, receive, send)
+            return
+
+        QUOTA_DECISIONS.inc((route_class, "allowed"))
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
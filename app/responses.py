@@ -0,0 +1,26 @@
+from typing import Any, Mapping, Optional
+from pydantic_core import to_json
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+class ModelResponse(Response):
+    """
+    直接序列化已驗證的 Pydantic 模型（或由資料庫欄位組成的 dict / list）
+
+    路由回傳 Response 時 FastAPI 不會再以 response_model 驗證一次；輸出與 response_model
+    預設行為相同（使用 alias 欄位名稱），response_model 仍保留給 OpenAPI 文件使用
+    """
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        background: Optional[BackgroundTask] = None,
+    ):
+        super().__init__(content, status_code, headers, self.media_type, background)
+
+    def render(self, content: Any) -> bytes:
+        # NaN / Infinity 不是合法 JSON，與 orjson 相同輸出為 null
+        return to_json(content, by_alias=True, inf_nan_mode="null")
@@ -0,0 +1,61 @@
+from datetime import date
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+
+from auth.utils import require_admin
+from database import get_read_db
+from models.schemas import ModelCallResponse, ProfileInfo, UsageSummary
+from profiling import ProfileStore
+from services.usage_service import UsageService
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/profiles", response_model=List[ProfileInfo])
+async def list_profiles():
+    """列出已擷取的請求剖析結果（由新到舊）"""
+    return ProfileStore.list()
+
+@router.get("/profiles/{name}")
+async def download_profile(name: str):
+    """
+    下載剖析結果
+
+    `.speedscope.json` 可直接拖進 https://www.speedscope.app 檢視；`.pstats` 可用
+    `python -m pstats` 或 snakeviz 開啟
+    """
+    path = ProfileStore.path(name)
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="找不到該剖析結果"
+        )
+    media_type = "application/json" if name.endswith(".json") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
+
+
+@router.get("/usage", response_model=List[UsageSummary])
+async def usage_summary(
+    group_by: Literal["day", "user", "api_key", "model", "prompt_version", "source"] = Query("day", description="彙總維度"),
+    since: Optional[date] = Query(None, description="起始日期（UTC，含）"),
+    until: Optional[date] = Query(None, description="結束日期（UTC，含）"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Gemini 用量彙總：呼叫數、失敗數、token 數、延遲與估算費用
+
+    依日期時由新到舊，其餘維度依 token 總數由多到少；紀錄每隔數秒批次寫入，最近的呼叫可能尚未計入
+    """
+    return await UsageService.summary(db, group_by, since, until, limit)
+
+@router.get("/usage/calls", response_model=List[ModelCallResponse])
+async def largest_calls(
+    since: Optional[date] = Query(None, description="起始日期（UTC，含）"),
+    until: Optional[date] = Query(None, description="結束日期（UTC，含）"),
+    limit: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """prompt token 數最多的 Gemini 呼叫，用來找出過長的逐字稿與 prompt"""
+    return await UsageService.largest_calls(db, since, until, limit)
\ No newline at end of file
@@ -1,33 +1,56 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from auth.utils import get_optional_user_id
+from database import get_read_db
 from models.schemas import AnalysisRequest, AnalysisResponse, ErrorResponse
 from services.gemini_service import GeminiService
+from services.transcript_service import TranscriptService
+from services.youtube_service import YouTubeService
+from responses import ModelResponse
 
 router = APIRouter()
 
 @router.post("/analysis/gemini",
              response_model=AnalysisResponse,
              responses={400: {"model": ErrorResponse}, 429: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def analyze_with_gemini(request: AnalysisRequest):
+async def analyze_with_gemini(
+    request: AnalysisRequest,
+    user_id: Optional[int] = Depends(get_optional_user_id),
+    db: AsyncSession = Depends(get_read_db)
+):
     """
     使用 Google Gemini AI 分析影片逐字稿
     
     - **transcript**: 影片逐字稿文本內容
     - **api_key**: Google Gemini API Key
     - **video_url**: YouTube 影片 URL
+    - **allow_similar**: 是否沿用相似逐字稿（重新上傳、轉載）的既有分析，預設為是
     
-    返回 AI 分析結果，包含股票分析、投資觀點和市場情緒
+    返回 AI 分析結果，包含股票分析、投資觀點和市場情緒；沿用既有分析時 reused_from 為來源影片與相似度。
+    帶有登入 token 時，token 用量記錄在該使用者名下。
+    影片的逐字稿曾經由 /youtube/transcript 取得時，每個提及會附上引文在影片中的秒數與播放連結
     """
     try:
         result = await GeminiService.analyze_transcript(
             request.transcript,
             request.api_key,
-            str(request.video_url)
+            str(request.video_url),
+            request.allow_similar,
+            user_id
         )
+
+        # 分析結果可能來自快取或相似影片，引文時間依本次請求的影片分段計算
+        video_id = YouTubeService.extract_video_id(str(request.video_url))
+        segments = await TranscriptService.load(db, video_id) if video_id else None
+        if segments is not None:
+            TranscriptService.annotate(result['analysis'], segments, video_id)
         
-        return AnalysisResponse(
+        return ModelResponse(AnalysisResponse(
             success=True,
-            analysis=result['analysis']
-        )
+            analysis=result['analysis'],
+            reused_from=result.get('reused_from')
+        ))
         
     except HTTPException:
         raise
@@ -1,11 +1,11 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-import httpx
 import json
 
-from database import get_db
+from database import get_db, get_read_db
 from models.auth_models import User
 from models.schemas import UserCreate, UserLogin, UserResponse, Token, GoogleAuthRequest
 from auth.utils import (
@@ -14,16 +14,20 @@ from auth.utils import (
     create_access_token,
     get_current_active_user
 )
-from auth.config import ACCESS_TOKEN_EXPIRE_MINUTES, GOOGLE_CLIENT_ID
+from auth.config import ACCESS_TOKEN_EXPIRE_MINUTES, GOOGLE_CLIENT_ID, GOOGLE_TOKENINFO_URL
+from services.version_service import VersionService
+from responses import ModelResponse
+from metrics import UpstreamCall
 
 router = APIRouter()
 security = HTTPBearer()
 
 @router.post("/register", response_model=Token)
-async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """使用者註冊"""
     # 檢查 email 是否已存在
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    result = await db.execute(select(User).where(User.email == user_data.email))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -40,8 +44,8 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     # 建立 access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -59,9 +63,9 @@ async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=Token)
-async def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login_user(user_credentials: UserLogin, db: AsyncSession = Depends(get_read_db)):
     """使用者登入"""
-    user = authenticate_user(db, user_credentials.email, user_credentials.password)
+    user = await authenticate_user(db, user_credentials.email, user_credentials.password)
     
     if not user:
         raise HTTPException(
@@ -92,9 +96,17 @@ async def login_user(user_credentials: UserLogin, db: Session = Depends(get_db))
     }
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
-    """取得當前使用者資訊"""
-    return UserResponse.from_orm(current_user)
+async def get_current_user_info(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """取得當前使用者資訊（帶上 `If-None-Match` 且資料未變更時回傳 304）"""
+    not_modified = await VersionService.check(request, response, db, current_user.id, "me")
+    if not_modified:
+        return not_modified
+    return ModelResponse(UserResponse.from_orm(current_user), headers=response.headers)
 
 @router.post("/logout")
 async def logout_user(current_user: User = Depends(get_current_active_user)):
@@ -107,14 +119,19 @@ async def verify_token(current_user: User = Depends(get_current_active_user)):
     return {"valid": True, "user_id": current_user.id}
 
 @router.post("/google", response_model=Token)
-async def google_oauth_login(google_auth: GoogleAuthRequest, db: Session = Depends(get_db)):
+async def google_oauth_login(google_auth: GoogleAuthRequest, db: AsyncSession = Depends(get_db)):
     """Google OAuth 登入"""
+    # httpx 只用於呼叫外部服務，延後到第一次使用時匯入
+    import httpx
+    
     try:
         # 驗證 Google token
         async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://oauth2.googleapis.com/tokeninfo?id_token={google_auth.token}"
-            )
+            with UpstreamCall("google_tokeninfo") as call:
+                response = await client.get(
+                    f"{GOOGLE_TOKENINFO_URL}?id_token={google_auth.token}"
+                )
+                call.status(response.status_code)
             
             if response.status_code != 200:
                 raise HTTPException(
@@ -144,9 +161,10 @@ async def google_oauth_login(google_auth: GoogleAuthRequest, db: Session = Depen
                 )
             
             # 檢查用戶是否已存在
-            user = db.query(User).filter(
+            result = await db.execute(select(User).where(
                 (User.email == email) | (User.google_id == google_id)
-            ).first()
+            ))
+            user = result.scalars().first()
             
             if user:
                 # 更新現有用戶的 Google 資訊
@@ -156,6 +174,8 @@ async def google_oauth_login(google_auth: GoogleAuthRequest, db: Session = Depen
                     user.avatar_url = avatar_url
                 if full_name and not user.full_name:
                     user.full_name = full_name
+                if db.is_modified(user):
+                    await VersionService.bump(db, user.id)
             else:
                 # 建立新用戶
                 user = User(
@@ -167,8 +187,8 @@ async def google_oauth_login(google_auth: GoogleAuthRequest, db: Session = Depen
                 )
                 db.add(user)
             
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
             
             # 建立 access token
             access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
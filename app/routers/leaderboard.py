@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal
+
+from database import get_read_db
+from models.schemas import ChannelScoreResponse
+from services.leaderboard_service import LeaderboardService
+from responses import ModelResponse
+
+router = APIRouter()
+
+@router.get("/", response_model=List[ChannelScoreResponse])
+async def get_leaderboard(
+    horizon: int = Query(30, description="觀察天數（需為已設定的天數之一，預設 7/30/90/180）"),
+    sort: Literal["hit_rate", "excess_return"] = Query("hit_rate", description="排序依據"),
+    min_calls: int = Query(5, ge=1, description="最少判斷次數"),
+    limit: int = Query(20, ge=1, le=100, description="回傳筆數"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    KOL 看多 / 看空判斷準確度排行榜
+
+    讀取預先計算的頻道評分，不會即時重算
+    """
+    scores = await LeaderboardService.leaderboard(db, horizon, sort, min_calls, limit)
+    return ModelResponse([ChannelScoreResponse.from_orm(score) for score in scores])
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Literal
+from datetime import datetime
+
+from database import get_read_db
+from models.auth_models import User
+from models.analysis_models import StockMention
+from models.schemas import StockMentionResponse
+from auth.utils import get_current_active_user
+from responses import ModelResponse
+
+router = APIRouter()
+
+@router.get("/", response_model=List[StockMentionResponse])
+async def search_mentions(
+    response: Response,
+    symbol: Optional[str] = Query(None, description="股票代號，例如 NVDA"),
+    sentiment: Optional[Literal["bullish", "bearish", "neutral"]] = Query(None, description="市場情緒"),
+    mention_type: Optional[Literal["PRIMARY", "CASE_STUDY", "COMPARISON", "MENTION"]] = Query(None, description="提及類型"),
+    min_confidence: Optional[int] = Query(None, ge=0, le=100, description="最低信心度"),
+    video_id: Optional[str] = Query(None, description="YouTube 影片 ID"),
+    since: Optional[datetime] = Query(None, description="起始日期（含）"),
+    until: Optional[datetime] = Query(None, description="結束日期（不含）"),
+    after_id: Optional[int] = Query(None, description="上一頁最後一筆的 id"),
+    limit: int = Query(100, ge=1, le=500, description="每頁筆數"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    查詢所有影片分析中的個股提及紀錄
+
+    例如「本月所有看多 NVDA 的提及」：`?symbol=NVDA&sentiment=bullish&since=2024-06-01`
+
+    若還有下一頁，回應標頭 `X-Next-After-Id` 會帶上下一頁的 after_id
+    """
+    query = select(StockMention)
+    if symbol:
+        query = query.where(StockMention.symbol == symbol.strip().upper())
+    if sentiment:
+        query = query.where(StockMention.sentiment == sentiment)
+    if mention_type:
+        query = query.where(StockMention.mention_type == mention_type)
+    if min_confidence is not None:
+        query = query.where(StockMention.confidence >= min_confidence)
+    if video_id:
+        query = query.where(StockMention.video_id == video_id)
+    if since:
+        query = query.where(StockMention.mentioned_at >= since)
+    if until:
+        query = query.where(StockMention.mentioned_at < until)
+    if after_id is not None:
+        query = query.where(StockMention.id > after_id)
+    # 多取一筆用來判斷是否有下一頁
+    query = query.order_by(StockMention.id).limit(limit + 1)
+
+    result = await db.execute(query)
+    mentions = result.scalars().all()
+
+    if len(mentions) > limit:
+        mentions = mentions[:limit]
+        response.headers["X-Next-After-Id"] = str(mentions[-1].id)
+
+    return ModelResponse([StockMentionResponse.from_orm(mention) for mention in mentions], headers=response.headers)
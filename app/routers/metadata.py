@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
 from models.schemas import MetadataRequest, MetadataResponse, ErrorResponse
 from services.youtube_service import YouTubeService
+from services.video_catalog_service import VideoCatalogService
+from services.search_service import SearchService
+from responses import ModelResponse
 
 router = APIRouter()
 
@@ -8,7 +14,7 @@ router = APIRouter()
              response_model=MetadataResponse,
              responses={400: {"model": ErrorResponse}, 403: {"model": ErrorResponse}, 
                        404: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def get_youtube_metadata(request: MetadataRequest):
+async def get_youtube_metadata(request: MetadataRequest, db: AsyncSession = Depends(get_db)):
     """
     使用 YouTube Data API v3 獲取影片元數據
     
@@ -23,11 +29,16 @@ async def get_youtube_metadata(request: MetadataRequest):
             request.api_key
         )
         
-        return MetadataResponse(
+        # 記錄影片所屬頻道與發布時間，供 KOL 準確度評分使用
+        await VideoCatalogService.upsert_video(db, result['metadata'])
+        await SearchService.index_video(db, request.video_id, {"title": result['metadata']['title']})
+        await db.commit()
+        
+        return ModelResponse(MetadataResponse(
             success=True,
             metadata=result['metadata'],
             publish_date=result['publish_date']
-        )
+        ))
         
     except HTTPException:
         raise
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from database import get_read_db
+from models.auth_models import User
+from models.schemas import SearchResult
+from services.search_service import SearchService
+from auth.utils import get_current_active_user
+from responses import ModelResponse
+
+router = APIRouter()
+
+@router.get("/", response_model=List[SearchResult])
+async def search_videos(
+    q: str = Query(..., min_length=1, max_length=200, description="搜尋關鍵字，以空白分隔多個詞"),
+    limit: int = Query(20, ge=1, le=100, description="回傳筆數"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    全文搜尋影片逐字稿、摘要、分析理由、重點與引用句
+
+    例如 `?q=資料中心 capex`，依相關度排序並回傳標示關鍵字的摘錄
+    """
+    return ModelResponse(await SearchService.search(db, q, limit))
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
 from models.schemas import TranscriptRequest, TranscriptResponse, ErrorResponse
 from services.youtube_service import YouTubeService
+from services.transcript_service import SegmentIndex, TranscriptService
+from responses import ModelResponse
 
 router = APIRouter()
 
 @router.post("/youtube/transcript", 
              response_model=TranscriptResponse,
              responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def get_youtube_transcript(request: TranscriptRequest):
+async def get_youtube_transcript(request: TranscriptRequest, db: AsyncSession = Depends(get_db)):
     """
     獲取 YouTube 影片逐字稿
     
@@ -24,12 +29,19 @@ async def get_youtube_transcript(request: TranscriptRequest):
                 detail=result['error']
             )
         
-        return TranscriptResponse(
+        # 保存逐字稿分段供分析結果的引文定位；此 API 不需登入，逐字稿在寫入分析時才進入全文索引
+        if result.get('segments'):
+            await TranscriptService.save(
+                db, result['video_id'], result['language'], SegmentIndex.decode(result['transcript'], result['segments'])
+            )
+        await db.commit()
+        
+        return ModelResponse(TranscriptResponse(
             success=True,
             transcript=result['transcript'],
             language=result['language'],
             video_id=result['video_id']
-        )
+        ))
         
     except HTTPException:
         raise
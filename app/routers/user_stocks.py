@@ -1,44 +1,333 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Literal, Dict, Any, Iterator, Tuple
+from datetime import date
+import asyncio
+import codecs
+import csv
+import io
 import json
 
-from database import get_db
+from database import get_db, get_read_db, ReadSessionLocal
 from models.auth_models import User, UserStock
-from models.schemas import UserStockCreate, UserStockResponse
+from models.schemas import (
+    UserStockCreate, UserStockResponse, UserStockListItem,
+    UserStockImportError, UserStockImportResponse, StockPerformance, PortfolioSummary
+)
 from auth.utils import get_current_active_user
+from services.analysis_store_service import AnalysisStoreService
+from services.price_service import PriceService
+from services.summary_service import SummaryService
+from services.search_service import SearchService
+from services.version_service import VersionService
+from responses import ModelResponse
 
 router = APIRouter()
 
-@router.get("/", response_model=List[UserStockResponse])
+# 匯入 / 匯出的欄位與批次大小
+TRANSFER_FIELDS = list(UserStockCreate.model_fields)
+TRANSFER_BATCH_SIZE = 500
+
+# 清單可選擇的欄位；youtube_analysis 體積較大，需明確指定才會回傳
+LIST_FIELDS = list(UserStockListItem.model_fields)
+DEFAULT_LIST_FIELDS = [field for field in LIST_FIELDS if field != "youtube_analysis"]
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """解析 fields 參數（逗號分隔），id 一律回傳以供分頁使用"""
+    if not fields:
+        return DEFAULT_LIST_FIELDS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    invalid = [field for field in requested if field not in LIST_FIELDS]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"不支援的欄位: {', '.join(invalid)}"
+        )
+    # 依 schema 欄位順序輸出，與 response_model 的欄位順序一致
+    return ["id"] + [field for field in LIST_FIELDS if field in requested and field != "id"]
+
+async def flush_or_duplicate(db: AsyncSession):
+    """送出變更；違反唯一索引時回傳重複追蹤錯誤"""
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="您已經在追蹤這支股票"
+        )
+
+@router.get("/", response_model=List[UserStockListItem], response_model_exclude_unset=True)
 async def get_user_stocks(
+    request: Request,
+    response: Response,
+    after_id: Optional[int] = Query(None, description="上一頁最後一筆的 id"),
+    limit: int = Query(100, ge=1, le=500, description="每頁筆數"),
+    fields: Optional[str] = Query(None, description="要回傳的欄位（逗號分隔），預設不含 youtube_analysis"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    取得當前使用者的追蹤股票（依 id 分頁）
+
+    若還有下一頁，回應標頭 `X-Next-After-Id` 會帶上下一頁的 after_id；
+    帶上 `If-None-Match` 且清單未變更時回傳 304
+    """
+    columns = parse_fields(fields)
+    not_modified = await VersionService.check(
+        request, response, db, current_user.id, f"list:{after_id}:{limit}:{','.join(columns)}"
+    )
+    if not_modified:
+        return not_modified
+
+    query = select(*[getattr(UserStock, field) for field in columns]).where(
+        UserStock.user_id == current_user.id
+    )
+    if after_id is not None:
+        query = query.where(UserStock.id > after_id)
+    # 多取一筆用來判斷是否有下一頁
+    query = query.order_by(UserStock.id).limit(limit + 1)
+
+    result = await db.execute(query)
+    rows = result.mappings().all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-After-Id"] = str(rows[-1]["id"])
+
+    # 欄位型別由資料表決定，直接序列化不再逐筆驗證
+    return ModelResponse([dict(row) for row in rows], headers=response.headers)
+
+def detect_transfer_format(file: UploadFile, format: Optional[str]) -> str:
+    """依參數、副檔名或 Content-Type 判斷匯入檔案格式"""
+    if format:
+        return format
+    filename = (file.filename or "").lower()
+    content_type = file.content_type or ""
+    if filename.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type:
+        return "ndjson"
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="無法判斷檔案格式，請指定 format=csv 或 format=ndjson"
+    )
+
+def iter_import_rows(file: UploadFile, format: str) -> Iterator[Tuple[int, Any]]:
+    """逐列讀取上傳檔案，回傳 (列號, 原始資料)"""
+    text = codecs.getreader("utf-8-sig")(file.file)
+    if format == "csv":
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            # CSV 的空欄位視為未填寫
+            yield row_number, {key: value for key, value in row.items() if key and value != ""}
+    else:
+        row_number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                yield row_number, json.loads(line)
+            except ValueError:
+                yield row_number, None
+
+def format_validation_error(error: ValidationError) -> str:
+    """將 Pydantic 驗證錯誤整理為單行訊息"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+def parse_import_rows(
+    file: UploadFile, format: str
+) -> Tuple[Dict[str, Tuple[int, UserStockCreate]], List[UserStockImportError]]:
+    """
+    讀取並驗證上傳檔案，回傳 (股票代號 → (列號, 資料), 錯誤列)
+
+    同步讀取暫存檔並逐列驗證，由呼叫端在執行緒中執行，大檔案不阻塞事件迴圈
+    """
+    errors: List[UserStockImportError] = []
+    rows: Dict[str, Tuple[int, UserStockCreate]] = {}
+
+    for row_number, raw in iter_import_rows(file, format):
+        if not isinstance(raw, dict):
+            errors.append(UserStockImportError(row=row_number, error="無法解析的資料列"))
+            continue
+        try:
+            stock_data = UserStockCreate(**raw)
+        except ValidationError as e:
+            errors.append(UserStockImportError(
+                row=row_number, symbol=raw.get("symbol"), error=format_validation_error(e)
+            ))
+            continue
+        if stock_data.symbol in rows:
+            errors.append(UserStockImportError(
+                row=row_number, symbol=stock_data.symbol, error="檔案中重複的股票"
+            ))
+            continue
+        rows[stock_data.symbol] = (row_number, stock_data)
+    return rows, errors
+
+@router.post("/import", response_model=UserStockImportResponse)
+async def import_user_stocks(
+    file: UploadFile = File(..., description="CSV 或 NDJSON 檔案，每列一筆 UserStockCreate"),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="檔案格式，未指定時依副檔名判斷"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """取得當前使用者的所有追蹤股票"""
-    stocks = db.query(UserStock).filter(UserStock.user_id == current_user.id).all()
-    return [UserStockResponse.from_orm(stock) for stock in stocks]
+    """
+    批次匯入追蹤股票
+
+    所有有效資料列在同一個交易中分批寫入；格式錯誤或重複追蹤的資料列會逐列回報並略過
+    """
+    format = detect_transfer_format(file, format)
+    rows, errors = await asyncio.to_thread(parse_import_rows, file, format)
+
+    # 以集合查詢一次找出已追蹤的股票（分批避免超過 SQLite 參數上限）
+    symbols = list(rows)
+    existing = set()
+    for start in range(0, len(symbols), TRANSFER_BATCH_SIZE):
+        result = await db.execute(select(UserStock.symbol).where(
+            UserStock.user_id == current_user.id,
+            UserStock.symbol.in_(symbols[start:start + TRANSFER_BATCH_SIZE])
+        ))
+        existing.update(result.scalars().all())
+
+    for symbol in existing:
+        row_number, _ = rows.pop(symbol)
+        errors.append(UserStockImportError(row=row_number, symbol=symbol, error="您已經在追蹤這支股票"))
+
+    # 同一個交易中分批寫入；分析內容存入 analysis_blobs，資料列只保存雜湊
+    records = [stock_data for _, stock_data in sorted(rows.values(), key=lambda item: item[0])]
+    values = [
+        {**stock_data.dict(exclude={"youtube_analysis"}), "user_id": current_user.id}
+        for stock_data in records
+    ]
+    try:
+        for start in range(0, len(values), TRANSFER_BATCH_SIZE):
+            batch = values[start:start + TRANSFER_BATCH_SIZE]
+            contents = [stock_data.youtube_analysis for stock_data in records[start:start + TRANSFER_BATCH_SIZE]]
+            hashes = await AnalysisStoreService.acquire(db, contents)
+            for row, analysis_hash in zip(batch, hashes):
+                row["analysis_hash"] = analysis_hash
+            await db.execute(insert(UserStock), batch)
+            # 相同的分析只需索引一次
+            for content in dict.fromkeys(contents):
+                await SearchService.index_analysis(db, content)
+        await SummaryService.apply(db, current_user.id, [
+            (1, SummaryService.stock_buckets(stock_data)) for stock_data in records
+        ])
+        if values:
+            await VersionService.bump(db, current_user.id)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="匯入期間追蹤清單已被修改，請重新匯入"
+        )
+
+    errors.sort(key=lambda error: error.row)
+    return ModelResponse(UserStockImportResponse(
+        success=True,
+        message=f"成功匯入 {len(values)} 筆，失敗 {len(errors)} 筆",
+        imported=len(values),
+        errors=errors
+    ))
+
+async def export_rows(user_id: int, format: str):
+    """依 id 分批讀取並逐批輸出，不在記憶體中組出完整清單"""
+    columns = [getattr(UserStock, field) for field in TRANSFER_FIELDS]
+
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=TRANSFER_FIELDS)
+        writer.writeheader()
+        yield buffer.getvalue()
+
+    last_id = 0
+    while True:
+        # 每批使用短交易，避免長時間佔用讀取連線
+        async with ReadSessionLocal() as db:
+            result = await db.execute(
+                select(UserStock.id, *columns)
+                .where(UserStock.user_id == user_id, UserStock.id > last_id)
+                .order_by(UserStock.id)
+                .limit(TRANSFER_BATCH_SIZE)
+            )
+            batch = result.all()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        buffer = io.StringIO()
+        if format == "csv":
+            writer = csv.DictWriter(buffer, fieldnames=TRANSFER_FIELDS)
+        for row in batch:
+            record = dict(zip(TRANSFER_FIELDS, row[1:]))
+            record["start_tracking_date"] = record["start_tracking_date"].isoformat()
+            if format == "csv":
+                writer.writerow(record)
+            else:
+                buffer.write(json.dumps(record, ensure_ascii=False))
+                buffer.write("\n")
+        yield buffer.getvalue()
+
+@router.get("/export")
+async def export_user_stocks(
+    format: Literal["csv", "ndjson"] = Query("csv", description="匯出格式"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """以串流方式匯出追蹤清單（欄位與匯入格式相同）"""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_rows(current_user.id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="watchlist.{format}"'}
+    )
+
+@router.get("/performance", response_model=List[StockPerformance])
+async def get_user_stocks_performance(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """依本地每日價格計算所有追蹤股票的報酬率、最大回撤與持有天數"""
+    result = await db.execute(
+        select(UserStock.id, UserStock.symbol, UserStock.start_tracking_date, UserStock.start_price)
+        .where(UserStock.user_id == current_user.id)
+        .order_by(UserStock.id)
+    )
+    stocks = result.all()
+    if not stocks:
+        return []
+
+    earliest = min(stock.start_tracking_date for stock in stocks).date()
+    prices = await PriceService.load_prices(db, sorted({stock.symbol for stock in stocks}), earliest)
+
+    # 績效計算依賴 NumPy，第一次查詢時才載入，不拖慢啟動
+    from services.performance_service import PerformanceService
+    return PerformanceService.compute(stocks, prices, date.today())
+
+@router.get("/summary", response_model=PortfolioSummary)
+async def get_user_stocks_summary(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """取得追蹤清單彙總（股票數、各幣別起始價合計、情緒分布），不需讀取整份清單"""
+    return await SummaryService.load(db, current_user.id)
 
 @router.post("/", response_model=UserStockResponse)
 async def add_user_stock(
     stock_data: UserStockCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """新增股票到使用者追蹤清單"""
-    # 檢查是否已經追蹤該股票
-    existing_stock = db.query(UserStock).filter(
-        UserStock.user_id == current_user.id,
-        UserStock.symbol == stock_data.symbol
-    ).first()
-    
-    if existing_stock:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="您已經在追蹤這支股票"
-        )
-    
-    # 建立新的追蹤股票
+    # 建立新的追蹤股票（重複追蹤由 (user_id, symbol) 唯一索引檢查）
+    [analysis_hash] = await AnalysisStoreService.acquire(db, [stock_data.youtube_analysis])
     db_stock = UserStock(
         user_id=current_user.id,
         symbol=stock_data.symbol,
@@ -47,27 +336,33 @@ async def add_user_stock(
         start_tracking_date=stock_data.start_tracking_date,
         start_price=stock_data.start_price,
         currency=stock_data.currency,
+        analysis_hash=analysis_hash,
         youtube_analysis=stock_data.youtube_analysis
     )
     
     db.add(db_stock)
-    db.commit()
-    db.refresh(db_stock)
+    await flush_or_duplicate(db)
+    await SearchService.index_analysis(db, db_stock.youtube_analysis)
+    await SummaryService.apply(db, current_user.id, [(1, SummaryService.stock_buckets(db_stock))])
+    await VersionService.bump(db, current_user.id)
+    await db.commit()
+    await db.refresh(db_stock)
     
-    return UserStockResponse.from_orm(db_stock)
+    return ModelResponse(UserStockResponse.from_orm(db_stock))
 
 @router.put("/{stock_id}", response_model=UserStockResponse)
 async def update_user_stock(
     stock_id: int,
     stock_data: UserStockCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """更新使用者追蹤的股票資訊"""
-    stock = db.query(UserStock).filter(
+    result = await db.execute(select(UserStock).where(
         UserStock.id == stock_id,
         UserStock.user_id == current_user.id
-    ).first()
+    ))
+    stock = result.scalars().first()
     
     if not stock:
         raise HTTPException(
@@ -76,25 +371,40 @@ async def update_user_stock(
         )
     
     # 更新股票資訊
-    for field, value in stock_data.dict(exclude_unset=True).items():
+    previous_buckets = SummaryService.stock_buckets(stock)
+    previous_hash = stock.analysis_hash
+    update_data = stock_data.dict(exclude_unset=True)
+    if "youtube_analysis" in update_data:
+        [stock.analysis_hash] = await AnalysisStoreService.acquire(db, [update_data["youtube_analysis"]])
+    for field, value in update_data.items():
         setattr(stock, field, value)
     
-    db.commit()
-    db.refresh(stock)
+    await flush_or_duplicate(db)
+    if "youtube_analysis" in update_data:
+        await AnalysisStoreService.release(db, [previous_hash])
+        await SearchService.index_analysis(db, stock.youtube_analysis)
+    await SummaryService.apply(db, current_user.id, [
+        (-1, previous_buckets),
+        (1, SummaryService.stock_buckets(stock)),
+    ])
+    await VersionService.bump(db, current_user.id)
+    await db.commit()
+    await db.refresh(stock)
     
-    return UserStockResponse.from_orm(stock)
+    return ModelResponse(UserStockResponse.from_orm(stock))
 
 @router.delete("/{stock_id}")
 async def delete_user_stock(
     stock_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """從使用者追蹤清單移除股票"""
-    stock = db.query(UserStock).filter(
+    result = await db.execute(select(UserStock).where(
         UserStock.id == stock_id,
         UserStock.user_id == current_user.id
-    ).first()
+    ))
+    stock = result.scalars().first()
     
     if not stock:
         raise HTTPException(
@@ -102,8 +412,13 @@ async def delete_user_stock(
             detail="找不到該追蹤股票"
         )
     
-    db.delete(stock)
-    db.commit()
+    await db.delete(stock)
+    # 先刪除資料列，分析的引用數才能歸零刪除
+    await db.flush()
+    await AnalysisStoreService.release(db, [stock.analysis_hash])
+    await SummaryService.apply(db, current_user.id, [(-1, SummaryService.stock_buckets(stock))])
+    await VersionService.bump(db, current_user.id)
+    await db.commit()
     
     return {"message": "成功移除追蹤股票"}
 
@@ -112,13 +427,14 @@ async def update_stock_custom_name(
     stock_id: int,
     custom_name: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """更新股票的自訂名稱"""
-    stock = db.query(UserStock).filter(
+    result = await db.execute(select(UserStock).where(
         UserStock.id == stock_id,
         UserStock.user_id == current_user.id
-    ).first()
+    ))
+    stock = result.scalars().first()
     
     if not stock:
         raise HTTPException(
@@ -129,8 +445,9 @@ async def update_stock_custom_name(
     # 限制字數最多15字
     trimmed_name = custom_name.strip()[:15] if custom_name.strip() else None
     stock.custom_name = trimmed_name
+    await VersionService.bump(db, current_user.id)
     
-    db.commit()
-    db.refresh(stock)
+    await db.commit()
+    await db.refresh(stock)
     
     return {"message": "成功更新股票名稱", "custom_name": trimmed_name}
\ No newline at end of file
@@ -0,0 +1,75 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.analysis_models import AnalysisBlob, content_hash
+from services.mention_service import MentionService
+from services.search_service import SearchService
+
+class AnalysisStoreService:
+    """
+    依內容雜湊共用影片分析 JSON，以引用計數維護 analysis_blobs（需與追蹤清單異動在同一交易中 commit）
+
+    由分析衍生的個股提及（stock_mentions）在分析第一次寫入時建立、引用數歸零時刪除，每份分析只有一組；
+    全文索引中的分析欄位也在引用數歸零時移除（見 SearchService.remove_analyses）
+    """
+
+    @staticmethod
+    async def acquire(db: AsyncSession, contents: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """寫入（或引用既有的）分析內容，每筆引用數加一；回傳對應的雜湊，None 保持 None"""
+        hashes = []
+        blobs: Dict[str, str] = {}
+        counts: Counter = Counter()
+        for content in contents:
+            digest = content_hash(content) if content is not None else None
+            hashes.append(digest)
+            if digest is not None:
+                blobs[digest] = content
+                counts[digest] += 1
+        if not counts:
+            return hashes
+
+        statement = sqlite_insert(AnalysisBlob)
+        statement = statement.on_conflict_do_update(
+            index_elements=["hash"],
+            set_={"ref_count": AnalysisBlob.ref_count + statement.excluded.ref_count},
+        )
+        result = await db.execute(statement.returning(AnalysisBlob.hash, AnalysisBlob.ref_count), [
+            {"hash": digest, "content": blobs[digest], "ref_count": count}
+            for digest, count in counts.items()
+        ])
+        # 引用數等於本次新增數的是新寫入的分析（既有的分析引用數至少為 1）
+        created = [digest for digest, ref_count in result.all() if ref_count == counts[digest]]
+        await MentionService.insert_mentions(db, [
+            row for digest in created for row in MentionService.mention_rows(digest, blobs[digest])
+        ])
+        return hashes
+
+    @staticmethod
+    async def release(db: AsyncSession, hashes: Iterable[Optional[str]]):
+        """
+        釋放引用，引用數降到 0 的分析一併刪除
+
+        需在引用的 user_stocks 異動（刪除或改指其他雜湊）flush 之後呼叫，否則可能刪除仍被引用的分析
+        """
+        counts = Counter(digest for digest in hashes if digest is not None)
+        if not counts:
+            return
+        table = AnalysisBlob.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.hash == bindparam("blob_hash"))
+            .values(ref_count=table.c.ref_count - bindparam("released")),
+            [{"blob_hash": digest, "released": count} for digest, count in counts.items()],
+        )
+        result = await db.execute(select(AnalysisBlob.hash, AnalysisBlob.content).where(
+            AnalysisBlob.hash.in_(list(counts)),
+            AnalysisBlob.ref_count <= 0
+        ))
+        removed = dict(result.tuples().all())
+        if removed:
+            await MentionService.delete_mentions(db, list(removed))
+            await db.execute(delete(AnalysisBlob).where(AnalysisBlob.hash.in_(list(removed))))
+            await SearchService.remove_analyses(db, removed.values())
@@ -0,0 +1,145 @@
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from database import WriteSessionLocal
+from metrics import HTTP_REQUESTS_IN_PROGRESS, WATCHER_POLLS, WATCHER_VIDEOS
+from services.gemini_service import GeminiService
+from services.search_service import SearchService
+from services.transcript_service import SegmentIndex, TranscriptService
+from services.video_catalog_service import VideoCatalogService
+from services.youtube_service import YouTubeService
+from shared_state import shared_store
+
+# 監看的頻道 ID（UC 開頭，逗號分隔），未設定時不啟動
+WATCH_CHANNELS = [channel.strip() for channel in os.getenv("WATCH_CHANNELS", "").split(",") if channel.strip()]
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "900"))
+# 每個頻道每次檢查最新的幾支影片，以及只處理發布多久以內的影片（首次啟動不會補處理舊影片）
+WATCH_MAX_VIDEOS = int(os.getenv("WATCH_MAX_VIDEOS", "5"))
+WATCH_MAX_AGE_HOURS = float(os.getenv("WATCH_MAX_AGE_HOURS", "72"))
+# 處理中的請求數達到此值時先暫停，預先處理不與使用者請求搶資源
+WATCH_BUSY_REQUESTS = int(os.getenv("WATCH_BUSY_REQUESTS", "4"))
+# 剛上傳的影片可能還沒有字幕，失敗後在之後的輪詢重試，最多嘗試次數
+WATCH_MAX_ATTEMPTS = 3
+
+# 輪詢用的 YouTube Data API key；設定 GEMINI_API_KEY 時一併預先分析
+YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+class ChannelWatcherService:
+    """輪詢 KOL 頻道的上傳清單，預先抓取新影片的元數據與逐字稿並分析，使用者之後的請求直接命中快取"""
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(WATCH_CHANNELS and YOUTUBE_API_KEY)
+
+    @staticmethod
+    def _is_recent(published_at: str) -> bool:
+        if not published_at:
+            return True
+        published = datetime.fromisoformat(published_at.replace("Z", "+00:00"))
+        return datetime.now(timezone.utc) - published <= timedelta(hours=WATCH_MAX_AGE_HOURS)
+
+    @staticmethod
+    async def _playlist_videos(channel_id: str) -> List[Dict[str, Any]]:
+        """頻道最新的影片；以 etag 發送條件式請求，清單沒有變動時沿用上次的結果"""
+        playlist_id = YouTubeService.uploads_playlist_id(channel_id)
+        state_key = f"watch:playlist:{playlist_id}"
+        state = await shared_store.get(state_key)
+        try:
+            listing = await YouTubeService.list_playlist_videos(
+                playlist_id, YOUTUBE_API_KEY, WATCH_MAX_VIDEOS, state["etag"] if state else None
+            )
+        except Exception:
+            WATCHER_POLLS.inc(("error",))
+            return []
+        if listing is None:
+            WATCHER_POLLS.inc(("not_modified",))
+            return state["videos"]
+        WATCHER_POLLS.inc(("modified",))
+        await shared_store.set(state_key, listing)
+        return listing["videos"]
+
+    @staticmethod
+    async def pending_videos() -> List[str]:
+        """所有監看頻道中尚未處理、且未超過重試次數的新影片"""
+        pending = []
+        for channel_id in WATCH_CHANNELS:
+            for video in await ChannelWatcherService._playlist_videos(channel_id):
+                video_id = video["video_id"]
+                if not ChannelWatcherService._is_recent(video.get("published_at")):
+                    continue
+                if await shared_store.get(f"watch:done:{video_id}"):
+                    continue
+                if (await shared_store.get(f"watch:attempts:{video_id}") or 0) >= WATCH_MAX_ATTEMPTS:
+                    continue
+                pending.append(video_id)
+        return pending
+
+    @staticmethod
+    async def _wait_until_idle():
+        while HTTP_REQUESTS_IN_PROGRESS.values.get((), 0) >= WATCH_BUSY_REQUESTS:
+            await asyncio.sleep(1)
+
+    @staticmethod
+    async def prefetch_video(video_id: str, metadata: Dict[str, Any]) -> bool:
+        """寫入影片資訊、抓取逐字稿並分析（結果都進入共用快取），回傳是否完成"""
+        video_url = f"https://www.youtube.com/watch?v={video_id}"
+        transcript = await YouTubeService.get_transcript(video_url)
+        async with WriteSessionLocal() as db:
+            await VideoCatalogService.upsert_video(db, metadata["metadata"])
+            fields = {"title": metadata["metadata"]["title"]}
+            if transcript["success"]:
+                fields["transcript"] = transcript["transcript"]
+                if transcript.get("segments"):
+                    await TranscriptService.save(
+                        db, video_id, transcript["language"],
+                        SegmentIndex.decode(transcript["transcript"], transcript["segments"])
+                    )
+            await SearchService.index_video(db, video_id, fields)
+            await db.commit()
+        if not transcript["success"]:
+            return False
+
+        if GEMINI_API_KEY:
+            await GeminiService.analyze_transcript(transcript["transcript"], GEMINI_API_KEY, video_url, source="watcher")
+        return True
+
+    @staticmethod
+    async def run_once() -> Dict[str, int]:
+        """檢查一次所有頻道並依序預先處理新影片，回傳各結果的影片數"""
+        counts = {"analyzed": 0, "prefetched": 0, "failed": 0}
+        pending = await ChannelWatcherService.pending_videos()
+        if not pending:
+            return counts
+
+        # 元數據以 videos.list 批次取得，一次最多 50 支
+        metadata = await YouTubeService.get_videos_metadata(pending, YOUTUBE_API_KEY)
+        for video_id in pending:
+            await ChannelWatcherService._wait_until_idle()
+            try:
+                done = video_id in metadata and await ChannelWatcherService.prefetch_video(video_id, metadata[video_id])
+            except Exception:
+                done = False
+            if done:
+                outcome = "analyzed" if GEMINI_API_KEY else "prefetched"
+                await shared_store.set(f"watch:done:{video_id}", True, WATCH_MAX_AGE_HOURS * 3600 * 2)
+            else:
+                outcome = "failed"
+                await shared_store.incr(f"watch:attempts:{video_id}", ttl=WATCH_MAX_AGE_HOURS * 3600 * 2)
+            WATCHER_VIDEOS.inc((outcome,))
+            counts[outcome] += 1
+        return counts
+
+async def run_channel_watcher():
+    """
+    背景定期輪詢；多個 worker 都會啟動，但每個輪詢週期只有第一個取得計數器的 worker 執行
+    """
+    while True:
+        if await shared_store.incr("watch:round", ttl=WATCH_INTERVAL * 0.9) == 1:
+            try:
+                await ChannelWatcherService.run_once()
+            except Exception:
+                WATCHER_POLLS.inc(("error",))
+        await asyncio.sleep(WATCH_INTERVAL)
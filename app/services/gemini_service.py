@@ -1,13 +1,33 @@
+import asyncio
+import hashlib
 import json
-from typing import Dict, Any
-import httpx
+import os
+import re
+import time
+from typing import Dict, Any, Optional
 from fastapi import HTTPException
 from datetime import datetime
 
+from deadline import time_left
+from metrics import ANALYSIS_REUSE, UpstreamCall
+from services.ticker_service import TickerService
+from shared_state import shared_store
+
+# 分析結果快取秒數（以逐字稿內容為鍵，跨 worker 共用，0 表示不快取）
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "604800"))
+# API key 驗證結果的快取秒數（沿用快取的分析前須確認 key 有效）
+GEMINI_KEY_CHECK_TTL = int(os.getenv("GEMINI_KEY_CHECK_TTL", "3600"))
+
 class GeminiService:
     """Google Gemini AI 分析服務類"""
     
-    GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent"
+    # 可用環境變數指向本機替身服務（壓測用）
+    GEMINI_API_URL = os.getenv(
+        "GEMINI_API_URL",
+        "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent"
+    )
+    # 模型資訊端點（models.get，不消耗 token），用於驗證 API key
+    GEMINI_MODEL_URL = os.getenv("GEMINI_MODEL_URL", GEMINI_API_URL.removesuffix(":generateContent"))
     
     @staticmethod
     def _create_analysis_prompt(transcript: str) -> str:
@@ -128,8 +148,114 @@ class GeminiService:
 """
 
     @staticmethod
-    async def analyze_transcript(transcript: str, api_key: str, video_url: str) -> Dict[str, Any]:
-        """使用 Google Gemini API 分析影片逐字稿"""
+    def transcript_hash(transcript: str) -> str:
+        return hashlib.sha256(transcript.encode()).hexdigest()
+
+    @staticmethod
+    def analysis_cache_key(transcript_hash: str) -> str:
+        return "analysis:" + transcript_hash
+
+    @staticmethod
+    def _key_marker(api_key: str) -> str:
+        from services.usage_service import UsageService
+        return "gemini:key:" + UsageService.key_hash(api_key)
+
+    @staticmethod
+    async def verify_api_key(api_key: str):
+        """
+        確認 API key 有效，無效時拋出與呼叫 Gemini 相同的錯誤
+
+        快取的分析是以其他 key 付費取得，沿用前必須先確認本次的 key 可用；
+        以 models.get 驗證（不消耗 token），結果依 key 雜湊快取 GEMINI_KEY_CHECK_TTL 秒
+        """
+        import httpx
+
+        marker = GeminiService._key_marker(api_key)
+        if await shared_store.get(marker):
+            return
+        try:
+            async with httpx.AsyncClient() as client:
+                with UpstreamCall("gemini_key_check") as call:
+                    response = await client.get(
+                        GeminiService.GEMINI_MODEL_URL, params={"key": api_key}, timeout=time_left(10.0)
+                    )
+                    call.status(response.status_code)
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="AI 分析服務回應逾時，請稍後再試")
+        except httpx.HTTPError:
+            raise HTTPException(status_code=503, detail="無法連接到 AI 分析服務，請檢查網路連線")
+
+        if not response.is_success:
+            if response.status_code in (400, 401, 403):
+                raise HTTPException(status_code=400, detail="API Key 無效或請求格式錯誤")
+            elif response.status_code == 429:
+                raise HTTPException(status_code=429, detail="API 請求次數已達上限，請稍後再試")
+            else:
+                raise HTTPException(status_code=500, detail="Google Gemini API 暫時無法使用")
+        await shared_store.set(marker, True, GEMINI_KEY_CHECK_TTL)
+
+    @staticmethod
+    async def analyze_transcript(
+        transcript: str, api_key: str, video_url: str, allow_similar: bool = True,
+        user_id: Optional[int] = None, source: str = "request"
+    ) -> Dict[str, Any]:
+        """
+        使用 Google Gemini API 分析影片逐字稿
+
+        allow_similar 為 True 時，逐字稿與已分析的影片高度相似（重新上傳、轉載）會直接沿用該分析，
+        結果中的 reused_from 記錄來源影片與相似度（逐字稿與其他影片完全相同時為 1.0）。
+        實際呼叫 Gemini 時以 user_id、API key 雜湊與 source 記錄 token 用量（見 UsageService）。
+        沿用快取結果前先以 verify_api_key 確認 API key 有效
+        """
+        import httpx
+        from services.usage_service import UsageService
+        
+        transcript_hash = GeminiService.transcript_hash(transcript)
+        cache_key = GeminiService.analysis_cache_key(transcript_hash)
+        if ANALYSIS_CACHE_TTL > 0:
+            cached = await shared_store.get(cache_key)
+            if cached is not None:
+                # 同一份逐字稿已分析過（例如頻道監看預先分析），影片 URL 以本次請求為準
+                await GeminiService.verify_api_key(api_key)
+                ANALYSIS_REUSE.inc(("exact",))
+                # 沿用其他影片的分析時與相似逐字稿一樣記錄來源影片
+                if cached['analysis']['video_url'] != video_url:
+                    cached['reused_from'] = {'video_url': cached['analysis']['video_url'], 'similarity': 1.0}
+                cached['analysis']['video_url'] = video_url
+                return cached
+
+        # 相似逐字稿的索引與分析結果一起存放在共用快取，不快取時一併停用
+        signature = None
+        if ANALYSIS_CACHE_TTL > 0:
+            from services.similarity_service import NEAR_DUPLICATE_THRESHOLD, TranscriptSimilarityService
+            if NEAR_DUPLICATE_THRESHOLD > 0:
+                signature = await asyncio.to_thread(TranscriptSimilarityService.signature, transcript)
+            if signature is not None and allow_similar:
+                similar = await TranscriptSimilarityService.find_similar(signature)
+                cached = await shared_store.get(GeminiService.analysis_cache_key(similar[0])) if similar else None
+                if cached is not None:
+                    await GeminiService.verify_api_key(api_key)
+                    ANALYSIS_REUSE.inc(("similar",))
+                    cached['reused_from'] = {
+                        'video_url': cached['analysis']['video_url'],
+                        'similarity': round(similar[1], 3),
+                    }
+                    cached['analysis']['video_url'] = video_url
+                    return cached
+        ANALYSIS_REUSE.inc(("miss",))
+
+        usage = {
+            "model": GEMINI_MODEL,
+            "prompt_version": PROMPT_VERSION,
+            "source": source,
+            "outcome": "error",
+            "user_id": user_id,
+            "api_key_hash": UsageService.key_hash(api_key),
+            "transcript_hash": transcript_hash,
+            "transcript_chars": len(transcript),
+            "video_url": video_url,
+        }
+        started = time.perf_counter()
         try:
             analysis_prompt = GeminiService._create_analysis_prompt(transcript)
             
@@ -152,12 +278,16 @@ class GeminiService:
             }
             
             async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{GeminiService.GEMINI_API_URL}?key={api_key}",
-                    headers={"Content-Type": "application/json"},
-                    json=request_body,
-                    timeout=30.0
-                )
+                with UpstreamCall("gemini") as call:
+                    response = await client.post(
+                        f"{GeminiService.GEMINI_API_URL}?key={api_key}",
+                        headers={"Content-Type": "application/json"},
+                        json=request_body,
+                        # 不超過請求剩餘的處理時間；用戶端中斷連線時整個呼叫會被取消
+                        timeout=time_left(30.0)
+                    )
+                    call.status(response.status_code)
+                usage["outcome"] = call.outcome
                 
                 if not response.is_success:
                     if response.status_code == 400:
@@ -177,6 +307,10 @@ class GeminiService:
                         )
                 
                 gemini_data = response.json()
+                usage.update(UsageService.token_counts(gemini_data))
+                usage["model"] = gemini_data.get("modelVersion") or GEMINI_MODEL
+                # 之後的檢查失敗代表模型回應無法使用
+                usage["outcome"] = "invalid_response"
                 
                 # 提取 AI 回應內容
                 ai_response = gemini_data.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text')
@@ -216,17 +350,9 @@ class GeminiService:
                         detail="AI 分析結果格式不完整"
                     )
                 
-                # 股票代號格式驗證
-                def is_valid_stock_symbol(symbol: str) -> bool:
-                    if not symbol or not isinstance(symbol, str):
-                        return False
-                    # 美股代號格式：1-5個大寫字母，可能包含一個點
-                    import re
-                    stock_symbol_regex = r'^[A-Z]{1,5}(\.[A-Z])?$'
-                    return bool(re.match(stock_symbol_regex, symbol.strip().upper()))
-                
                 # 過濾和驗證股票分析結果
                 valid_stock_analyses = []
+                seen_symbols = set()
                 for analysis in analysis_result.get('stockAnalyses', []):
                     # 基本欄位檢查
                     has_required_fields = (
@@ -237,13 +363,14 @@ class GeminiService:
                         0 <= analysis.get('confidence', -1) <= 100
                     )
                     
-                    # 股票代號格式檢查
-                    has_valid_symbol = is_valid_stock_symbol(analysis.get('symbol', ''))
+                    # 股票代號檢查：不存在的代號剔除，股份類別寫法統一（BRK-B → BRK.B），中文名稱轉為代號
+                    symbol = TickerService.resolve(analysis.get('symbol'), analysis.get('companyName'))
                     
-                    if has_required_fields and has_valid_symbol:
+                    if has_required_fields and symbol and symbol not in seen_symbols:
+                        seen_symbols.add(symbol)
                         # 轉換為 Pydantic 期望的格式 (使用 alias 欄位名稱)
                         formatted_analysis = {
-                            'symbol': analysis['symbol'].strip().upper(),
+                            'symbol': symbol,
                             'company_name': analysis.get('companyName'),
                             'mention_type': analysis.get('mentionType'),
                             'sentiment': analysis.get('sentiment'),
@@ -260,6 +387,7 @@ class GeminiService:
                 for company in analysis_result.get('mentionedCompanies', []):
                     formatted_company = {
                         'company_name': company.get('companyName'),
+                        'symbol': TickerService.symbol_for_company(company.get('companyName')),
                         'context': company.get('context', ''),
                         'mention_type': company.get('mentionType'),
                         'confidence': company.get('confidence', 0)
@@ -277,15 +405,42 @@ class GeminiService:
                     'analyzed_at': datetime.now().isoformat()
                 }
                 
-                return {
+                result = {
                     'success': True,
                     'analysis': formatted_analysis
                 }
+                usage["outcome"] = "ok"
+                if ANALYSIS_CACHE_TTL > 0:
+                    # 本次成功呼叫即證明 key 有效，之後的快取命中不必再驗證
+                    await shared_store.set(GeminiService._key_marker(api_key), True, GEMINI_KEY_CHECK_TTL)
+                    await shared_store.set(cache_key, result, ANALYSIS_CACHE_TTL)
+                    if signature is not None:
+                        await TranscriptSimilarityService.index(transcript_hash, signature, ANALYSIS_CACHE_TTL)
+                return result
                 
         except HTTPException:
             raise
+        except asyncio.CancelledError:
+            usage["outcome"] = "cancelled"
+            raise
+        except httpx.TimeoutException:
+            usage["outcome"] = "timeout"
+            raise HTTPException(
+                status_code=504,
+                detail="AI 分析服務回應逾時，請稍後再試"
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=503,
                 detail="無法連接到 AI 分析服務，請檢查網路連線"
-            )
\ No newline at end of file
+            )
+        finally:
+            usage["latency_ms"] = (time.perf_counter() - started) * 1000
+            UsageService.record(usage)
+
+# 呼叫的模型（取自 GEMINI_API_URL，回應帶有 modelVersion 時以回應為準）
+_model_match = re.search(r"/models/([^/:]+)", GeminiService.GEMINI_API_URL)
+GEMINI_MODEL = _model_match.group(1) if _model_match else "gemini"
+
+# prompt 範本的版本：範本內容的雜湊，修改 prompt 後自動改變，可比較不同版本的 token 用量
+PROMPT_VERSION = hashlib.sha256(GeminiService._create_analysis_prompt("").encode()).hexdigest()[:12]
\ No newline at end of file
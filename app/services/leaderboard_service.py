@@ -0,0 +1,260 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, or_, exists, case, cast, tuple_, Float
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.analysis_models import StockMention, Video, CallOutcome, ChannelScore
+from services.price_service import PriceService
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# 評分設定
+LEADERBOARD_HORIZONS = [int(days) for days in os.getenv("LEADERBOARD_HORIZONS", "7,30,90,180").split(",")]
+LEADERBOARD_MIN_CONFIDENCE = int(os.getenv("LEADERBOARD_MIN_CONFIDENCE", "50"))
+BENCHMARK_SYMBOL = os.getenv("BENCHMARK_SYMBOL", "SPY")
+LEADERBOARD_BATCH_SIZE = 1000
+
+class LeaderboardService:
+    """以影片發布後的實際股價表現評估 KOL 的看多 / 看空判斷"""
+
+    @staticmethod
+    async def _pending_calls(
+        db: AsyncSession, horizon: int, today: date, after: Optional[Tuple[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """依 (video_id, symbol) 分頁找出已到期但尚未評分的判斷（同一影片同一股票只取信心度最高的一筆）"""
+        cutoff = datetime.combine(today - timedelta(days=horizon), datetime.max.time())
+        scored = exists().where(
+            CallOutcome.video_id == StockMention.video_id,
+            CallOutcome.symbol == StockMention.symbol,
+            CallOutcome.horizon_days == horizon,
+        )
+        query = (
+            select(
+                StockMention.video_id, StockMention.symbol, StockMention.sentiment,
+                StockMention.confidence, Video.channel_id, Video.channel_title, Video.published_at,
+            )
+            .join(Video, Video.video_id == StockMention.video_id)
+            .where(
+                StockMention.source == "stock_analysis",
+                StockMention.sentiment.in_(["bullish", "bearish"]),
+                StockMention.confidence >= LEADERBOARD_MIN_CONFIDENCE,
+                or_(StockMention.mention_type.is_(None), StockMention.mention_type == "PRIMARY"),
+                or_(Video.channel_id.is_not(None), Video.channel_title.is_not(None)),
+                Video.published_at <= cutoff,
+                ~scored,
+            )
+            .order_by(StockMention.video_id, StockMention.symbol, StockMention.confidence.desc())
+            .limit(LEADERBOARD_BATCH_SIZE)
+        )
+        if after is not None:
+            query = query.where(tuple_(StockMention.video_id, StockMention.symbol) > after)
+        result = await db.execute(query)
+
+        calls: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for row in result.all():
+            key = (row.video_id, row.symbol)
+            if key not in calls:
+                calls[key] = {
+                    "video_id": row.video_id,
+                    "symbol": row.symbol,
+                    "sentiment": row.sentiment,
+                    "confidence": row.confidence,
+                    "channel_id": row.channel_id or row.channel_title,
+                    "channel_title": row.channel_title,
+                    "published_at": row.published_at,
+                }
+        return list(calls.values())
+
+    @staticmethod
+    def _price_lookup(prices: List[Tuple[str, date, float]]) -> Dict[str, Tuple["np.ndarray", "np.ndarray"]]:
+        """依股票代號整理為 (天數陣列, 收盤價陣列)"""
+        import numpy as np
+
+        series: Dict[str, Tuple[List[int], List[float]]] = {}
+        for symbol, day, close in prices:
+            days, closes = series.setdefault(symbol, ([], []))
+            days.append(day.toordinal())
+            closes.append(close)
+        return {
+            symbol: (np.asarray(days, dtype=np.int64), np.asarray(closes, dtype=np.float64))
+            for symbol, (days, closes) in series.items()
+        }
+
+    @staticmethod
+    def _period_return(series, start: "np.ndarray", end: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        計算 [start, end] 期間報酬：進場價為 start 當天或之後第一個收盤價，出場價為 end 當天或之前最後一個收盤價
+
+        價格資料需涵蓋到 end 之後才算有效，避免價格尚未更新時以過早的收盤價評分。回傳 (進場價, 出場價, 是否有效)
+        """
+        import numpy as np
+
+        entry = np.full(len(start), np.nan)
+        exit = np.full(len(start), np.nan)
+        if series is None or len(series[0]) == 0:
+            return entry, exit, np.zeros(len(start), dtype=bool)
+
+        days, closes = series
+        entry_index = np.searchsorted(days, start, side="left")
+        exit_index = np.searchsorted(days, end, side="right") - 1
+        valid = (exit_index > entry_index) & (end <= days[-1])
+        entry[valid] = closes[entry_index[valid]]
+        exit[valid] = closes[exit_index[valid]]
+        return entry, exit, valid
+
+    @staticmethod
+    def score_calls(calls: List[Dict[str, Any]], horizon: int, prices, benchmark) -> List[Dict[str, Any]]:
+        """以 NumPy 批次計算每個判斷的報酬、超額報酬與是否命中"""
+        # 排行榜查詢不需要 NumPy，只在評分時才載入，不拖慢 API 啟動
+        import numpy as np
+
+        outcomes = []
+        by_symbol: Dict[str, List[Dict[str, Any]]] = {}
+        for call in calls:
+            by_symbol.setdefault(call["symbol"], []).append(call)
+
+        for symbol, symbol_calls in by_symbol.items():
+            start = np.array([call["published_at"].date().toordinal() for call in symbol_calls], dtype=np.int64)
+            end = start + horizon
+            entry, exit, valid = LeaderboardService._period_return(prices.get(symbol), start, end)
+            bench_entry, bench_exit, bench_valid = LeaderboardService._period_return(benchmark, start, end)
+
+            direction = np.array([1.0 if call["sentiment"] == "bullish" else -1.0 for call in symbol_calls])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                stock_return = exit / entry - 1.0
+                bench_return = np.where(bench_valid, bench_exit / bench_entry - 1.0, np.nan)
+            call_return = direction * stock_return
+            excess_return = direction * (stock_return - bench_return)
+
+            for i, call in enumerate(symbol_calls):
+                if not valid[i]:
+                    continue
+                outcomes.append({
+                    "video_id": call["video_id"],
+                    "symbol": symbol,
+                    "horizon_days": horizon,
+                    "channel_id": call["channel_id"],
+                    "channel_title": call["channel_title"],
+                    "sentiment": call["sentiment"],
+                    "confidence": call["confidence"],
+                    "published_at": call["published_at"],
+                    "entry_price": float(entry[i]),
+                    "exit_price": float(exit[i]),
+                    "stock_return": float(stock_return[i]),
+                    "benchmark_return": float(bench_return[i]) if bench_valid[i] else None,
+                    "call_return": float(call_return[i]),
+                    "excess_return": float(excess_return[i]) if bench_valid[i] else None,
+                    "hit": bool(call_return[i] > 0),
+                })
+        return outcomes
+
+    @staticmethod
+    async def _apply_scores(db: AsyncSession, outcomes: List[Dict[str, Any]]):
+        """將新評分的判斷累加到各頻道的排行榜資料"""
+        deltas: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        for outcome in outcomes:
+            delta = deltas.setdefault((outcome["channel_id"], outcome["horizon_days"]), {
+                "channel_id": outcome["channel_id"],
+                "horizon_days": outcome["horizon_days"],
+                "channel_title": outcome["channel_title"],
+                "calls": 0, "hits": 0, "sum_return": 0.0, "excess_calls": 0, "sum_excess_return": 0.0,
+            })
+            delta["calls"] += 1
+            delta["hits"] += int(outcome["hit"])
+            delta["sum_return"] += outcome["call_return"]
+            if outcome["excess_return"] is not None:
+                delta["excess_calls"] += 1
+                delta["sum_excess_return"] += outcome["excess_return"]
+
+        rows = []
+        for delta in deltas.values():
+            rows.append({
+                **delta,
+                "hit_rate": delta["hits"] / delta["calls"],
+                "avg_return": delta["sum_return"] / delta["calls"],
+                "avg_excess_return": (
+                    delta["sum_excess_return"] / delta["excess_calls"] if delta["excess_calls"] else None
+                ),
+            })
+        if not rows:
+            return
+
+        statement = sqlite_insert(ChannelScore)
+        excluded = statement.excluded
+        calls = ChannelScore.calls + excluded.calls
+        sum_return = ChannelScore.sum_return + excluded.sum_return
+        excess_calls = ChannelScore.excess_calls + excluded.excess_calls
+        sum_excess_return = ChannelScore.sum_excess_return + excluded.sum_excess_return
+        statement = statement.on_conflict_do_update(
+            index_elements=["channel_id", "horizon_days"],
+            set_={
+                "channel_title": excluded.channel_title,
+                "calls": calls,
+                "hits": ChannelScore.hits + excluded.hits,
+                "sum_return": sum_return,
+                "excess_calls": excess_calls,
+                "sum_excess_return": sum_excess_return,
+                "hit_rate": cast(ChannelScore.hits + excluded.hits, Float) / calls,
+                "avg_return": sum_return / calls,
+                "avg_excess_return": case((excess_calls > 0, sum_excess_return / excess_calls), else_=None),
+            },
+        )
+        await db.execute(statement, rows)
+
+    @staticmethod
+    async def refresh(db: AsyncSession, today: Optional[date] = None) -> int:
+        """
+        評分所有已到期但尚未評分的判斷，並累加到排行榜（需由呼叫端 commit）
+
+        已評分的判斷不會重算；價格尚未到齊的判斷會在下次更新時再嘗試。回傳新評分的判斷數
+        """
+        today = today or date.today()
+        scored = 0
+        for horizon in LEADERBOARD_HORIZONS:
+            after = None
+            while True:
+                calls = await LeaderboardService._pending_calls(db, horizon, today, after)
+                if not calls:
+                    break
+                after = (calls[-1]["video_id"], calls[-1]["symbol"])
+                scored += await LeaderboardService._score_batch(db, calls, horizon)
+        return scored
+
+    @staticmethod
+    async def _score_batch(db: AsyncSession, calls: List[Dict[str, Any]], horizon: int) -> int:
+        """評分一批判斷並寫入結果，回傳成功評分的數量"""
+        earliest = min(call["published_at"] for call in calls).date()
+        symbols = sorted({call["symbol"] for call in calls} | {BENCHMARK_SYMBOL})
+        prices = LeaderboardService._price_lookup(await PriceService.load_prices(db, symbols, earliest))
+        outcomes = LeaderboardService.score_calls(calls, horizon, prices, prices.get(BENCHMARK_SYMBOL))
+        if not outcomes:
+            return 0
+
+        # 同時執行的更新（多個 worker）可能已寫入同一筆判斷，只累加本次實際新增的結果，避免重複計入排行榜
+        result = await db.execute(
+            sqlite_insert(CallOutcome).on_conflict_do_nothing().returning(CallOutcome.video_id, CallOutcome.symbol),
+            [{key: value for key, value in outcome.items() if key != "channel_title"} for outcome in outcomes]
+        )
+        inserted = set(result.tuples().all())
+        outcomes = [outcome for outcome in outcomes if (outcome["video_id"], outcome["symbol"]) in inserted]
+        await LeaderboardService._apply_scores(db, outcomes)
+        return len(outcomes)
+
+    @staticmethod
+    async def leaderboard(db: AsyncSession, horizon: int, sort: str, min_calls: int, limit: int) -> List[ChannelScore]:
+        """從預先計算的排行榜讀取前幾名頻道"""
+        order_column = ChannelScore.hit_rate if sort == "hit_rate" else ChannelScore.avg_excess_return
+        result = await db.execute(
+            select(ChannelScore)
+            .where(
+                ChannelScore.horizon_days == horizon,
+                ChannelScore.calls >= min_calls,
+                order_column.is_not(None),
+            )
+            .order_by(order_column.desc())
+            .limit(limit)
+        )
+        return result.scalars().all()
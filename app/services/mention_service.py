@@ -0,0 +1,121 @@
+import json
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.analysis_models import StockMention
+from services.youtube_service import YouTubeService
+
+class MentionService:
+    """將影片分析結果拆解為可查詢的個股提及紀錄"""
+
+    @staticmethod
+    def _pick(data: Dict[str, Any], *keys: str) -> Any:
+        """依序取出第一個存在的欄位（分析資料可能是 camelCase 或 snake_case）"""
+        for key in keys:
+            if data.get(key) is not None:
+                return data[key]
+        return None
+
+    @staticmethod
+    def _parse_datetime(value: Any) -> Optional[datetime]:
+        """解析 ISO 8601 日期字串"""
+        if not value or not isinstance(value, str):
+            return None
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def load_analysis(youtube_analysis: Optional[str]) -> Optional[Dict[str, Any]]:
+        """解析 youtube_analysis JSON 字串，格式錯誤時回傳 None"""
+        if not youtube_analysis:
+            return None
+        try:
+            data = json.loads(youtube_analysis)
+        except (TypeError, ValueError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    @staticmethod
+    def extract_mentions(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """從分析結果取出所有 StockAnalysis 與 MentionedCompany 紀錄"""
+        pick = MentionService._pick
+
+        # 也接受只存了單一 StockAnalysis 的資料
+        stock_analyses = pick(analysis, "stockAnalyses", "stock_analyses")
+        if stock_analyses is None and analysis.get("symbol"):
+            stock_analyses = [analysis]
+
+        video_url = pick(analysis, "videoUrl", "video_url")
+        video_id = YouTubeService.extract_video_id(video_url) if isinstance(video_url, str) else None
+        mentioned_at = MentionService._parse_datetime(
+            pick(analysis, "publishDate", "publish_date", "publishedAt", "published_at")
+        ) or MentionService._parse_datetime(pick(analysis, "analyzedAt", "analyzed_at"))
+
+        base = {
+            "video_id": video_id,
+            "video_url": video_url,
+            "mentioned_at": mentioned_at,
+        }
+
+        mentions = []
+        for stock in stock_analyses or []:
+            if not isinstance(stock, dict) or not stock.get("symbol"):
+                continue
+            mentions.append({
+                **base,
+                "source": "stock_analysis",
+                "symbol": str(stock["symbol"]).strip().upper(),
+                "company_name": pick(stock, "companyName", "company_name"),
+                "sentiment": stock.get("sentiment"),
+                "mention_type": pick(stock, "mentionType", "mention_type"),
+                "confidence": stock.get("confidence"),
+            })
+
+        for company in pick(analysis, "mentionedCompanies", "mentioned_companies") or []:
+            if not isinstance(company, dict):
+                continue
+            mentions.append({
+                **base,
+                "source": "mentioned_company",
+                "symbol": None,
+                "company_name": pick(company, "companyName", "company_name"),
+                "sentiment": None,
+                "mention_type": pick(company, "mentionType", "mention_type"),
+                "confidence": company.get("confidence"),
+            })
+
+        return mentions
+
+    @staticmethod
+    def mention_rows(analysis_hash: str, youtube_analysis: Optional[str]) -> List[Dict[str, Any]]:
+        """產生某份分析要寫入 stock_mentions 的資料列（ordinal 為提及在分析中的順序）"""
+        analysis = MentionService.load_analysis(youtube_analysis)
+        if not analysis:
+            return []
+        return [
+            {**mention, "analysis_hash": analysis_hash, "ordinal": ordinal}
+            for ordinal, mention in enumerate(MentionService.extract_mentions(analysis))
+        ]
+
+    @staticmethod
+    async def insert_mentions(db: AsyncSession, rows: List[Dict[str, Any]]):
+        """批次寫入提及紀錄，已存在的 (analysis_hash, ordinal) 略過"""
+        if rows:
+            await db.execute(sqlite_insert(StockMention).on_conflict_do_nothing(), rows)
+
+    @staticmethod
+    async def delete_mentions(db: AsyncSession, hashes: List[str]):
+        """刪除分析的提及紀錄（分析內容被刪除時）"""
+        if hashes:
+            await db.execute(delete(StockMention).where(StockMention.analysis_hash.in_(hashes)))
+
+    @staticmethod
+    async def rebuild(db: AsyncSession, analysis_hash: str, youtube_analysis: Optional[str]):
+        """以分析內容重建其提及紀錄（需在同一交易中 commit）"""
+        await MentionService.delete_mentions(db, [analysis_hash])
+        await MentionService.insert_mentions(db, MentionService.mention_rows(analysis_hash, youtube_analysis))
@@ -0,0 +1,106 @@
+from datetime import date, datetime
+from typing import List, Dict, Any, Sequence, Tuple
+import numpy as np
+
+class PerformanceService:
+    """以 NumPy 陣列一次計算整份追蹤清單的績效"""
+
+    @staticmethod
+    def _to_days(values: Sequence[Any]) -> np.ndarray:
+        """將日期轉為自 1970-01-01 起的天數"""
+        return np.array(
+            [value.date() if isinstance(value, datetime) else value for value in values],
+            dtype="datetime64[D]"
+        ).astype(np.int64)
+
+    @staticmethod
+    def compute(
+        stocks: Sequence[Tuple[int, str, Any, float]],
+        prices: Sequence[Tuple[str, date, float]],
+        today: date,
+    ) -> List[Dict[str, Any]]:
+        """
+        計算每筆追蹤股票的報酬率、最大回撤與持有天數
+
+        - stocks: (id, symbol, start_tracking_date, start_price)
+        - prices: (symbol, date, close)，需依 (symbol, date) 排序
+        """
+        if not stocks:
+            return []
+
+        ids, symbols, start_dates, start_prices = zip(*stocks)
+        start_days = PerformanceService._to_days(start_dates)
+        start_prices = np.asarray(start_prices, dtype=np.float64)
+        today_day = np.datetime64(today, "D").astype(np.int64)
+
+        # 股票代號對應為整數索引，與日期組成可排序的複合鍵 symbol_index * span + day
+        universe = sorted(set(symbols) | {price[0] for price in prices})
+        symbol_index = {symbol: index for index, symbol in enumerate(universe)}
+        span = np.int64(1 << 32)
+
+        stock_symbols = np.array([symbol_index[symbol] for symbol in symbols], dtype=np.int64)
+        if prices:
+            price_symbols, price_dates, closes = zip(*prices)
+            price_keys = (
+                np.array([symbol_index[symbol] for symbol in price_symbols], dtype=np.int64) * span
+                + PerformanceService._to_days(price_dates)
+            )
+            closes = np.asarray(closes, dtype=np.float64)
+            price_days = price_keys % span
+        else:
+            price_keys = np.empty(0, dtype=np.int64)
+            closes = np.empty(0, dtype=np.float64)
+            price_days = np.empty(0, dtype=np.int64)
+
+        # 每筆追蹤股票在價格陣列中的區間 [lo, hi)：起始日之後的所有價格
+        lo = np.searchsorted(price_keys, stock_symbols * span + start_days, side="left")
+        hi = np.searchsorted(price_keys, (stock_symbols + 1) * span, side="left")
+        counts = hi - lo
+        # 起始價為 0 時無法計算報酬率，視同沒有價格資料
+        has_price = (counts > 0) & (start_prices > 0)
+
+        # 每段以起始價開頭，接著是該股票的收盤價序列
+        lengths = counts + 1
+        segment_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        total = int(lengths.sum())
+        segment_ids = np.repeat(np.arange(len(stocks)), lengths)
+        position = np.arange(total) - segment_starts[segment_ids]
+
+        values = np.empty(total, dtype=np.float64)
+        is_entry = position == 0
+        values[is_entry] = start_prices
+        price_index = lo[segment_ids[~is_entry]] + position[~is_entry] - 1
+        values[~is_entry] = closes[price_index]
+
+        # 分段累積最大值：每段加上遞增位移，讓前一段的最大值不會影響下一段
+        offset = (np.ptp(values) + 1.0) * segment_ids
+        running_max = np.maximum.accumulate(values + offset) - offset
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drawdowns = values / running_max - 1.0
+        max_drawdowns = np.minimum.reduceat(drawdowns, segment_starts)
+
+        last_index = segment_starts + lengths - 1
+        latest_prices = values[last_index]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = latest_prices / start_prices - 1.0
+        days_held = np.maximum(today_day - start_days, 0)
+        latest_days = np.zeros(len(stocks), dtype=np.int64)
+        latest_days[has_price] = price_days[hi[has_price] - 1]
+        latest_dates = latest_days.astype("datetime64[D]").tolist()
+
+        results = []
+        for i, (priced, latest, ret, drawdown, held) in enumerate(zip(
+            has_price.tolist(), latest_prices.tolist(), returns.tolist(),
+            max_drawdowns.tolist(), days_held.tolist()
+        )):
+            results.append({
+                "id": ids[i],
+                "symbol": symbols[i],
+                "start_price": float(start_prices[i]),
+                "latest_price": latest if priced else None,
+                "latest_price_date": latest_dates[i] if priced else None,
+                "return_pct": round(ret * 100, 4) if priced else None,
+                "max_drawdown_pct": round(drawdown * 100, 4) if priced else None,
+                "days_held": held,
+            })
+        return results
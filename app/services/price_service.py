@@ -0,0 +1,90 @@
+import csv
+import os
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Optional, Dict, List, Iterable, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.market_models import StockPrice
+
+# 價格來源設定
+PRICE_PROVIDER = os.getenv("PRICE_PROVIDER", "csv")
+PRICE_CSV_PATH = os.getenv("PRICE_CSV_PATH", "./prices.csv")
+
+# 每日價格資料：(日期, 收盤價)
+DailyPrice = Tuple[date, float]
+
+class PriceProvider(ABC):
+    """每日價格來源介面"""
+
+    @abstractmethod
+    def fetch_daily_prices(self, symbol: str, start: date, end: date) -> List[DailyPrice]:
+        """取得某股票在 [start, end] 區間的每日收盤價"""
+
+class CsvPriceProvider(PriceProvider):
+    """從 CSV 檔案讀取價格（欄位：symbol,date,close），供測試與離線環境使用"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._prices: Optional[Dict[str, List[DailyPrice]]] = None
+
+    def _load(self) -> Dict[str, List[DailyPrice]]:
+        if self._prices is None:
+            prices: Dict[str, List[DailyPrice]] = {}
+            with open(self.path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    symbol = row["symbol"].strip().upper()
+                    prices.setdefault(symbol, []).append(
+                        (date.fromisoformat(row["date"].strip()), float(row["close"]))
+                    )
+            for series in prices.values():
+                series.sort()
+            self._prices = prices
+        return self._prices
+
+    def fetch_daily_prices(self, symbol: str, start: date, end: date) -> List[DailyPrice]:
+        return [
+            (day, close) for day, close in self._load().get(symbol.upper(), [])
+            if start <= day <= end
+        ]
+
+def get_price_provider() -> PriceProvider:
+    """依環境變數建立價格來源"""
+    if PRICE_PROVIDER == "csv":
+        return CsvPriceProvider(PRICE_CSV_PATH)
+    raise ValueError(f"不支援的價格來源: {PRICE_PROVIDER}")
+
+class PriceService:
+    """每日價格資料存取"""
+
+    @staticmethod
+    async def upsert_prices(db: AsyncSession, symbol: str, prices: Iterable[DailyPrice], currency: Optional[str] = None) -> int:
+        """寫入或更新每日價格，回傳寫入筆數（需由呼叫端 commit）"""
+        rows = [
+            {"symbol": symbol, "date": day, "close": close, "currency": currency}
+            for day, close in prices
+        ]
+        if not rows:
+            return 0
+
+        statement = sqlite_insert(StockPrice)
+        statement = statement.on_conflict_do_update(
+            index_elements=["symbol", "date"],
+            set_={"close": statement.excluded.close, "currency": statement.excluded.currency},
+        )
+        await db.execute(statement, rows)
+        return len(rows)
+
+    @staticmethod
+    async def load_prices(db: AsyncSession, symbols: List[str], start: date) -> List[Tuple[str, date, float]]:
+        """讀取多支股票自 start 起的價格，依 (symbol, date) 排序"""
+        if not symbols:
+            return []
+        result = await db.execute(
+            select(StockPrice.symbol, StockPrice.date, StockPrice.close)
+            .where(StockPrice.symbol.in_(symbols), StockPrice.date >= start)
+            .order_by(StockPrice.symbol, StockPrice.date)
+        )
+        return result.all()
@@ -0,0 +1,189 @@
+import re
+from typing import Optional, Dict, Any, Iterable, List
+from sqlalchemy import delete, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.analysis_models import AnalysisBlob, SearchDocument, StockMention, Transcript, SEARCH_INDEX_COLUMNS
+from services.mention_service import MentionService
+from services.youtube_service import YouTubeService
+
+# 中日韓文字沒有空白分詞，逐字以零寬空白分隔，讓 unicode61 分詞器把每個字視為一個詞
+CJK_PATTERN = re.compile(r"([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af])")
+ZERO_WIDTH_SPACE = "\u200b"
+
+# 各欄位的 BM25 權重（順序同 SEARCH_INDEX_COLUMNS）
+SEARCH_COLUMN_WEIGHTS = [5.0, 1.0, 3.0, 2.0, 2.0, 2.0]
+# 由分析內容產生的欄位（見 analysis_fields），分析刪除時一併清除
+ANALYSIS_COLUMNS = ["summary", "reasoning", "key_points", "context_quote"]
+
+class SearchService:
+    """影片逐字稿與分析內容的全文搜尋（SQLite FTS5）"""
+
+    @staticmethod
+    def segment(value: Optional[str]) -> str:
+        """將中日韓文字逐字分隔，英文與數字維持原本的分詞"""
+        if not value:
+            return ""
+        return CJK_PATTERN.sub(ZERO_WIDTH_SPACE + r"\1" + ZERO_WIDTH_SPACE, value.replace(ZERO_WIDTH_SPACE, ""))
+
+    @staticmethod
+    def build_query(query: str) -> Optional[str]:
+        """
+        將使用者輸入轉為 FTS5 查詢：以空白分隔的每個詞視為一個片語，全部詞都需符合
+
+        中文詞會被拆成逐字的片語，因此「資料中心」只會符合連續出現的四個字
+        """
+        phrases = []
+        for term in query.split():
+            term = SearchService.segment(term).replace('"', " ").strip()
+            if term.replace(ZERO_WIDTH_SPACE, "").strip():
+                phrases.append(f'"{term}"')
+        return " ".join(phrases) or None
+
+    @staticmethod
+    def analysis_fields(analysis: Dict[str, Any]) -> Dict[str, str]:
+        """從分析結果取出要索引的文字欄位"""
+        pick = MentionService._pick
+        stock_analyses = [
+            stock for stock in pick(analysis, "stockAnalyses", "stock_analyses") or []
+            if isinstance(stock, dict)
+        ]
+        key_points = []
+        for stock in stock_analyses:
+            points = pick(stock, "keyPoints", "key_points") or []
+            key_points.extend(str(point) for point in points if point)
+        return {
+            "summary": analysis.get("summary") or "",
+            "reasoning": "\n".join(stock.get("reasoning") or "" for stock in stock_analyses),
+            "key_points": "\n".join(key_points),
+            "context_quote": "\n".join(
+                pick(stock, "contextQuote", "context_quote") or "" for stock in stock_analyses
+            ),
+        }
+
+    @staticmethod
+    async def index_video(db: AsyncSession, video_id: str, fields: Dict[str, Optional[str]]):
+        """更新影片在全文索引中的部分欄位（需由呼叫端 commit）"""
+        fields = {key: SearchService.segment(value) for key, value in fields.items() if key in SEARCH_INDEX_COLUMNS}
+        if not fields:
+            return
+
+        await db.execute(sqlite_insert(SearchDocument).values(video_id=video_id).on_conflict_do_nothing())
+        document_id = (await db.execute(
+            select(SearchDocument.id).where(SearchDocument.video_id == video_id)
+        )).scalar_one()
+
+        exists = (await db.execute(
+            text("SELECT 1 FROM search_index WHERE rowid = :id"), {"id": document_id}
+        )).first()
+        if exists:
+            assignments = ", ".join(f"{column} = :{column}" for column in fields)
+            await db.execute(
+                text(f"UPDATE search_index SET {assignments} WHERE rowid = :id"),
+                {**fields, "id": document_id}
+            )
+        else:
+            columns = ", ".join(["rowid", *fields])
+            values = ", ".join([":id", *(f":{column}" for column in fields)])
+            await db.execute(
+                text(f"INSERT INTO search_index ({columns}) VALUES ({values})"),
+                {**fields, "id": document_id}
+            )
+
+    @staticmethod
+    def analysis_video_id(youtube_analysis: Optional[str]) -> Optional[str]:
+        """分析內容對應的影片 ID（無法解析或沒有影片 URL 時為 None）"""
+        analysis = MentionService.load_analysis(youtube_analysis)
+        video_url = MentionService._pick(analysis, "videoUrl", "video_url") if analysis else None
+        return YouTubeService.extract_video_id(video_url) if isinstance(video_url, str) else None
+
+    @staticmethod
+    async def index_analysis(db: AsyncSession, youtube_analysis: Optional[str]):
+        """
+        將追蹤股票的分析內容寫入全文索引（無影片 URL 時略過）
+
+        影片的逐字稿已保存（見 TranscriptService）時一併索引；逐字稿 API 不需登入，只在寫入分析時才進入索引
+        """
+        video_id = SearchService.analysis_video_id(youtube_analysis)
+        if not video_id:
+            return
+        analysis = MentionService.load_analysis(youtube_analysis)
+
+        fields = SearchService.analysis_fields(analysis)
+        title = MentionService._pick(analysis, "videoTitle", "video_title")
+        if title:
+            fields["title"] = title
+        transcript = (await db.execute(select(Transcript.text).where(Transcript.video_id == video_id))).scalar()
+        if transcript:
+            fields["transcript"] = transcript
+        await SearchService.index_video(db, video_id, fields)
+
+    @staticmethod
+    async def remove_analyses(db: AsyncSession, youtube_analyses: Iterable[Optional[str]]):
+        """
+        分析被刪除（引用數歸零）後更新全文索引（需在刪除 analysis_blobs 與提及之後、於同一交易中呼叫）
+
+        同一影片還有其他使用者引用的分析時改以該分析重新索引；沒有時清除分析欄位，
+        連逐字稿也沒有的文件整筆刪除
+        """
+        video_ids = {SearchService.analysis_video_id(content) for content in youtube_analyses} - {None}
+        for video_id in sorted(video_ids):
+            remaining = (await db.execute(
+                select(AnalysisBlob.content)
+                .join(StockMention, StockMention.analysis_hash == AnalysisBlob.hash)
+                .where(StockMention.video_id == video_id)
+                .limit(1)
+            )).scalar()
+            if remaining is not None:
+                await SearchService.index_analysis(db, remaining)
+                continue
+
+            document_id = (await db.execute(
+                select(SearchDocument.id).where(SearchDocument.video_id == video_id)
+            )).scalar()
+            if document_id is None:
+                continue
+            has_transcript = (await db.execute(
+                text("SELECT 1 FROM search_index WHERE rowid = :id AND coalesce(transcript, '') != ''"),
+                {"id": document_id}
+            )).first()
+            if has_transcript:
+                assignments = ", ".join(f"{column} = ''" for column in ANALYSIS_COLUMNS)
+                await db.execute(text(f"UPDATE search_index SET {assignments} WHERE rowid = :id"), {"id": document_id})
+            else:
+                await db.execute(text("DELETE FROM search_index WHERE rowid = :id"), {"id": document_id})
+                await db.execute(delete(SearchDocument).where(SearchDocument.id == document_id))
+
+    @staticmethod
+    async def optimize(db: AsyncSession):
+        """合併 FTS5 索引區段，適合在大量寫入（例如回填）後執行"""
+        await db.execute(text("INSERT INTO search_index(search_index) VALUES ('optimize')"))
+
+    @staticmethod
+    async def search(db: AsyncSession, query: str, limit: int) -> List[Dict[str, Any]]:
+        """依 BM25 排序搜尋影片，並回傳標示關鍵字的摘錄"""
+        match = SearchService.build_query(query)
+        if not match:
+            return []
+
+        weights = ", ".join(str(weight) for weight in SEARCH_COLUMN_WEIGHTS)
+        result = await db.execute(
+            text(
+                "SELECT d.video_id, "
+                f"bm25(search_index, {weights}) AS rank, "
+                "snippet(search_index, -1, '<mark>', '</mark>', '…', 24) AS snippet "
+                "FROM search_index JOIN search_documents d ON d.id = search_index.rowid "
+                "WHERE search_index MATCH :match "
+                "ORDER BY rank LIMIT :limit"
+            ),
+            {"match": match, "limit": limit}
+        )
+        return [
+            {
+                "video_id": row.video_id,
+                "score": -row.rank,
+                "snippet": row.snippet.replace(ZERO_WIDTH_SPACE, "").replace("</mark><mark>", ""),
+            }
+            for row in result.all()
+        ]
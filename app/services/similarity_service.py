@@ -0,0 +1,104 @@
+import hashlib
+import os
+import re
+import zlib
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from shared_state import shared_store
+
+# 逐字稿相似度（估計的 Jaccard 係數）達到此值時沿用既有的分析；0 表示停用
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+
+# MinHash：以連續 5 個字元為一個 shingle（中文逐字稿沒有空白分詞）
+SHINGLE_SIZE = 5
+# LSH 分為 20 段、每段 5 個雜湊值：相似度 0.8 的逐字稿幾乎一定會在某一段落入同一個桶，0.3 以下幾乎不會
+MINHASH_BANDS = 20
+MINHASH_ROWS = 5
+MINHASH_PERMUTATIONS = MINHASH_BANDS * MINHASH_ROWS
+# 每次查詢最多比對的候選數（依相同的段數排序）
+MAX_CANDIDATES = 20
+# 一次計算的 shingle 數，限制暫存陣列的大小
+SHINGLE_CHUNK_SIZE = 4096
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def _hash_parameters(name: str) -> np.ndarray:
+    # signature 會存入共用儲存，所有 worker 與重新啟動後都必須使用相同的雜湊函數，因此不使用亂數
+    return np.array(
+        [int.from_bytes(hashlib.sha256(f"minhash:{name}:{i}".encode()).digest()[:8], "little") for i in range(MINHASH_PERMUTATIONS)],
+        dtype=np.uint64,
+    )
+
+# multiply-shift 雜湊：((a * x + b) mod 2^64) >> 32，a 為奇數
+_MULTIPLIERS = _hash_parameters("a") | np.uint64(1)
+_OFFSETS = _hash_parameters("b")
+
+class TranscriptSimilarityService:
+    """
+    以 MinHash + LSH 找出內容幾乎相同的逐字稿（重新上傳、其他頻道轉載），沿用已完成的分析
+
+    索引存放在 shared_store：每份逐字稿寫入各段的桶（鍵為 lsh:band:段:桶:逐字稿雜湊）與 signature，
+    查詢只需對每一段做一次主鍵範圍查詢，成本與已索引的逐字稿數量無關
+    """
+
+    @staticmethod
+    def signature(transcript: str) -> Optional[np.ndarray]:
+        """逐字稿的 MinHash signature；忽略大小寫、空白與標點，太短時回傳 None"""
+        text = _NON_WORD.sub("", transcript.lower())
+        if len(text) < SHINGLE_SIZE:
+            return None
+        shingles = np.fromiter(
+            {zlib.crc32(text[i:i + SHINGLE_SIZE].encode()) for i in range(len(text) - SHINGLE_SIZE + 1)},
+            dtype=np.uint64,
+        )
+        signature = np.full(MINHASH_PERMUTATIONS, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(shingles), SHINGLE_CHUNK_SIZE):
+            chunk = shingles[start:start + SHINGLE_CHUNK_SIZE]
+            hashed = (_MULTIPLIERS[:, None] * chunk[None, :] + _OFFSETS[:, None]) >> np.uint64(32)
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        """兩個 signature 相同位置相等的比例，即 Jaccard 係數的估計值"""
+        return float(np.mean(a == b))
+
+    @staticmethod
+    def _band_prefixes(signature: np.ndarray) -> List[str]:
+        return [
+            f"lsh:band:{band}:"
+            + hashlib.blake2b(signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS].tobytes(), digest_size=8).hexdigest()
+            + ":"
+            for band in range(MINHASH_BANDS)
+        ]
+
+    @staticmethod
+    async def find_similar(signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        """找出最相似且達到門檻的已索引逐字稿，回傳 (逐字稿雜湊, 相似度)"""
+        entries = await shared_store.scan(TranscriptSimilarityService._band_prefixes(signature))
+        if not entries:
+            return None
+        # 落入同一個桶的段數越多越可能相似，先比對這些候選
+        counts = Counter(key.rsplit(":", 1)[1] for key in entries)
+        candidates = [transcript_hash for transcript_hash, _ in counts.most_common(MAX_CANDIDATES)]
+        stored = await shared_store.get_many(f"lsh:sig:{transcript_hash}" for transcript_hash in candidates)
+
+        best = None
+        for transcript_hash in candidates:
+            candidate = stored.get(f"lsh:sig:{transcript_hash}")
+            if candidate is None:
+                continue
+            similarity = TranscriptSimilarityService.similarity(signature, np.array(candidate, dtype=np.uint32))
+            if similarity >= NEAR_DUPLICATE_THRESHOLD and (best is None or similarity > best[1]):
+                best = (transcript_hash, similarity)
+        return best
+
+    @staticmethod
+    async def index(transcript_hash: str, signature: np.ndarray, ttl: Optional[float]):
+        """將逐字稿加入索引；ttl 與分析結果的快取相同，分析過期後索引一併失效"""
+        items = {prefix + transcript_hash: 1 for prefix in TranscriptSimilarityService._band_prefixes(signature)}
+        items[f"lsh:sig:{transcript_hash}"] = signature.tolist()
+        await shared_store.set_many(items, ttl)
@@ -0,0 +1,98 @@
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.auth_models import PortfolioSummaryBucket
+from services.mention_service import MentionService
+
+# 彙總桶：(維度, 鍵值, 起始價)
+Bucket = Tuple[str, str, float]
+
+class SummaryService:
+    """維護每位使用者的追蹤清單彙總（股票數、幣別合計、情緒分布）"""
+
+    @staticmethod
+    def stock_sentiment(symbol: str, youtube_analysis: Optional[str]) -> str:
+        """取得追蹤股票的情緒：優先使用該股票的分析，其次是影片整體情緒"""
+        analysis = MentionService.load_analysis(youtube_analysis)
+        if not analysis:
+            return "none"
+        for mention in MentionService.extract_mentions(analysis):
+            if mention["source"] == "stock_analysis" and mention["symbol"] == symbol.strip().upper():
+                return mention["sentiment"] or "none"
+        return MentionService._pick(analysis, "overallSentiment", "overall_sentiment") or "none"
+
+    @staticmethod
+    def buckets(symbol: str, currency: str, start_price: float, youtube_analysis: Optional[str]) -> List[Bucket]:
+        """一筆追蹤股票對彙總的貢獻"""
+        return [
+            ("stocks", "all", start_price),
+            ("currency", currency, start_price),
+            ("sentiment", SummaryService.stock_sentiment(symbol, youtube_analysis), 0.0),
+        ]
+
+    @staticmethod
+    def stock_buckets(stock: Any) -> List[Bucket]:
+        """由 UserStock（或具相同屬性的物件）計算彙總貢獻"""
+        return SummaryService.buckets(stock.symbol, stock.currency, stock.start_price, stock.youtube_analysis)
+
+    @staticmethod
+    def aggregate(changes: Iterable[Tuple[int, List[Bucket]]]) -> Dict[Tuple[str, str], List[float]]:
+        """合併多筆 (增減, 貢獻) 為每個彙總桶的 [數量變化, 金額變化]"""
+        totals: Dict[Tuple[str, str], List[float]] = {}
+        for delta, buckets in changes:
+            for dimension, key, price in buckets:
+                entry = totals.setdefault((dimension, key), [0, 0.0])
+                entry[0] += delta
+                entry[1] += delta * price
+        return totals
+
+    @staticmethod
+    def bucket_rows(user_id: int, changes: Iterable[Tuple[int, List[Bucket]]]) -> List[Dict[str, Any]]:
+        """合併後有變化的彙總桶，格式為 portfolio_summary_buckets 的資料列"""
+        return [
+            {"user_id": user_id, "dimension": dimension, "key": key, "count": count, "total_start_price": total}
+            for (dimension, key), (count, total) in SummaryService.aggregate(changes).items()
+            if count or total
+        ]
+
+    @staticmethod
+    async def apply(db: AsyncSession, user_id: int, changes: Iterable[Tuple[int, List[Bucket]]]):
+        """以遞增方式更新彙總（需在與追蹤清單異動相同的交易中 commit）"""
+        rows = SummaryService.bucket_rows(user_id, changes)
+        if not rows:
+            return
+
+        statement = sqlite_insert(PortfolioSummaryBucket)
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id", "dimension", "key"],
+            set_={
+                "count": PortfolioSummaryBucket.count + statement.excluded.count,
+                "total_start_price": PortfolioSummaryBucket.total_start_price + statement.excluded.total_start_price,
+            },
+        )
+        await db.execute(statement, rows)
+        await db.execute(delete(PortfolioSummaryBucket).where(
+            PortfolioSummaryBucket.user_id == user_id,
+            PortfolioSummaryBucket.count <= 0
+        ))
+
+    @staticmethod
+    async def load(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+        """讀取使用者彙總，成本只與彙總桶數量有關"""
+        result = await db.execute(
+            select(PortfolioSummaryBucket).where(PortfolioSummaryBucket.user_id == user_id)
+        )
+        summary = {"stock_count": 0, "currencies": {}, "sentiments": {}}
+        for bucket in result.scalars():
+            if bucket.dimension == "stocks":
+                summary["stock_count"] = bucket.count
+            elif bucket.dimension == "currency":
+                summary["currencies"][bucket.key] = {
+                    "count": bucket.count,
+                    "total_start_price": round(bucket.total_start_price, 4),
+                }
+            elif bucket.dimension == "sentiment":
+                summary["sentiments"][bucket.key] = bucket.count
+        return summary
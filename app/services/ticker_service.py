@@ -0,0 +1,221 @@
+import logging
+import mmap
+import os
+import re
+import struct
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics import TICKER_UNIVERSE_SYMBOLS, TICKER_VALIDATION
+
+logger = logging.getLogger(__name__)
+
+# 股票代號與公司別名資料檔（由 build_tickers.py 產生）；檔案不存在時只檢查代號格式
+TICKER_UNIVERSE_PATH = os.getenv(
+    "TICKER_UNIVERSE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "tickers.bin")
+)
+
+# 美股代號格式：1-5 個大寫字母，可能帶一碼股份類別（BRK.B）
+SYMBOL_PATTERN = re.compile(r"[A-Z]{1,5}(\.[A-Z])?")
+# 股份類別的各種寫法（BRK-B、BRK/B、BRK B）統一為 BRK.B
+_CLASS_SEPARATOR = re.compile(r"^([A-Z]{1,5})[-/ ]([A-Z])$")
+
+_NON_WORD = re.compile(r"[\W_]+")
+# 公司名稱結尾的法人類型，比對別名時略過（"Apple Inc." 與 "Apple" 視為相同）
+_NAME_SUFFIXES = re.compile(
+    r"(\s+|,)(inc|incorporated|corp|corporation|co|company|ltd|limited|plc|holdings?|group|sa|nv|ag|se)\.?$"
+    r"|(股份有限公司|有限公司|公司|集團|控股)$"
+)
+
+# 檔案格式（little-endian）：標頭、代號項目、別名項目、代號雜湊槽、別名雜湊槽、UTF-8 字串區
+#   項目為 (字串位置, 字串長度, 值)：代號項目的值不使用，別名項目的值為代號項目的索引
+#   雜湊槽以 crc32 定址、線性探測，內容為項目索引 + 1（0 表示空槽），槽數為 2 的次方且至少為項目數的兩倍
+MAGIC = b"KTKR"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIIII")
+_ENTRY = struct.Struct("<III")
+_SLOT = struct.Struct("<I")
+
+def normalize_symbol(symbol: str) -> str:
+    """代號去除空白、$ 前綴與交易所前綴（NASDAQ:NVDA），轉大寫並統一股份類別的寫法"""
+    symbol = symbol.strip().upper().rpartition(":")[2].strip().lstrip("$")
+    return _CLASS_SEPARATOR.sub(r"\1.\2", symbol)
+
+def alias_key(name: str) -> str:
+    """公司名稱的比對鍵：全半形統一、不分大小寫，略過法人類型、空白與標點"""
+    name = unicodedata.normalize("NFKC", name).casefold().strip()
+    while True:
+        stripped = _NAME_SUFFIXES.sub("", name).strip()
+        if stripped == name or not stripped:
+            break
+        name = stripped
+    return _NON_WORD.sub("", name)
+
+def _slot_count(entries: int) -> int:
+    slots = 8
+    while slots < entries * 2:
+        slots *= 2
+    return slots
+
+class TickerUniverse:
+    """
+    以 mmap 讀取的代號與別名表：查詢直接讀檔案頁面，不建立 Python 物件，
+    多個 worker 共用作業系統的同一份頁面快取
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.symbol_count, self._symbol_slots, self.alias_count, self._alias_slots = (
+            _HEADER.unpack_from(self._map, 0)
+        )
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"不支援的代號資料檔: {path}")
+        self._symbol_entries = _HEADER.size
+        self._alias_entries = self._symbol_entries + self.symbol_count * _ENTRY.size
+        self._symbol_table = self._alias_entries + self.alias_count * _ENTRY.size
+        self._alias_table = self._symbol_table + self._symbol_slots * _SLOT.size
+        self._pool = self._alias_table + self._alias_slots * _SLOT.size
+
+    @staticmethod
+    def build(symbols: Iterable[str], aliases: Dict[str, str]) -> bytes:
+        """
+        產生資料檔內容；symbols 為正規化後的代號，aliases 為 alias_key → 代號（代號不在 symbols 中的別名略過）
+        """
+        symbols = sorted(set(symbols))
+        symbol_index = {symbol: index for index, symbol in enumerate(symbols)}
+        alias_items = sorted((key, symbol_index[symbol]) for key, symbol in aliases.items() if symbol in symbol_index)
+
+        pool = bytearray()
+
+        def entries_and_slots(items: List[Tuple[bytes, int]]) -> Tuple[bytes, bytes]:
+            entries = bytearray()
+            slots = [0] * _slot_count(len(items))
+            mask = len(slots) - 1
+            for index, (key, value) in enumerate(items):
+                entries += _ENTRY.pack(len(pool), len(key), value)
+                pool.extend(key)
+                slot = zlib.crc32(key) & mask
+                while slots[slot]:
+                    slot = (slot + 1) & mask
+                slots[slot] = index + 1
+            return bytes(entries), struct.pack(f"<{len(slots)}I", *slots)
+
+        symbol_entries, symbol_slots = entries_and_slots([(symbol.encode(), index) for index, symbol in enumerate(symbols)])
+        alias_entries, alias_slots = entries_and_slots([(key.encode(), value) for key, value in alias_items])
+        header = _HEADER.pack(
+            MAGIC, VERSION, 0, len(symbols), len(symbol_slots) // _SLOT.size, len(alias_items), len(alias_slots) // _SLOT.size
+        )
+        return header + symbol_entries + alias_entries + symbol_slots + alias_slots + bytes(pool)
+
+    def _find(self, key: bytes, entries: int, table: int, slots: int) -> Optional[int]:
+        """雜湊表查詢，回傳項目索引（平均 O(1)）"""
+        if not slots:
+            return None
+        mask = slots - 1
+        pool = self._pool
+        slot = zlib.crc32(key) & mask
+        while True:
+            (value,) = _SLOT.unpack_from(self._map, table + slot * _SLOT.size)
+            if not value:
+                return None
+            offset, length, _ = _ENTRY.unpack_from(self._map, entries + (value - 1) * _ENTRY.size)
+            if length == len(key) and self._map[pool + offset:pool + offset + length] == key:
+                return value - 1
+            slot = (slot + 1) & mask
+
+    def _symbol_at(self, index: int) -> str:
+        offset, length, _ = _ENTRY.unpack_from(self._map, self._symbol_entries + index * _ENTRY.size)
+        pool = self._pool + offset
+        return self._map[pool:pool + length].decode()
+
+    def __contains__(self, symbol: str) -> bool:
+        return self._find(symbol.encode(), self._symbol_entries, self._symbol_table, self._symbol_slots) is not None
+
+    def lookup_alias(self, name: str) -> Optional[str]:
+        """公司名稱（或中文簡稱）對應的代號"""
+        key = alias_key(name)
+        if not key:
+            return None
+        index = self._find(key.encode(), self._alias_entries, self._alias_table, self._alias_slots)
+        if index is None:
+            return None
+        _, _, symbol_index = _ENTRY.unpack_from(self._map, self._alias_entries + index * _ENTRY.size)
+        return self._symbol_at(symbol_index)
+
+    def close(self):
+        self._map.close()
+
+_universe: Optional[TickerUniverse] = None
+_loaded = False
+
+class TickerService:
+    """驗證並正規化 Gemini 回傳的股票代號，以公司名稱補上代號"""
+
+    @staticmethod
+    def load() -> Optional[TickerUniverse]:
+        """開啟資料檔（只做 mmap，不讀入內容）；檔案不存在或格式不符時停用，只檢查代號格式"""
+        global _universe, _loaded
+        if _universe is not None:
+            _universe.close()
+        try:
+            _universe = TickerUniverse(TICKER_UNIVERSE_PATH)
+        except FileNotFoundError:
+            _universe = None
+            logger.warning(
+                "找不到代號資料檔 %s（請執行 python build_tickers.py），只檢查代號格式", TICKER_UNIVERSE_PATH
+            )
+        except (OSError, ValueError, struct.error) as e:
+            _universe = None
+            logger.warning("無法載入代號資料檔 %s：%s，只檢查代號格式", TICKER_UNIVERSE_PATH, e)
+        _loaded = True
+        TICKER_UNIVERSE_SYMBOLS.set(_universe.symbol_count if _universe else 0)
+        return _universe
+
+    @staticmethod
+    def universe() -> Optional[TickerUniverse]:
+        if not _loaded:
+            TickerService.load()
+        return _universe
+
+    @staticmethod
+    def resolve(symbol: Optional[str], company_name: Optional[str] = None) -> Optional[str]:
+        """
+        回傳正規化後的代號，無法確認時為 None
+
+        有資料檔時代號必須存在於資料檔中；代號不存在時（例如 Gemini 編造或寫成中文名稱），
+        依序以代號欄位與公司名稱查詢別名
+        """
+        if not symbol or not isinstance(symbol, str):
+            return None
+        normalized = normalize_symbol(symbol)
+        universe = TickerService.universe()
+        if universe is None:
+            return normalized if SYMBOL_PATTERN.fullmatch(normalized) else None
+
+        if SYMBOL_PATTERN.fullmatch(normalized) and normalized in universe:
+            TICKER_VALIDATION.inc(("valid" if normalized == symbol else "normalized",))
+            return normalized
+        # 分隔符號被省略的股份類別（BRKB）
+        if len(normalized) > 2 and normalized.isalpha():
+            with_class = f"{normalized[:-1]}.{normalized[-1]}"
+            if SYMBOL_PATTERN.fullmatch(with_class) and with_class in universe:
+                TICKER_VALIDATION.inc(("normalized",))
+                return with_class
+        for name in (symbol, company_name):
+            resolved = universe.lookup_alias(name) if name else None
+            if resolved is not None:
+                TICKER_VALIDATION.inc(("alias",))
+                return resolved
+        TICKER_VALIDATION.inc(("rejected",))
+        return None
+
+    @staticmethod
+    def symbol_for_company(company_name: Optional[str]) -> Optional[str]:
+        """公司名稱對應的代號；沒有資料檔或查無別名時為 None"""
+        universe = TickerService.universe()
+        if universe is None or not company_name:
+            return None
+        return universe.lookup_alias(company_name)
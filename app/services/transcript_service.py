@@ -0,0 +1,147 @@
+import base64
+import re
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.analysis_models import Transcript
+
+# 引文少於此字數（不含空白與標點）時不定位，太短容易對到錯誤的位置
+MIN_QUOTE_CHARS = 4
+# 引文整段找不到時（Gemini 依格式要求加了空白或改寫部分字詞），改以此長度的片段定位
+QUOTE_ANCHOR_CHARS = 8
+
+_NON_WORD = re.compile(r"[\W_]+")
+# 比對時略過兩個字之間的空白、換行與標點
+_GAP = r"[\W_]*"
+
+def _little_endian(values: array) -> array:
+    # 以 little-endian 儲存，不同機器讀到的內容相同
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+class SegmentIndex:
+    """
+    逐字稿的分段：全文為一個字串（各段以換行連接，與 TextFormatter 的輸出相同），
+    各段的開始秒數（float32）與在全文中的起始位置（uint32）各存成一個 typed array，
+    由字元位置以二分搜尋找出所在的段與時間
+    """
+    __slots__ = ("text", "starts", "offsets")
+
+    def __init__(self, text: str, starts: array, offsets: array):
+        self.text = text
+        self.starts = starts
+        self.offsets = offsets
+
+    @classmethod
+    def from_snippets(cls, snippets: Iterable[Tuple[str, float]]) -> "SegmentIndex":
+        """由 (文字, 開始秒數) 建立"""
+        texts = []
+        starts = array("f")
+        offsets = array("I")
+        position = 0
+        for text, start in snippets:
+            texts.append(text)
+            starts.append(start)
+            offsets.append(position)
+            position += len(text) + 1
+        return cls("\n".join(texts), starts, offsets)
+
+    def encode(self) -> Dict[str, str]:
+        """兩個 typed array 的 base64（寫入 JSON 快取用）"""
+        return {
+            "starts": base64.b64encode(_little_endian(self.starts).tobytes()).decode(),
+            "offsets": base64.b64encode(_little_endian(self.offsets).tobytes()).decode(),
+        }
+
+    @classmethod
+    def from_bytes(cls, text: str, starts: bytes, offsets: bytes) -> "SegmentIndex":
+        start_values = array("f", starts)
+        offset_values = array("I", offsets)
+        return cls(text, _little_endian(start_values), _little_endian(offset_values))
+
+    @classmethod
+    def decode(cls, text: str, encoded: Dict[str, str]) -> "SegmentIndex":
+        return cls.from_bytes(text, base64.b64decode(encoded["starts"]), base64.b64decode(encoded["offsets"]))
+
+    def timestamp_at(self, offset: int) -> Optional[float]:
+        """字元位置所在段的開始秒數（二分搜尋，O(log n)）"""
+        if not self.offsets:
+            return None
+        index = max(bisect_right(self.offsets, offset) - 1, 0)
+        return float(self.starts[index])
+
+    def locate(self, quote: str) -> Optional[int]:
+        """
+        引文在全文中的位置，忽略大小寫、空白與標點；整段找不到時改用引文中的片段，
+        由前往後取第一個找得到的片段的位置
+        """
+        chars = _NON_WORD.sub("", quote)
+        if len(chars) < MIN_QUOTE_CHARS:
+            return None
+        windows = [chars] + [
+            chars[start:start + QUOTE_ANCHOR_CHARS]
+            for start in range(0, len(chars) - QUOTE_ANCHOR_CHARS + 1, QUOTE_ANCHOR_CHARS)
+        ]
+        for window in windows:
+            match = re.search(_GAP.join(map(re.escape, window)), self.text, re.IGNORECASE)
+            if match:
+                return match.start()
+        return None
+
+    def quote_timestamp(self, quote: Optional[str]) -> Optional[float]:
+        """引文在影片中出現的秒數，找不到時為 None"""
+        offset = self.locate(quote) if quote else None
+        return self.timestamp_at(offset) if offset is not None else None
+
+class TranscriptService:
+    """保存逐字稿分段，並為分析結果中的引文加上影片時間連結"""
+
+    @staticmethod
+    async def save(db: AsyncSession, video_id: str, language: Optional[str], segments: SegmentIndex):
+        """寫入或更新逐字稿分段（需由呼叫端 commit）"""
+        values = {
+            "video_id": video_id,
+            "language": language,
+            "text": segments.text,
+            "starts": _little_endian(segments.starts).tobytes(),
+            "offsets": _little_endian(segments.offsets).tobytes(),
+        }
+        statement = sqlite_insert(Transcript).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=["video_id"],
+            set_={key: statement.excluded[key] for key in values if key != "video_id"},
+        )
+        await db.execute(statement)
+
+    @staticmethod
+    async def load(db: AsyncSession, video_id: str) -> Optional[SegmentIndex]:
+        result = await db.execute(
+            select(Transcript.text, Transcript.starts, Transcript.offsets).where(Transcript.video_id == video_id)
+        )
+        row = result.first()
+        return SegmentIndex.from_bytes(row.text, row.starts, row.offsets) if row else None
+
+    @staticmethod
+    def deep_link(video_id: str, seconds: float) -> str:
+        return f"https://www.youtube.com/watch?v={video_id}&t={int(seconds)}s"
+
+    @staticmethod
+    def annotate(analysis: Dict[str, Any], segments: SegmentIndex, video_id: str):
+        """
+        為每個提及加上 quote_timestamp（秒）與 quote_url（從該時間開始播放的連結）
+
+        個股分析以 context_quote 定位，其餘提及的公司以 context 定位
+        """
+        items = [(item, item.get("context_quote")) for item in analysis.get("stock_analyses") or []]
+        items += [(company, company.get("context")) for company in analysis.get("mentioned_companies") or []]
+        for item, quote in items:
+            seconds = segments.quote_timestamp(quote)
+            item["quote_timestamp"] = seconds
+            item["quote_url"] = TranscriptService.deep_link(video_id, seconds) if seconds is not None else None
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import WriteSessionLocal
+from metrics import GEMINI_TOKENS, USAGE_RECORDS
+from models.analysis_models import ModelCall
+
+# Gemini 每百萬 token 的價格（美元），只用於估算費用；預設為 gemini-1.5-flash（128K 以內）的牌價
+GEMINI_PRICE_INPUT = float(os.getenv("GEMINI_PRICE_INPUT", "0.075"))
+GEMINI_PRICE_OUTPUT = float(os.getenv("GEMINI_PRICE_OUTPUT", "0.30"))
+GEMINI_PRICE_CACHED = float(os.getenv("GEMINI_PRICE_CACHED", "0.01875"))
+
+# 呼叫紀錄先暫存在行程內，每隔幾秒批次寫入，不佔用請求的處理時間
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "5"))
+USAGE_BATCH_SIZE = 500
+# 資料庫暫時無法寫入時最多保留的筆數，超過即捨棄
+USAGE_BUFFER_LIMIT = 10000
+
+# 可彙總的維度
+GROUP_COLUMNS = {
+    "day": func.date(ModelCall.created_at),
+    "user": ModelCall.user_id,
+    "api_key": ModelCall.api_key_hash,
+    "model": ModelCall.model,
+    "prompt_version": ModelCall.prompt_version,
+    "source": ModelCall.source,
+}
+
+# 尚未寫入的紀錄（每個 worker 各自一份）
+_pending: List[Dict[str, Any]] = []
+
+class UsageService:
+    """記錄每次模型呼叫的 token 用量、延遲與結果，並依日期、使用者、API key 等維度彙總"""
+
+    @staticmethod
+    def key_hash(api_key: Optional[str]) -> Optional[str]:
+        """API key 的雜湊（與配額相同，不保存原始 key）"""
+        return hashlib.sha256(api_key.encode()).hexdigest()[:32] if api_key else None
+
+    @staticmethod
+    def token_counts(response_data: Dict[str, Any]) -> Dict[str, Optional[int]]:
+        """從 Gemini 回應的 usageMetadata 取出 token 數"""
+        usage = response_data.get("usageMetadata") or {}
+        if not usage:
+            return {}
+        return {
+            "prompt_tokens": usage.get("promptTokenCount"),
+            "output_tokens": usage.get("candidatesTokenCount"),
+            "cached_tokens": usage.get("cachedContentTokenCount", 0),
+            "total_tokens": usage.get("totalTokenCount"),
+        }
+
+    @staticmethod
+    def record(call: Dict[str, Any]):
+        """加入一筆呼叫紀錄（只寫入記憶體，由 run_usage_writer 批次寫入資料庫）"""
+        for kind in ("prompt", "output", "cached"):
+            if call.get(f"{kind}_tokens"):
+                GEMINI_TOKENS.inc((kind,), call[f"{kind}_tokens"])
+        if len(_pending) >= USAGE_BUFFER_LIMIT:
+            USAGE_RECORDS.inc(("dropped",))
+            return
+        _pending.append({"created_at": datetime.now(timezone.utc), **call})
+
+    @staticmethod
+    async def flush() -> int:
+        """寫入目前暫存的紀錄，回傳寫入筆數；失敗時未寫入的紀錄留到下次"""
+        rows = _pending[:]
+        del _pending[:]
+        written = 0
+        try:
+            for start in range(0, len(rows), USAGE_BATCH_SIZE):
+                async with WriteSessionLocal() as db:
+                    await db.execute(insert(ModelCall), rows[start:start + USAGE_BATCH_SIZE])
+                    await db.commit()
+                written = min(len(rows), start + USAGE_BATCH_SIZE)
+        finally:
+            if written < len(rows):
+                USAGE_RECORDS.inc(("retry",), len(rows) - written)
+                _pending[:0] = rows[written:][:USAGE_BUFFER_LIMIT]
+            if written:
+                USAGE_RECORDS.inc(("written",), written)
+        return written
+
+    @staticmethod
+    def _period_filters(since: Optional[date], until: Optional[date]) -> list:
+        filters = []
+        if since is not None:
+            filters.append(ModelCall.created_at >= datetime.combine(since, time.min))
+        if until is not None:
+            filters.append(ModelCall.created_at < datetime.combine(until + timedelta(days=1), time.min))
+        return filters
+
+    @staticmethod
+    def estimated_cost(prompt_tokens: int, output_tokens: int, cached_tokens: int) -> float:
+        """估算費用（美元）：快取命中的 prompt token 以快取價格計算"""
+        return (
+            (prompt_tokens - cached_tokens) * GEMINI_PRICE_INPUT
+            + cached_tokens * GEMINI_PRICE_CACHED
+            + output_tokens * GEMINI_PRICE_OUTPUT
+        ) / 1_000_000
+
+    @staticmethod
+    async def summary(
+        db: AsyncSession, group_by: str, since: Optional[date], until: Optional[date], limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        依維度彙總呼叫數、失敗數、token 數、延遲與估算費用
+
+        依日期彙總時由新到舊，其餘維度依 token 總數由多到少（花費最多的排在前面）
+        """
+        key = GROUP_COLUMNS[group_by]
+        prompt_tokens = func.coalesce(func.sum(ModelCall.prompt_tokens), 0)
+        output_tokens = func.coalesce(func.sum(ModelCall.output_tokens), 0)
+        cached_tokens = func.coalesce(func.sum(ModelCall.cached_tokens), 0)
+        total_tokens = func.coalesce(func.sum(ModelCall.total_tokens), 0)
+        result = await db.execute(
+            select(
+                key.label("key"),
+                func.count().label("calls"),
+                func.sum(case((ModelCall.outcome != "ok", 1), else_=0)).label("errors"),
+                prompt_tokens.label("prompt_tokens"),
+                output_tokens.label("output_tokens"),
+                cached_tokens.label("cached_tokens"),
+                total_tokens.label("total_tokens"),
+                func.avg(ModelCall.prompt_tokens).label("avg_prompt_tokens"),
+                func.max(ModelCall.prompt_tokens).label("max_prompt_tokens"),
+                func.avg(ModelCall.latency_ms).label("avg_latency_ms"),
+                func.max(ModelCall.latency_ms).label("max_latency_ms"),
+            )
+            .where(*UsageService._period_filters(since, until))
+            .group_by(key)
+            .order_by(key.desc() if group_by == "day" else total_tokens.desc())
+            .limit(limit)
+        )
+        return [
+            {
+                **row._asdict(),
+                "key": str(row.key) if row.key is not None else None,
+                "estimated_cost": UsageService.estimated_cost(row.prompt_tokens, row.output_tokens, row.cached_tokens),
+            }
+            for row in result.all()
+        ]
+
+    @staticmethod
+    async def largest_calls(
+        db: AsyncSession, since: Optional[date], until: Optional[date], limit: int
+    ) -> List[ModelCall]:
+        """prompt token 數最多的呼叫（找出過長的逐字稿與 prompt）"""
+        result = await db.execute(
+            select(ModelCall)
+            .where(ModelCall.prompt_tokens.is_not(None), *UsageService._period_filters(since, until))
+            .order_by(ModelCall.prompt_tokens.desc())
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+async def run_usage_writer():
+    """背景定期寫入呼叫紀錄；應用關閉時由 lifespan 再呼叫一次 flush 寫入剩餘的紀錄"""
+    while True:
+        await asyncio.sleep(USAGE_FLUSH_INTERVAL)
+        try:
+            await UsageService.flush()
+        except Exception:
+            # 紀錄已放回暫存，下一輪重試
+            pass
@@ -0,0 +1,66 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.auth_models import UserDataVersion
+
+class VersionService:
+    """每位使用者的資料版本號與對應的弱 ETag（If-None-Match 時回傳 304）"""
+
+    @staticmethod
+    async def get(db: AsyncSession, user_id: int) -> int:
+        """取得目前版本號，尚未有寫入紀錄時為 0"""
+        result = await db.execute(
+            select(UserDataVersion.version).where(UserDataVersion.user_id == user_id)
+        )
+        return result.scalar() or 0
+
+    @staticmethod
+    async def bump(db: AsyncSession, user_id: int):
+        """版本號加一（需由呼叫端在同一個交易中 commit）"""
+        statement = sqlite_insert(UserDataVersion).values(user_id=user_id, version=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={"version": UserDataVersion.version + 1},
+        )
+        await db.execute(statement)
+
+    @staticmethod
+    def etag(user_id: int, version: int, variant: str = "") -> str:
+        """組出弱 ETag；variant 用來區分同一資源的不同表示（例如分頁、欄位）"""
+        tag = f"{user_id}-{version}"
+        if variant:
+            tag += "-" + hashlib.sha1(variant.encode("utf-8")).hexdigest()[:12]
+        return f'W/"{tag}"'
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], etag: str) -> bool:
+        """依弱比對規則檢查 If-None-Match 是否包含目前的 ETag"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        opaque = etag.removeprefix("W/")
+        return any(
+            candidate.strip().removeprefix("W/") == opaque
+            for candidate in if_none_match.split(",")
+        )
+
+    @staticmethod
+    async def check(
+        request: Request, response: Response, db: AsyncSession, user_id: int, variant: str = ""
+    ) -> Optional[Response]:
+        """
+        設定回應的 ETag；若用戶端快取仍有效則回傳 304 回應，否則回傳 None
+
+        需在讀取資源之前呼叫：版本號先讀、資料後讀，ETag 永遠不會比資料新
+        """
+        etag = VersionService.etag(user_id, await VersionService.get(db, user_id), variant)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if VersionService.matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+        return None
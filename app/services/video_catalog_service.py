@@ -0,0 +1,35 @@
+from datetime import datetime
+from typing import Dict, Any, Optional
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.analysis_models import Video
+
+class VideoCatalogService:
+    """保存影片所屬頻道與發布時間，供準確度評分使用"""
+
+    @staticmethod
+    def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+
+    @staticmethod
+    async def upsert_video(db: AsyncSession, metadata: Dict[str, Any]):
+        """寫入或更新影片資訊（需由呼叫端 commit）"""
+        row = {
+            "video_id": metadata["video_id"],
+            "channel_id": metadata.get("channel_id"),
+            "channel_title": metadata.get("channel_title"),
+            "title": metadata.get("title"),
+            "published_at": VideoCatalogService._parse_datetime(metadata.get("published_at")),
+        }
+        statement = sqlite_insert(Video).values(**row)
+        statement = statement.on_conflict_do_update(
+            index_elements=["video_id"],
+            set_={key: statement.excluded[key] for key in row if key != "video_id"},
+        )
+        await db.execute(statement)
@@ -1,11 +1,49 @@
+import asyncio
+import hashlib
+import os
 import re
 import json
-from typing import Optional, Dict, Any
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api.formatters import TextFormatter
-import httpx
+from typing import Optional, Dict, Any, List
 from fastapi import HTTPException
 
+from deadline import detached, time_left
+from metrics import UpstreamCall
+from shared_state import shared_store
+
+# 快取秒數（跨 worker 共用，0 表示不快取）
+TRANSCRIPT_CACHE_TTL = int(os.getenv("TRANSCRIPT_CACHE_TTL", "86400"))
+METADATA_CACHE_TTL = int(os.getenv("METADATA_CACHE_TTL", "3600"))
+
+# 外部服務位址，可用環境變數指向本機替身服務（壓測用）
+YOUTUBE_API_URL = os.getenv("YOUTUBE_API_URL", "https://www.googleapis.com/youtube/v3")
+YOUTUBE_BASE_URL = os.getenv("YOUTUBE_BASE_URL")
+
+# videos.list 每次最多可查詢的影片數
+VIDEOS_LIST_BATCH_SIZE = 50
+
+# 逐字稿套件每次 HTTP 請求的逾時秒數上限（套件本身不設逾時）
+TRANSCRIPT_REQUEST_TIMEOUT = 10.0
+
+def _transcript_session(base_url: Optional[str]):
+    """
+    逐字稿套件使用的 requests Session：每次請求依目前請求的剩餘時間設定逾時；
+    設定 base_url 時將對 www.youtube.com 的請求改送到該位址
+    """
+    from requests import Session
+
+    session = Session()
+    base_url = base_url.rstrip("/") if base_url else None
+    send = session.request
+
+    def request(method, url, *args, **kwargs):
+        if base_url and url.startswith("https://www.youtube.com"):
+            url = base_url + url[len("https://www.youtube.com"):]
+        kwargs.setdefault("timeout", time_left(TRANSCRIPT_REQUEST_TIMEOUT))
+        return send(method, url, *args, **kwargs)
+
+    session.request = request
+    return session
+
 class YouTubeService:
     """YouTube 相關服務類"""
     
@@ -36,114 +74,198 @@ class YouTubeService:
                     'error': '無效的 YouTube URL'
                 }
             
-            # 嘗試獲取逐字稿（優先中文，其次英文）
-            try:
-                ytt_api = YouTubeTranscriptApi()
-                transcript_list = ytt_api.list(video_id)
-                
-                # 嘗試獲取逐字稿的優先順序
-                transcript = None
-                
-                # 1. 優先中文
-                for lang in ['zh-TW', 'zh-CN', 'zh']:
-                    try:
-                        transcript = transcript_list.find_transcript([lang])
-                        break
-                    except:
-                        continue
-                
-                # 2. 其次英文
-                if not transcript:
-                    try:
-                        transcript = transcript_list.find_transcript(['en'])
-                    except:
-                        pass
-                
-                # 3. 最後嘗試任何手動創建的逐字稿
-                if not transcript:
-                    try:
-                        transcript = transcript_list.find_manually_created_transcript(['zh-TW', 'zh-CN', 'zh', 'en'])
-                    except:
-                        pass
-                
-                # 4. 最後嘗試任何自動生成的逐字稿
-                if not transcript:
-                    try:
-                        transcript = transcript_list.find_generated_transcript(['zh-TW', 'zh-CN', 'zh', 'en'])
-                    except:
-                        pass
-                
-                # 5. 如果還是沒有，嘗試獲取任何可用的逐字稿
-                if not transcript:
-                    try:
-                        # 獲取所有可用的逐字稿語言
-                        available_transcripts = list(transcript_list)
-                        if available_transcripts:
-                            transcript = available_transcripts[0]  # 使用第一個可用的
-                        else:
-                            return {
-                                'success': False,
-                                'error': '此影片沒有可用的逐字稿'
-                            }
-                    except:
+            if TRANSCRIPT_CACHE_TTL > 0:
+                cached = await shared_store.get(f"transcript:{video_id}")
+                if cached is not None:
+                    return cached
+                # 結果會寫入共用快取，用戶端中斷連線時仍抓取完成
+                return await detached(YouTubeService._fetch_transcript(video_id))
+            
+            return await YouTubeService._fetch_transcript(video_id)
+        
+        except HTTPException:
+            raise
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'處理 YouTube URL 時發生錯誤：{str(e)}'
+            }
+
+    @staticmethod
+    async def _fetch_transcript(video_id: str) -> Dict[str, Any]:
+        """抓取逐字稿並寫入快取（逐字稿套件是同步的，在工作執行緒中執行，不阻塞事件迴圈）"""
+        # 逐字稿套件連同 requests 載入約需 0.1 秒，第一次抓取時才匯入，不拖慢啟動
+        from requests.exceptions import Timeout
+        from youtube_transcript_api import YouTubeTranscriptApi
+        from services.transcript_service import SegmentIndex
+        
+        # 嘗試獲取逐字稿（優先中文，其次英文）
+        try:
+            ytt_api = YouTubeTranscriptApi(http_client=_transcript_session(YOUTUBE_BASE_URL))
+            with UpstreamCall("youtube_transcript"):
+                transcript_list = await asyncio.to_thread(ytt_api.list, video_id)
+            
+            # 嘗試獲取逐字稿的優先順序
+            transcript = None
+            
+            # 1. 優先中文
+            for lang in ['zh-TW', 'zh-CN', 'zh']:
+                try:
+                    transcript = transcript_list.find_transcript([lang])
+                    break
+                except:
+                    continue
+            
+            # 2. 其次英文
+            if not transcript:
+                try:
+                    transcript = transcript_list.find_transcript(['en'])
+                except:
+                    pass
+            
+            # 3. 最後嘗試任何手動創建的逐字稿
+            if not transcript:
+                try:
+                    transcript = transcript_list.find_manually_created_transcript(['zh-TW', 'zh-CN', 'zh', 'en'])
+                except:
+                    pass
+            
+            # 4. 最後嘗試任何自動生成的逐字稿
+            if not transcript:
+                try:
+                    transcript = transcript_list.find_generated_transcript(['zh-TW', 'zh-CN', 'zh', 'en'])
+                except:
+                    pass
+            
+            # 5. 如果還是沒有，嘗試獲取任何可用的逐字稿
+            if not transcript:
+                try:
+                    # 獲取所有可用的逐字稿語言
+                    available_transcripts = list(transcript_list)
+                    if available_transcripts:
+                        transcript = available_transcripts[0]  # 使用第一個可用的
+                    else:
                         return {
                             'success': False,
                             'error': '此影片沒有可用的逐字稿'
                         }
-                
-                # 獲取逐字稿數據
-                transcript_data = transcript.fetch()
-                
-                # 格式化為純文字
-                formatter = TextFormatter()
-                transcript_text = formatter.format_transcript(transcript_data)
-                
-                # 檢查逐字稿是否為空
-                if not transcript_text or len(transcript_text.strip()) < 10:
+                except:
                     return {
                         'success': False,
-                        'error': '獲取的逐字稿內容過短或為空'
+                        'error': '此影片沒有可用的逐字稿'
                     }
-                
+            
+            # 獲取逐字稿數據
+            with UpstreamCall("youtube_transcript"):
+                transcript_data = await asyncio.to_thread(transcript.fetch)
+            
+            # 全文以換行連接各段（與 TextFormatter 相同），並保留各段的開始時間
+            segments = SegmentIndex.from_snippets((snippet.text, snippet.start) for snippet in transcript_data)
+            transcript_text = segments.text
+            
+            # 檢查逐字稿是否為空
+            if not transcript_text or len(transcript_text.strip()) < 10:
                 return {
-                    'success': True,
-                    'transcript': transcript_text,
-                    'language': transcript.language_code,
-                    'video_id': video_id
+                    'success': False,
+                    'error': '獲取的逐字稿內容過短或為空'
                 }
-                
-            except Exception as e:
-                error_msg = str(e)
-                if "Could not retrieve a transcript" in error_msg:
-                    return {
-                        'success': False,
-                        'error': '此影片沒有可用的逐字稿（可能是私人影片、已刪除或不支援逐字稿）'
-                    }
-                elif "no element found" in error_msg:
-                    return {
-                        'success': False,
-                        'error': '影片無法存取或已被移除'
-                    }
-                else:
-                    return {
-                        'success': False,
-                        'error': f'獲取逐字稿時發生錯誤：{error_msg}'
-                    }
-                
+            
+            result = {
+                'success': True,
+                'transcript': transcript_text,
+                'language': transcript.language_code,
+                'video_id': video_id,
+                'segments': segments.encode()
+            }
+            if TRANSCRIPT_CACHE_TTL > 0:
+                await shared_store.set(f"transcript:{video_id}", result, TRANSCRIPT_CACHE_TTL)
+            return result
+            
+        except HTTPException:
+            raise
+        except Timeout:
+            raise HTTPException(
+                status_code=504,
+                detail="YouTube 回應逾時，請稍後再試"
+            )
         except Exception as e:
-            return {
-                'success': False,
-                'error': f'處理 YouTube URL 時發生錯誤：{str(e)}'
+            error_msg = str(e)
+            if "Could not retrieve a transcript" in error_msg:
+                return {
+                    'success': False,
+                    'error': '此影片沒有可用的逐字稿（可能是私人影片、已刪除或不支援逐字稿）'
+                }
+            elif "no element found" in error_msg:
+                return {
+                    'success': False,
+                    'error': '影片無法存取或已被移除'
+                }
+            else:
+                return {
+                    'success': False,
+                    'error': f'獲取逐字稿時發生錯誤：{error_msg}'
+                }
+
+    @staticmethod
+    def _metadata_result(video_id: str, snippet: Dict[str, Any]) -> Dict[str, Any]:
+        """將 videos.list 的 snippet 格式化為元數據回應"""
+        metadata = {
+            "video_id": video_id,
+            "title": snippet.get('title', '無標題'),
+            "published_at": snippet.get('publishedAt'),
+            "description": snippet.get('description', ''),
+            "channel_title": snippet.get('channelTitle', '未知頻道'),
+            "channel_id": snippet.get('channelId'),
+            "thumbnails": {
+                "default": snippet.get('thumbnails', {}).get('default', {"url": ""}),
+                "medium": snippet.get('thumbnails', {}).get('medium', {"url": ""}),
+                "high": snippet.get('thumbnails', {}).get('high', {"url": ""})
             }
+        }
+        
+        return {
+            'success': True,
+            'metadata': metadata,
+            'publish_date': snippet.get('publishedAt')
+        }
+
+    @staticmethod
+    def _key_marker(api_key: str) -> str:
+        """API key 曾成功呼叫 YouTube Data API 的標記（不保存原始 key）"""
+        return "youtube:key:" + hashlib.sha256(api_key.encode()).hexdigest()[:32]
 
     @staticmethod
     async def get_video_metadata(video_id: str, api_key: str) -> Dict[str, Any]:
-        """使用 YouTube Data API v3 獲取影片元數據"""
+        """
+        使用 YouTube Data API v3 獲取影片元數據
+
+        快取只提供給 METADATA_CACHE_TTL 內曾成功呼叫過 API 的 key；其他 key（包含無效的 key）
+        一律實際呼叫 API，不會以伺服器或其他使用者的配額取得結果
+        """
+        if METADATA_CACHE_TTL > 0:
+            if await shared_store.get(YouTubeService._key_marker(api_key)):
+                cached = await shared_store.get(f"metadata:{video_id}")
+                if cached is not None:
+                    return cached
+            # 結果會寫入共用快取，用戶端中斷連線時仍完成呼叫
+            return await detached(YouTubeService._fetch_video_metadata(video_id, api_key))
+        
+        return await YouTubeService._fetch_video_metadata(video_id, api_key)
+
+    @staticmethod
+    async def _fetch_video_metadata(video_id: str, api_key: str) -> Dict[str, Any]:
+        """呼叫 YouTube Data API 並寫入快取"""
+        # httpx 連同其 CLI 相依套件載入約需 0.2 秒，呼叫外部服務時才匯入
+        import httpx
+        
         try:
-            youtube_api_url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet&id={video_id}&key={api_key}"
+            youtube_api_url = f"{YOUTUBE_API_URL}/videos?part=snippet&id={video_id}&key={api_key}"
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(youtube_api_url)
+            # 逾時不超過請求剩餘的處理時間
+            async with httpx.AsyncClient(timeout=time_left(5.0)) as client:
+                with UpstreamCall("youtube_data_api") as call:
+                    response = await client.get(youtube_api_url)
+                    call.status(response.status_code)
                 
                 if not response.is_success:
                     error_data = {}
@@ -175,6 +297,8 @@ class YouTubeService:
                             detail="YouTube Data API 暫時無法使用"
                         )
                 
+                if METADATA_CACHE_TTL > 0:
+                    await shared_store.set(YouTubeService._key_marker(api_key), True, METADATA_CACHE_TTL)
                 data = response.json()
                 
                 # 檢查是否找到影片
@@ -193,30 +317,88 @@ class YouTubeService:
                         detail="無法獲取影片詳細資訊"
                     )
                 
-                # 格式化回傳資料
-                metadata = {
-                    "video_id": video_id,
-                    "title": snippet.get('title', '無標題'),
-                    "published_at": snippet.get('publishedAt'),
-                    "description": snippet.get('description', ''),
-                    "channel_title": snippet.get('channelTitle', '未知頻道'),
-                    "thumbnails": {
-                        "default": snippet.get('thumbnails', {}).get('default', {"url": ""}),
-                        "medium": snippet.get('thumbnails', {}).get('medium', {"url": ""}),
-                        "high": snippet.get('thumbnails', {}).get('high', {"url": ""})
-                    }
-                }
-                
-                return {
-                    'success': True,
-                    'metadata': metadata,
-                    'publish_date': snippet.get('publishedAt')
-                }
+                result = YouTubeService._metadata_result(video_id, snippet)
+                if METADATA_CACHE_TTL > 0:
+                    await shared_store.set(f"metadata:{video_id}", result, METADATA_CACHE_TTL)
+                return result
                 
         except HTTPException:
             raise
+        except httpx.TimeoutException:
+            raise HTTPException(
+                status_code=504,
+                detail="YouTube 服務回應逾時，請稍後再試"
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=503,
                 detail="無法連接到 YouTube 服務，請檢查網路連線"
-            )
\ No newline at end of file
+            )
+
+    @staticmethod
+    def uploads_playlist_id(channel_id: str) -> str:
+        """頻道的「上傳的影片」播放清單 ID（UC… → UU…），不需另外呼叫 channels.list"""
+        return "UU" + channel_id[2:] if channel_id.startswith("UC") else channel_id
+
+    @staticmethod
+    async def list_playlist_videos(
+        playlist_id: str, api_key: str, max_results: int, etag: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        列出播放清單最新的影片（依加入時間由新到舊）
+
+        帶上前次的 etag 作為條件式請求；清單沒有變動時 API 回傳 304，此時回傳 None
+        """
+        import httpx
+        
+        headers = {"If-None-Match": etag} if etag else {}
+        async with httpx.AsyncClient(timeout=time_left(10.0)) as client:
+            with UpstreamCall("youtube_data_api") as call:
+                response = await client.get(
+                    f"{YOUTUBE_API_URL}/playlistItems",
+                    params={"part": "contentDetails", "playlistId": playlist_id, "maxResults": max_results, "key": api_key},
+                    headers=headers,
+                )
+                call.status(response.status_code)
+        
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        data = response.json()
+        return {
+            "etag": data.get("etag") or response.headers.get("ETag"),
+            "videos": [
+                {
+                    "video_id": item["contentDetails"]["videoId"],
+                    "published_at": item["contentDetails"].get("videoPublishedAt"),
+                }
+                for item in data.get("items", [])
+                if item.get("contentDetails", {}).get("videoId")
+            ],
+        }
+
+    @staticmethod
+    async def get_videos_metadata(video_ids: List[str], api_key: str) -> Dict[str, Dict[str, Any]]:
+        """批次取得多支影片的元數據（每次呼叫最多 50 個 ID）並寫入快取，回傳 影片 ID → 元數據回應"""
+        import httpx
+        
+        results = {}
+        async with httpx.AsyncClient(timeout=time_left(10.0)) as client:
+            for start in range(0, len(video_ids), VIDEOS_LIST_BATCH_SIZE):
+                batch = video_ids[start:start + VIDEOS_LIST_BATCH_SIZE]
+                with UpstreamCall("youtube_data_api") as call:
+                    response = await client.get(
+                        f"{YOUTUBE_API_URL}/videos",
+                        params={"part": "snippet", "id": ",".join(batch), "key": api_key},
+                    )
+                    call.status(response.status_code)
+                response.raise_for_status()
+                
+                for item in response.json().get("items", []):
+                    if not item.get("snippet"):
+                        continue
+                    result = YouTubeService._metadata_result(item["id"], item["snippet"])
+                    if METADATA_CACHE_TTL > 0:
+                        await shared_store.set(f"metadata:{item['id']}", result, METADATA_CACHE_TTL)
+                    results[item["id"]] = result
+        return results
\ No newline at end of file
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# 跨 worker 共用的快取與計數器（獨立的 SQLite 檔案，不與主資料庫的單一寫入連線搶鎖）
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "./kolog-shared.db")
+SHARED_STATE_BUSY_TIMEOUT_MS = int(os.getenv("SHARED_STATE_BUSY_TIMEOUT_MS", "2000"))
+
+# 每次寫入時以此機率順便清除過期資料
+PURGE_PROBABILITY = 0.01
+
+class SharedStore:
+    """
+    以 SQLite 實作的跨行程鍵值儲存，提供帶 TTL 的快取與原子計數器
+
+    多個 uvicorn worker 各自開啟同一個檔案（WAL 模式，讀取不互相阻塞）。每個行程一條連線，
+    操作都很短，以鎖排隊後在執行緒中執行，避免寫鎖等待阻塞事件迴圈
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=SHARED_STATE_BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS shared_state ("
+                "key TEXT PRIMARY KEY, value, expires_at REAL)"
+            )
+            self.connection = connection
+        return self.connection
+
+    def _expires_at(self, ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+
+    def _maybe_purge(self, connection: sqlite3.Connection):
+        if random.random() < PURGE_PROBABILITY:
+            connection.execute("DELETE FROM shared_state WHERE expires_at <= ?", (time.time(),))
+
+    def _get(self, key: str) -> Any:
+        with self.lock:
+            row = self._connect().execute(
+                "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        # incr 寫入的計數器是整數，其餘為 JSON 文字
+        return json.loads(row[0]) if isinstance(row[0], str) else row[0]
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]):
+        with self.lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, json.dumps(value, ensure_ascii=False), self._expires_at(ttl)),
+            )
+            self._maybe_purge(connection)
+
+    def _get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        with self.lock:
+            rows = self._connect().execute(
+                f"SELECT key, value FROM shared_state WHERE key IN ({', '.join('?' * len(keys))}) "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (*keys, time.time()),
+            ).fetchall()
+        return {key: json.loads(value) if isinstance(value, str) else value for key, value in rows}
+
+    def _set_many(self, items: Dict[str, Any], ttl: Optional[float]):
+        expires_at = self._expires_at(ttl)
+        with self.lock:
+            connection = self._connect()
+            # 同一個交易寫入，其他 worker 不會讀到只寫一半的資料
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                    [(key, json.dumps(value, ensure_ascii=False), expires_at) for key, value in items.items()],
+                )
+                self._maybe_purge(connection)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _scan(self, prefixes: Iterable[str]) -> Dict[str, Any]:
+        # 每個前綴是主鍵上的一段範圍查詢：[prefix, 最後一個字元加一)
+        ranges = [(prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)) for prefix in prefixes]
+        if not ranges:
+            return {}
+        with self.lock:
+            rows = self._connect().execute(
+                "SELECT key, value FROM shared_state WHERE ("
+                + " OR ".join("(key >= ? AND key < ?)" for _ in ranges)
+                + ") AND (expires_at IS NULL OR expires_at > ?)",
+                (*(bound for bounds in ranges for bound in bounds), time.time()),
+            ).fetchall()
+        return {key: json.loads(value) if isinstance(value, str) else value for key, value in rows}
+
+    def _delete(self, key: str):
+        with self.lock:
+            self._connect().execute("DELETE FROM shared_state WHERE key = ?", (key,))
+
+    def _incr(self, key: str, amount: int, ttl: Optional[float]) -> int:
+        now = time.time()
+        with self.lock:
+            # 已過期的計數器視為新的視窗，從 amount 重新計算（固定視窗計數）
+            row = self._connect().execute(
+                "INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END, "
+                "expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END "
+                "RETURNING value",
+                (key, amount, self._expires_at(ttl), now, now),
+            ).fetchone()
+        return int(row[0])
+
+    def _take(self, key: str, capacity: float, rate: float, cost: float) -> Tuple[bool, float]:
+        now = time.time()
+        with self.lock:
+            connection = self._connect()
+            # 讀取與寫回在同一個寫入交易中，其他 worker 不會在中間插入
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT value FROM shared_state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                    (key, now),
+                ).fetchone()
+                if row is None:
+                    tokens = capacity
+                else:
+                    stored, updated_at = json.loads(row[0])
+                    tokens = min(capacity, stored + (now - updated_at) * rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                    # 補滿之後與全新的桶相同，到時即可視為過期清除，桶的數量不會無限增長
+                    connection.execute(
+                        "INSERT INTO shared_state (key, value, expires_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                        (key, json.dumps([tokens, now]), now + (capacity - tokens) / rate),
+                    )
+                    self._maybe_purge(connection)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return allowed, tokens
+
+    async def get(self, key: str) -> Any:
+        """取得未過期的值，不存在時回傳 None"""
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """寫入可 JSON 序列化的值；ttl 為秒數，未指定時不過期"""
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """一次取得多個鍵，只回傳存在且未過期的項目"""
+        return await asyncio.to_thread(self._get_many, keys)
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        """在同一個交易中寫入多個鍵，使用相同的 ttl"""
+        await asyncio.to_thread(self._set_many, items, ttl)
+
+    async def scan(self, prefixes: Iterable[str]) -> Dict[str, Any]:
+        """取得以任一前綴開頭的所有未過期項目（前綴不可為空字串）"""
+        return await asyncio.to_thread(self._scan, list(prefixes))
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """原子遞增並回傳新值；ttl 只在計數器建立（或過期後重新開始）時設定"""
+        return await asyncio.to_thread(self._incr, key, amount, ttl)
+
+    async def take(self, key: str, capacity: float, rate: float, cost: float = 1) -> Tuple[bool, float]:
+        """
+        token bucket：桶容量 capacity、每秒補充 rate 個 token，嘗試取出 cost 個
+
+        回傳 (是否允許, 剩餘 token 數)；拒絕時不扣 token
+        """
+        return await asyncio.to_thread(self._take, key, capacity, rate, cost)
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+shared_store = SharedStore(SHARED_STATE_PATH)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+個股提及與全文搜尋資料回填腳本
+解析 analysis_blobs 中的分析 JSON（每份分析一次），分批重建 stock_mentions 資料表與 search_index 全文索引。
+啟動時會自動為尚無提及紀錄的資料庫回填；修改提及的解析方式後可用此腳本重建
+
+使用方式：
+cd kolog-backend
+python backfill_mentions.py [--chunk-size 500]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# 添加 app 目錄到 Python 路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./app/kolog.db")
+
+from sqlalchemy import select
+
+from database import WriteSessionLocal, init_db, close_db
+from models import auth_models, analysis_models
+from models.analysis_models import AnalysisBlob
+from services.mention_service import MentionService
+from services.search_service import SearchService
+
+async def backfill_mentions(chunk_size: int):
+    """依雜湊分批重建所有分析的提及紀錄與全文索引，每批一個交易"""
+    await init_db()
+
+    last_hash = ""
+    processed = 0
+    try:
+        while True:
+            async with WriteSessionLocal() as db:
+                result = await db.execute(
+                    select(AnalysisBlob.hash, AnalysisBlob.content)
+                    .where(AnalysisBlob.hash > last_hash)
+                    .order_by(AnalysisBlob.hash)
+                    .limit(chunk_size)
+                )
+                blobs = result.all()
+                if not blobs:
+                    break
+
+                for analysis_hash, content in blobs:
+                    await MentionService.rebuild(db, analysis_hash, content)
+                    await SearchService.index_analysis(db, content)
+                await db.commit()
+
+            last_hash = blobs[-1].hash
+            processed += len(blobs)
+            print(f"已處理 {processed} 份分析")
+
+        async with WriteSessionLocal() as db:
+            await SearchService.optimize(db)
+            await db.commit()
+    finally:
+        await close_db()
+
+    print(f"\n🎉 回填完成，共處理 {processed} 份分析")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回填 stock_mentions 資料表與全文索引")
+    parser.add_argument("--chunk-size", type=int, default=500, help="每批處理的筆數")
+    args = parser.parse_args()
+
+    print("🔧 回填個股提及與全文搜尋資料...")
+    asyncio.run(backfill_mentions(args.chunk_size))
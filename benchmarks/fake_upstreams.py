@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+壓測用的外部服務替身
+在本機模擬 Gemini generateContent、YouTube Data API videos.list / playlistItems.list（頻道上傳清單）、
+YouTube 逐字稿抓取與 Google tokeninfo，每個服務的延遲、抖動與錯誤率都可以設定
+
+使用方式：
+python benchmarks/fake_upstreams.py --port 9100 --latency-ms 50 --profile gemini=800:100:0.02
+（profile 格式：服務名稱=延遲毫秒[:抖動毫秒[:錯誤率]]）
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import socket
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+UPSTREAMS = ["gemini", "gemini_key_check", "youtube_data_api", "youtube_transcript", "google_tokeninfo"]
+
+# 逐字稿與分析結果使用的股票
+SYMBOLS = ["NVDA", "AAPL", "MSFT", "TSLA", "AMD", "GOOGL", "AMZN", "META", "TSM", "AVGO"]
+
+# 以此開頭的 API key 視為無效（與正式 API 相同，Gemini 回傳 400、YouTube Data API 回傳 403）
+INVALID_KEY_PREFIX = "invalid"
+
+TRANSCRIPT_LINE = "今天我們來聊聊資料中心資本支出，AI 伺服器需求非常強勁，{symbol} 的營收成長值得關注"
+
+
+@dataclass
+class UpstreamProfile:
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+
+
+def parse_profiles(specs: List[str], default: UpstreamProfile) -> Dict[str, UpstreamProfile]:
+    """解析 服務名稱=延遲[:抖動[:錯誤率]] 格式的設定"""
+    profiles = {name: UpstreamProfile(default.latency_ms, default.jitter_ms, default.error_rate) for name in UPSTREAMS}
+    for spec in specs or []:
+        name, _, values = spec.partition("=")
+        if name not in profiles:
+            raise ValueError(f"未知的服務: {name}（可用: {', '.join(UPSTREAMS)}）")
+        parts = [float(value) for value in values.split(":") if value]
+        profile = profiles[name]
+        if len(parts) > 0:
+            profile.latency_ms = parts[0]
+        if len(parts) > 1:
+            profile.jitter_ms = parts[1]
+        if len(parts) > 2:
+            profile.error_rate = parts[2]
+    return profiles
+
+
+def create_app(
+    profiles: Dict[str, UpstreamProfile], seed: int = 0, transcript_lines: int = 400, upload_interval: float = 60.0
+):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, HTMLResponse, Response
+
+    app = FastAPI()
+    rng = random.Random(seed)
+    # 頻道上傳清單：啟動時每個頻道已有 3 支影片，之後每 upload_interval 秒新增一支
+    feed_started = time.time()
+
+    async def simulate(name: str) -> Optional[Response]:
+        """依設定延遲回應；依錯誤率回傳 503"""
+        profile = profiles[name]
+        delay = max(profile.latency_ms + rng.uniform(-profile.jitter_ms, profile.jitter_ms), 0.0)
+        await asyncio.sleep(delay / 1000)
+        if rng.random() < profile.error_rate:
+            return JSONResponse({"error": {"code": 503, "message": "injected failure"}}, status_code=503)
+        return None
+
+    def invalid_gemini_key(key: str) -> Optional[Response]:
+        if key.startswith(INVALID_KEY_PREFIX):
+            return JSONResponse({"error": {"code": 400, "message": "API key not valid."}}, status_code=400)
+        return None
+
+    @app.get("/gemini/model")
+    async def get_model(key: str):
+        failure = await simulate("gemini_key_check")
+        if failure:
+            return failure
+        return invalid_gemini_key(key) or {"name": "models/gemini-1.5-flash-fake"}
+
+    @app.post("/gemini/generateContent")
+    async def generate_content(request: Request, key: str):
+        # 先讀本文再延遲，呼叫端在延遲期間中斷連線時不會出現讀取錯誤
+        body = await request.json()
+        failure = await simulate("gemini")
+        if failure:
+            return failure
+        invalid = invalid_gemini_key(key)
+        if invalid:
+            return invalid
+        prompt = body["contents"][0]["parts"][0]["text"]
+        picked = [symbol for symbol in SYMBOLS if symbol in prompt] or SYMBOLS[:3]
+        analysis = {
+            "videoTitle": "AI 伺服器供應鏈解析",
+            "summary": "影片討論資料中心資本支出與 AI 伺服器需求。",
+            "stockAnalyses": [
+                {
+                    "symbol": symbol,
+                    "companyName": f"{symbol} Inc.",
+                    "mentionType": "PRIMARY" if index == 0 else "MENTION",
+                    "sentiment": ("bullish", "bearish", "neutral")[index % 3],
+                    "confidence": 60 + index * 5 % 40,
+                    "reasoning": "營收成長與毛利率改善，管理層上調全年展望。",
+                    "keyPoints": ["資料中心需求強勁", "毛利率改善"],
+                    "identificationReason": "影片中明確提及",
+                    "contextQuote": TRANSCRIPT_LINE.format(symbol=symbol),
+                }
+                for index, symbol in enumerate(picked[:5])
+            ],
+            "mentionedCompanies": [
+                {"companyName": "台積電", "context": "供應鏈提及", "mentionType": "MENTION", "confidence": 30}
+            ],
+            "overallSentiment": "bullish",
+        }
+        text = "```json\n" + json.dumps(analysis, ensure_ascii=False) + "\n```"
+        # token 數以字元數粗估（中文約一字一 token）
+        usage = {"promptTokenCount": len(prompt), "candidatesTokenCount": len(text), "totalTokenCount": len(prompt) + len(text)}
+        return {"candidates": [{"content": {"parts": [{"text": text}]}}], "usageMetadata": usage, "modelVersion": "gemini-1.5-flash-fake"}
+
+    def snippet(video_id: str) -> dict:
+        index = sum(map(ord, video_id))
+        thumbnail = {"url": f"https://i.ytimg.com/vi/{video_id}/default.jpg"}
+        return {
+            "title": f"美股盤後解析 #{index % 1000}",
+            "publishedAt": f"2024-0{1 + index % 6}-1{index % 10}T12:00:00Z",
+            "description": "每日美股重點整理",
+            "channelTitle": f"財經頻道 {index % 20}",
+            "channelId": f"UCbench{index % 20:04d}",
+            "thumbnails": {"default": thumbnail, "medium": thumbnail, "high": thumbnail},
+        }
+
+    @app.get("/youtube/v3/videos")
+    async def videos_list(id: str, key: str):
+        failure = await simulate("youtube_data_api")
+        if failure:
+            return failure
+        if key.startswith(INVALID_KEY_PREFIX):
+            return JSONResponse({"error": {"code": 403, "message": "API key not valid."}}, status_code=403)
+        # 與正式 API 相同，可一次查詢以逗號分隔的多個 ID
+        return {"items": [{"id": video_id, "snippet": snippet(video_id)} for video_id in id.split(",")]}
+
+    @app.get("/youtube/v3/playlistItems")
+    async def playlist_items(request: Request, playlistId: str, key: str, maxResults: int = 5):
+        failure = await simulate("youtube_data_api")
+        if failure:
+            return failure
+        count = 3 + int((time.time() - feed_started) / upload_interval)
+        etag = f'"{playlistId}-{count}"'
+        # 條件式請求：清單沒有新影片時回傳 304
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304)
+        items = []
+        for n in range(count - 1, max(count - maxResults, 0) - 1, -1):
+            published = time.gmtime(feed_started - (count - 1 - n) * upload_interval)
+            items.append({"contentDetails": {
+                "videoId": f"{playlistId[-4:]}u{n:06d}",
+                "videoPublishedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", published),
+            }})
+        return JSONResponse({"etag": etag, "items": items}, headers={"ETag": etag})
+
+    @app.get("/tokeninfo")
+    async def tokeninfo(id_token: str):
+        failure = await simulate("google_tokeninfo")
+        if failure:
+            return failure
+        return {
+            "aud": "bench-client",
+            "email": f"{id_token}@bench.kolog.com",
+            "sub": f"google-{id_token}",
+            "name": f"Google 用戶 {id_token}",
+            "picture": "https://example.com/avatar.png",
+        }
+
+    # 逐字稿套件的三個步驟：影片頁面 → innertube player → 字幕 XML
+    @app.get("/watch")
+    async def watch(v: str):
+        failure = await simulate("youtube_transcript")
+        if failure:
+            return failure
+        return HTMLResponse(f'<html><script>var ytcfg = {{"INNERTUBE_API_KEY": "benchkey"}};</script>{v}</html>')
+
+    @app.post("/youtubei/v1/player")
+    async def player(request: Request):
+        video_id = (await request.json())["videoId"]
+        failure = await simulate("youtube_transcript")
+        if failure:
+            return failure
+        return {
+            "playabilityStatus": {"status": "OK"},
+            "captions": {"playerCaptionsTracklistRenderer": {
+                "captionTracks": [{
+                    "baseUrl": f"https://www.youtube.com/api/timedtext?v={video_id}&lang=zh-TW",
+                    "name": {"runs": [{"text": "中文（台灣）"}]},
+                    "languageCode": "zh-TW",
+                    "isTranslatable": False,
+                }],
+                "translationLanguages": [],
+            }},
+        }
+
+    @app.get("/api/timedtext")
+    async def timedtext(v: str):
+        failure = await simulate("youtube_transcript")
+        if failure:
+            return failure
+        lines = "".join(
+            f'<text start="{i * 4}" dur="4">{TRANSCRIPT_LINE.format(symbol=SYMBOLS[i % len(SYMBOLS)])}</text>'
+            for i in range(transcript_lines)
+        )
+        return Response(f'<?xml version="1.0" encoding="utf-8" ?><transcript>{lines}</transcript>', media_type="text/xml")
+
+    return app
+
+
+def serve(port: int, profiles: Dict[str, UpstreamProfile], seed: int, transcript_lines: int, upload_interval: float = 60.0):
+    import uvicorn
+    uvicorn.run(
+        create_app(profiles, seed, transcript_lines, upload_interval), host="127.0.0.1", port=port, log_level="warning"
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start(
+    profiles: Dict[str, UpstreamProfile], seed: int = 0, transcript_lines: int = 400, port: Optional[int] = None,
+    upload_interval: float = 60.0,
+):
+    """在獨立行程啟動替身服務，回傳 (行程, base URL)；與被測應用分開，避免互搶事件迴圈與 GIL"""
+    port = port or free_port()
+    process = multiprocessing.Process(
+        target=serve, args=(port, profiles, seed, transcript_lines, upload_interval), daemon=True
+    )
+    process.start()
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("替身服務啟動逾時")
+
+
+def upstream_env(base_url: str) -> Dict[str, str]:
+    """讓應用改用替身服務的環境變數"""
+    return {
+        "GEMINI_API_URL": f"{base_url}/gemini/generateContent",
+        "GEMINI_MODEL_URL": f"{base_url}/gemini/model",
+        "YOUTUBE_API_URL": f"{base_url}/youtube/v3",
+        "YOUTUBE_BASE_URL": base_url,
+        "GOOGLE_TOKENINFO_URL": f"{base_url}/tokeninfo",
+        "GOOGLE_CLIENT_ID": "bench-client",
+    }
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="外部服務預設延遲（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="外部服務預設延遲抖動（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="外部服務預設錯誤率（0–1）")
+    parser.add_argument("--profile", action="append", default=[],
+                        help="個別服務設定，格式 服務名稱=延遲[:抖動[:錯誤率]]，可重複指定")
+    parser.add_argument("--transcript-lines", type=int, default=400, help="替身逐字稿的行數")
+    parser.add_argument("--upload-interval", type=float, default=60.0, help="替身頻道每隔幾秒上傳一支新影片")
+
+
+def profiles_from_args(args) -> Dict[str, UpstreamProfile]:
+    return parse_profiles(args.profile, UpstreamProfile(args.latency_ms, args.jitter_ms, args.error_rate))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="壓測用外部服務替身")
+    parser.add_argument("--port", type=int, default=9100, help="監聽埠號")
+    parser.add_argument("--seed", type=int, default=0, help="延遲與錯誤注入的亂數種子")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    for name, value in upstream_env(f"http://127.0.0.1:{args.port}").items():
+        print(f"{name}={value}")
+    serve(args.port, profiles_from_args(args), args.seed, args.transcript_lines, args.upload_interval)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+回應序列化微基準測試
+比較三種輸出路徑的耗時：
+- default：FastAPI 以 response_model 重新驗證後，以標準庫 json 輸出（原本的路徑）
+- orjson：同樣重新驗證，改以 orjson 輸出（應用預設的 ORJSONResponse）
+- model：直接序列化已驗證的模型，不再驗證（ModelResponse）
+
+使用方式：
+python benchmarks/serialization.py --stocks 2000 --analyses 20 --rounds 200
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models.schemas import AnalysisResponse, UserStockListItem
+from responses import ModelResponse
+
+
+def build_analysis(count: int) -> AnalysisResponse:
+    """建立含 count 支股票分析的 Gemini 分析結果"""
+    return AnalysisResponse(success=True, analysis={
+        "video_title": "美股盤後解析：AI 伺服器供應鏈全面看多",
+        "summary": "影片討論資料中心資本支出與 AI 伺服器需求。" * 10,
+        "stock_analyses": [
+            {
+                "symbol": f"SYM{i}",
+                "company_name": f"公司 {i}",
+                "mention_type": "PRIMARY" if i == 0 else "MENTION",
+                "sentiment": ("bullish", "bearish", "neutral")[i % 3],
+                "confidence": 50 + i % 50,
+                "reasoning": "營收成長與毛利率改善，管理層上調全年展望。" * 5,
+                "key_points": [f"重點 {j}：資料中心需求強勁" for j in range(5)],
+                "identification_reason": "影片中明確提及股票代號",
+                "context_quote": "我們認為這家公司明年的成長會非常驚人",
+            }
+            for i in range(count)
+        ],
+        "mentioned_companies": [
+            {"company_name": f"供應商 {i}", "context": "供應鏈提及", "mention_type": "MENTION", "confidence": 30}
+            for i in range(count)
+        ],
+        "overall_sentiment": "bullish",
+        "video_url": "https://www.youtube.com/watch?v=abcdefghijk",
+        "analyzed_at": datetime(2024, 6, 3, 10, 0, 0).isoformat(),
+    })
+
+
+def build_watchlist(count: int) -> List[dict]:
+    """建立與追蹤清單 API 相同形狀的資料列（預設欄位，不含 youtube_analysis）"""
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i + 1,
+            "symbol": f"SYM{i}",
+            "company_name": f"Company {i} Holdings",
+            "custom_name": None if i % 2 else f"自選 {i}",
+            "start_tracking_date": start + timedelta(days=i % 365),
+            "start_price": 100.0 + i * 0.37,
+            "currency": "USD" if i % 3 else "TWD",
+            "created_at": start + timedelta(days=i % 365, hours=1),
+            "updated_at": None,
+        }
+        for i in range(count)
+    ]
+
+
+async def time_path(render, rounds: int) -> List[float]:
+    """重複執行 render 並回傳每次耗時（毫秒）"""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await render()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def benchmark(name: str, response_model, content, rounds: int, exclude_unset: bool = False):
+    field = create_response_field(name=f"Response_{name}", type_=response_model)
+
+    async def validated():
+        return await serialize_response(field=field, response_content=content, exclude_unset=exclude_unset)
+
+    async def default_path():
+        return JSONResponse(await validated()).body
+
+    async def orjson_path():
+        return ORJSONResponse(await validated()).body
+
+    async def model_path():
+        return ModelResponse(content).body
+
+    size = len(await model_path())
+    print(f"\n{name}（{size / 1024:.1f} KiB）")
+    baseline = None
+    for label, render in (("default", default_path), ("orjson", orjson_path), ("model", model_path)):
+        timings = await time_path(render, rounds)
+        median = statistics.median(timings)
+        baseline = baseline or median
+        print(f"  {label:<8} 中位數 {median:8.3f} ms  p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:8.3f} ms  "
+              f"({baseline / median:4.1f}x)")
+
+
+async def main(args):
+    await benchmark("GeminiAnalysisResult", AnalysisResponse, build_analysis(args.analyses), args.rounds)
+    await benchmark("watchlist", List[UserStockListItem], build_watchlist(args.stocks), args.rounds, exclude_unset=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="回應序列化微基準測試")
+    parser.add_argument("--stocks", type=int, default=2000, help="追蹤清單筆數")
+    parser.add_argument("--analyses", type=int, default=20, help="分析結果中的股票數")
+    parser.add_argument("--rounds", type=int, default=200, help="每種路徑的重複次數")
+    asyncio.run(main(parser.parse_args()))
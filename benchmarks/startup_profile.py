@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+啟動時間剖析腳本
+量測匯入 main 的時間（依套件與應用模組拆解）、lifespan 啟動時間，以及從啟動 uvicorn 到第一個請求
+可以成功回應的總時間；超過預算或相較基準退步太多時以非零狀態碼結束，可放在 CI 中執行
+
+使用方式：
+python benchmarks/startup_profile.py
+python benchmarks/startup_profile.py --runs 5 --output startup.json
+python benchmarks/startup_profile.py --ready-budget-ms 1500 --baseline startup.json --max-regression-pct 20
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+# 應用本身的模組（其餘視為第三方套件或標準函式庫）
+APP_PACKAGES = {
+    name[:-3] if name.endswith(".py") else name
+    for name in os.listdir(APP_DIR)
+    if not name.startswith("__") and (name.endswith(".py") or os.path.isdir(os.path.join(APP_DIR, name)))
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+# 在子行程中量測匯入與 lifespan 的時間
+PHASES_SCRIPT = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+import main
+imported = time.perf_counter()
+
+async def lifespan():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(lifespan())
+print(json.dumps({{"import_ms": (imported - started) * 1000, "lifespan_ms": (ready - imported) * 1000}}))
+"""
+
+
+def app_env(workdir: str) -> Dict[str, str]:
+    """使用暫存資料庫，避免動到正式資料"""
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'kolog.db')}",
+        "SHARED_STATE_PATH": os.path.join(workdir, "kolog-shared.db"),
+    }
+
+
+def import_breakdown(workdir: str) -> Dict[str, List[Dict]]:
+    """以 -X importtime 取得每個模組的匯入時間"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.insert(0, {APP_DIR!r}); import main"],
+        cwd=workdir, env=app_env(workdir), capture_output=True, text=True, check=True,
+    )
+    packages: Dict[str, float] = defaultdict(float)
+    app_modules = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), len(match[3]), match[4]
+        root = name.split(".")[0]
+        # 各套件自身模組的執行時間加總（不含它匯入的其他套件）
+        packages[root] += self_us / 1000
+        if root in APP_PACKAGES:
+            app_modules.append({"module": name, "depth": (indent - 1) // 2, "cumulative_ms": round(cumulative_us / 1000, 1)})
+
+    return {
+        "packages": [
+            {"package": name, "self_ms": round(ms, 1)}
+            for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        ],
+        "app_modules": app_modules,
+    }
+
+
+def measure_phases(workdir: str) -> Dict[str, float]:
+    completed = subprocess.run(
+        [sys.executable, "-c", PHASES_SCRIPT.format(app_dir=APP_DIR)],
+        cwd=workdir, env=app_env(workdir), capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def health_ok(port: int) -> bool:
+    """以原始 socket 發送健康檢查，避免量測行程本身載入 HTTP 套件"""
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.5) as sock:
+            sock.sendall(b"GET /health HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n")
+            return sock.recv(64).startswith(b"HTTP/1.1 200")
+    except OSError:
+        return False
+
+
+def measure_ready(workdir: str, timeout: float = 60.0) -> float:
+    """從啟動 uvicorn 到 /health 回應 200 的毫秒數"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", APP_DIR,
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=app_env(workdir),
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if health_ok(port):
+                return (time.perf_counter() - started) * 1000
+            if process.poll() is not None:
+                raise RuntimeError("伺服器啟動失敗")
+            time.sleep(0.005)
+        raise RuntimeError("伺服器啟動逾時")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KOLOG 啟動時間剖析")
+    parser.add_argument("--runs", type=int, default=5, help="重複量測次數（取中位數）")
+    parser.add_argument("--top", type=int, default=15, help="列出匯入時間最長的前幾個套件")
+    parser.add_argument("--import-budget-ms", type=float, help="匯入 main 的時間上限")
+    parser.add_argument("--ready-budget-ms", type=float, help="啟動到第一個請求成功的時間上限")
+    parser.add_argument("--baseline", help="基準結果 JSON，與之比較是否退步")
+    parser.add_argument("--max-regression-pct", type=float, default=20.0, help="相較基準允許的退步百分比")
+    parser.add_argument("--output", help="結果 JSON 檔案路徑")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="kolog-startup-")
+    # 第一次執行會建立資料表與 .pyc，不列入量測
+    measure_phases(workdir)
+
+    breakdown = import_breakdown(workdir)
+    phases = [measure_phases(workdir) for _ in range(args.runs)]
+    ready = [measure_ready(workdir) for _ in range(args.runs)]
+    summary = {
+        "import_ms": round(statistics.median(phase["import_ms"] for phase in phases), 1),
+        "lifespan_ms": round(statistics.median(phase["lifespan_ms"] for phase in phases), 1),
+        "ready_ms": round(statistics.median(ready), 1),
+        "ready_min_ms": round(min(ready), 1),
+    }
+
+    print("匯入時間最長的套件（自身模組執行時間，不含其匯入的其他套件）")
+    for item in breakdown["packages"][:args.top]:
+        marker = "*" if item["package"] in APP_PACKAGES else " "
+        print(f"  {marker} {item['package']:<28} {item['self_ms']:>8.1f} ms")
+    print("應用模組（累計時間，含其匯入的套件）")
+    for item in breakdown["app_modules"]:
+        if item["cumulative_ms"] >= 5:
+            print(f"    {'  ' * item['depth']}{item['module']:<{40 - 2 * item['depth']}} {item['cumulative_ms']:>8.1f} ms")
+    print(
+        f"\n匯入 main {summary['import_ms']:.1f} ms，lifespan 啟動 {summary['lifespan_ms']:.1f} ms，"
+        f"啟動到第一個請求成功 {summary['ready_ms']:.1f} ms（最快 {summary['ready_min_ms']:.1f} ms，{args.runs} 次中位數）"
+    )
+
+    failures = []
+    if args.import_budget_ms is not None and summary["import_ms"] > args.import_budget_ms:
+        failures.append(f"匯入時間 {summary['import_ms']:.1f} ms 超過預算 {args.import_budget_ms:.0f} ms")
+    if args.ready_budget_ms is not None and summary["ready_ms"] > args.ready_budget_ms:
+        failures.append(f"啟動時間 {summary['ready_ms']:.1f} ms 超過預算 {args.ready_budget_ms:.0f} ms")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["summary"]
+        for key in ("import_ms", "ready_ms"):
+            limit = baseline[key] * (1 + args.max_regression_pct / 100)
+            if summary[key] > limit:
+                failures.append(
+                    f"{key} {summary[key]:.1f} ms 較基準 {baseline[key]:.1f} ms 退步超過 {args.max_regression_pct:.0f}%"
+                )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "runs": {"phases": phases, "ready_ms": ready}, **breakdown}, f,
+                      ensure_ascii=False, indent=2)
+        print(f"結果已寫入 {args.output}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+"""
+全路由壓測套件
+以本機替身取代 Gemini、YouTube 與 Google tokeninfo，在行程內以 ASGI 驅動應用，
+依序對每個路由在指定的並發數下量測吞吐量、p50/p95/p99 延遲與記憶體，結果存成 JSON 以便比較
+
+使用方式：
+python benchmarks/suite.py --concurrency 1,10,50 --requests 500 --output results.json
+python benchmarks/suite.py --scenarios user_stocks.list,search --profile gemini=800:200:0.05
+python benchmarks/suite.py --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_upstreams  # noqa: E402
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+REPO_DIR = os.path.dirname(APP_DIR)
+
+ADMIN_TOKEN = "bench-admin-token"
+PASSWORD = "bench-password"
+BENCHMARK_SYMBOL = "SPY"
+
+
+def load_app(workdir: str, env: Dict[str, str]):
+    """在暫存目錄中載入應用（環境變數需在匯入前設定）"""
+    os.environ.update(env)
+    os.chdir(workdir)
+    sys.path.insert(0, APP_DIR)
+    from main import app
+    return app
+
+
+@asynccontextmanager
+async def running(app):
+    """執行應用的 lifespan（啟動 / 關閉事件）"""
+    async with app.router.lifespan_context(app):
+        yield
+
+
+def rss_mb() -> float:
+    """目前的常駐記憶體（MB）"""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() / 1024 / 1024
+
+
+def peak_rss_mb() -> float:
+    """行程啟動以來的最高常駐記憶體（MB，Linux 的 ru_maxrss 單位為 KB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def video_id(index: int) -> str:
+    return f"bench{index:06d}"
+
+
+def video_url(index: int) -> str:
+    return f"https://www.youtube.com/watch?v={video_id(index)}"
+
+
+def stock_row(symbol: str, index: int, with_analysis: bool = True) -> Dict[str, Any]:
+    """追蹤股票資料；分析結果含影片網址與發布時間，會寫入提及紀錄與全文索引"""
+    published = datetime(2024, 1, 1) + timedelta(days=index % 240)
+    row = {
+        "symbol": symbol,
+        "company_name": f"{symbol} Inc.",
+        "start_tracking_date": published.isoformat(),
+        "start_price": 100.0 + index % 50,
+        "currency": "USD",
+    }
+    if with_analysis:
+        row["youtube_analysis"] = json.dumps({
+            "videoUrl": video_url(index),
+            "publishDate": published.isoformat(),
+            "summary": "影片討論資料中心資本支出與 AI 伺服器需求。",
+            "stockAnalyses": [{
+                "symbol": symbol,
+                "companyName": f"{symbol} Inc.",
+                "mentionType": "PRIMARY",
+                "sentiment": "bullish" if index % 3 else "bearish",
+                "confidence": 50 + index % 50,
+                "reasoning": "營收成長與毛利率改善，管理層上調全年展望。",
+                "keyPoints": ["資料中心需求強勁", "毛利率改善"],
+                "contextQuote": fake_upstreams.TRANSCRIPT_LINE.format(symbol=symbol),
+            }],
+            "mentionedCompanies": [{"companyName": "台積電", "context": "供應鏈提及", "confidence": 30}],
+        }, ensure_ascii=False)
+    return row
+
+
+class BenchContext:
+    """壓測資料：使用者的認證標頭、追蹤股票 id、ETag 等"""
+
+    def __init__(self, client, args):
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.users: List[Dict[str, str]] = []
+        self.emails: List[str] = []
+        self.stock_ids: List[List[int]] = []
+        self.etags: List[str] = []
+        self.pending_deletes: List[tuple] = []
+        self.serial = 0
+
+    def next_serial(self) -> int:
+        self.serial += 1
+        return self.serial
+
+    def pick_user(self) -> int:
+        return self.rng.randrange(len(self.users))
+
+    async def seed(self):
+        """建立使用者、追蹤清單、影片、價格並計算排行榜"""
+        client = self.client
+        symbols = fake_upstreams.SYMBOLS
+        for i in range(self.args.users):
+            email = f"bench{i}@kolog.com"
+            response = await client.post("/api/v1/auth/register", json={
+                "email": email, "password": PASSWORD, "full_name": f"壓測用戶 {i}",
+            })
+            response.raise_for_status()
+            self.emails.append(email)
+            self.users.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+
+            # 每位使用者各追蹤 stocks_per_user 檔，分析結果對應到不同影片
+            rows = [
+                stock_row(f"{symbols[j % len(symbols)]}{j // len(symbols) or ''}", i * self.args.stocks_per_user + j)
+                for j in range(self.args.stocks_per_user)
+            ]
+            body = "\n".join(json.dumps(row, ensure_ascii=False) for row in rows)
+            response = await client.post(
+                "/api/v1/user/stocks/import?format=ndjson", headers=self.users[-1],
+                files={"file": ("seed.ndjson", body.encode(), "application/x-ndjson")},
+            )
+            response.raise_for_status()
+
+            response = await client.get("/api/v1/user/stocks/?fields=id&limit=500", headers=self.users[-1])
+            response.raise_for_status()
+            self.stock_ids.append([item["id"] for item in response.json()])
+            self.etags.append(response.headers["ETag"])
+
+        await self.seed_market_data(self.args.users * self.args.stocks_per_user)
+
+    async def seed_market_data(self, video_count: int):
+        """影片所屬頻道與每日價格無對外 API，直接以服務層寫入"""
+        from database import WriteSessionLocal
+        from services.video_catalog_service import VideoCatalogService
+        from services.price_service import PriceService
+        from services.leaderboard_service import LeaderboardService
+
+        async with WriteSessionLocal() as db:
+            for index in range(video_count):
+                published = datetime(2024, 1, 1) + timedelta(days=index % 240)
+                await VideoCatalogService.upsert_video(db, {
+                    "video_id": video_id(index),
+                    "channel_id": f"UCbench{index % 20:04d}",
+                    "channel_title": f"財經頻道 {index % 20}",
+                    "title": f"美股盤後解析 #{index}",
+                    "published_at": published.isoformat(),
+                })
+
+            rng = random.Random(self.args.seed)
+            start = date(2024, 1, 1)
+            symbols = {row[0] for row in await self.symbols(db)} | {BENCHMARK_SYMBOL}
+            for symbol in sorted(symbols):
+                price = 100.0
+                series = []
+                for day in range(420):
+                    price *= 1 + rng.gauss(0.0005, 0.02)
+                    series.append((start + timedelta(days=day), round(price, 2)))
+                await PriceService.upsert_prices(db, symbol, series, "USD")
+
+            scored = await LeaderboardService.refresh(db, today=start + timedelta(days=420))
+            await db.commit()
+        print(f"已建立 {self.args.users} 位使用者、{video_count} 部影片，評分 {scored} 筆判斷", flush=True)
+
+    @staticmethod
+    async def symbols(db):
+        from sqlalchemy import select
+        from models.auth_models import UserStock
+        result = await db.execute(select(UserStock.symbol).distinct())
+        return result.all()
+
+    async def prepare_deletes(self, count: int):
+        """刪除情境需要先建立足夠的追蹤股票（不計時）"""
+        self.pending_deletes = []
+        for _ in range(count):
+            user = self.pick_user()
+            serial = self.next_serial()
+            response = await self.client.post(
+                "/api/v1/user/stocks/", headers=self.users[user], json=stock_row(f"DEL{serial}", serial, False)
+            )
+            response.raise_for_status()
+            self.pending_deletes.append((user, response.json()["id"]))
+
+
+Request = Callable[[BenchContext], Awaitable[Any]]
+
+
+async def auth_login(ctx: BenchContext):
+    user = ctx.pick_user()
+    return await ctx.client.post("/api/v1/auth/login", json={"email": ctx.emails[user], "password": PASSWORD})
+
+
+async def auth_me(ctx: BenchContext):
+    return await ctx.client.get("/api/v1/auth/me", headers=ctx.users[ctx.pick_user()])
+
+
+async def auth_google(ctx: BenchContext):
+    # 替身 tokeninfo 依 token 產生固定的 Google 帳號，首次為註冊、之後為登入
+    return await ctx.client.post("/api/v1/auth/google", json={"token": f"google{ctx.rng.randrange(ctx.args.users)}"})
+
+
+async def stocks_list(ctx: BenchContext):
+    return await ctx.client.get("/api/v1/user/stocks/", headers=ctx.users[ctx.pick_user()])
+
+
+async def stocks_list_etag(ctx: BenchContext):
+    user = ctx.pick_user()
+    return await ctx.client.get(
+        "/api/v1/user/stocks/?fields=id&limit=500", headers={**ctx.users[user], "If-None-Match": ctx.etags[user]}
+    )
+
+
+async def stocks_create(ctx: BenchContext):
+    serial = ctx.next_serial()
+    return await ctx.client.post(
+        "/api/v1/user/stocks/", headers=ctx.users[ctx.pick_user()], json=stock_row(f"NEW{serial}", serial)
+    )
+
+
+async def stocks_update(ctx: BenchContext):
+    user = ctx.pick_user()
+    position = ctx.rng.randrange(len(ctx.stock_ids[user]))
+    symbols = fake_upstreams.SYMBOLS
+    row = stock_row(f"{symbols[position % len(symbols)]}{position // len(symbols) or ''}", ctx.next_serial())
+    return await ctx.client.put(
+        f"/api/v1/user/stocks/{ctx.stock_ids[user][position]}", headers=ctx.users[user], json=row
+    )
+
+
+async def stocks_rename(ctx: BenchContext):
+    user = ctx.pick_user()
+    stock_id = ctx.rng.choice(ctx.stock_ids[user])
+    return await ctx.client.patch(
+        f"/api/v1/user/stocks/{stock_id}/name", headers=ctx.users[user], params={"custom_name": f"自訂{ctx.next_serial()}"}
+    )
+
+
+async def stocks_delete(ctx: BenchContext):
+    user, stock_id = ctx.pending_deletes.pop()
+    return await ctx.client.delete(f"/api/v1/user/stocks/{stock_id}", headers=ctx.users[user])
+
+
+async def stocks_summary(ctx: BenchContext):
+    return await ctx.client.get("/api/v1/user/stocks/summary", headers=ctx.users[ctx.pick_user()])
+
+
+async def stocks_performance(ctx: BenchContext):
+    return await ctx.client.get("/api/v1/user/stocks/performance", headers=ctx.users[ctx.pick_user()])
+
+
+async def stocks_export(ctx: BenchContext):
+    return await ctx.client.get("/api/v1/user/stocks/export?format=ndjson", headers=ctx.users[ctx.pick_user()])
+
+
+async def stocks_import(ctx: BenchContext):
+    rows = []
+    for _ in range(ctx.args.import_rows):
+        serial = ctx.next_serial()
+        rows.append(json.dumps(stock_row(f"IMP{serial}", serial), ensure_ascii=False))
+    return await ctx.client.post(
+        "/api/v1/user/stocks/import?format=ndjson", headers=ctx.users[ctx.pick_user()],
+        files={"file": ("bench.ndjson", "\n".join(rows).encode(), "application/x-ndjson")},
+    )
+
+
+async def mentions(ctx: BenchContext):
+    symbol = ctx.rng.choice(fake_upstreams.SYMBOLS)
+    return await ctx.client.get(
+        "/api/v1/mentions/", headers=ctx.users[ctx.pick_user()], params={"symbol": symbol, "sentiment": "bullish"}
+    )
+
+
+async def leaderboard(ctx: BenchContext):
+    return await ctx.client.get("/api/v1/leaderboard/", params={"horizon": 30, "min_calls": 1})
+
+
+async def search(ctx: BenchContext):
+    query = ctx.rng.choice(["資料中心", "毛利率", "NVDA", "伺服器 需求", "營收成長"])
+    return await ctx.client.get("/api/v1/search/", headers=ctx.users[ctx.pick_user()], params={"q": query})
+
+
+async def transcript(ctx: BenchContext):
+    return await ctx.client.post("/api/v1/youtube/transcript", json={"url": video_url(ctx.next_serial())})
+
+
+async def metadata(ctx: BenchContext):
+    return await ctx.client.post(
+        "/api/v1/youtube/metadata", json={"video_id": video_id(ctx.next_serial()), "api_key": "bench"}
+    )
+
+
+def analysis_transcript(symbols: List[str], episode: int) -> str:
+    return "。".join(fake_upstreams.TRANSCRIPT_LINE.format(symbol=symbol) for symbol in symbols * 50) + f"。第 {episode} 集"
+
+
+async def analysis(ctx: BenchContext):
+    # 每次都是不同的逐字稿，不會命中分析結果快取；逐字稿彼此相似，關閉相似沿用以量測實際呼叫 Gemini 的路徑
+    serial = ctx.next_serial()
+    transcript_text = analysis_transcript(ctx.rng.sample(fake_upstreams.SYMBOLS, 3), serial)
+    return await ctx.client.post("/api/v1/analysis/gemini", json={
+        "transcript": transcript_text, "api_key": "bench", "video_url": video_url(serial),
+        "allow_similar": False,
+    })
+
+
+async def analysis_cached(ctx: BenchContext):
+    # 已分析過的逐字稿（例如頻道監看預先分析的影片），第一次之後都命中快取
+    return await ctx.client.post("/api/v1/analysis/gemini", json={
+        "transcript": analysis_transcript(fake_upstreams.SYMBOLS[:3], 0), "api_key": "bench",
+        "video_url": video_url(ctx.next_serial()),
+    })
+
+
+async def analysis_similar(ctx: BenchContext):
+    # 與已分析的逐字稿只差集數（轉載、重新上傳），第一次之後都沿用相似逐字稿的分析
+    serial = ctx.next_serial()
+    return await ctx.client.post("/api/v1/analysis/gemini", json={
+        "transcript": analysis_transcript(fake_upstreams.SYMBOLS[:3], serial), "api_key": "bench",
+        "video_url": video_url(serial),
+    })
+
+
+async def admin_profiles(ctx: BenchContext):
+    return await ctx.client.get("/api/v1/admin/profiles", headers={"X-Admin-Token": ADMIN_TOKEN})
+
+
+async def admin_usage(ctx: BenchContext):
+    return await ctx.client.get("/api/v1/admin/usage", params={"group_by": "user"}, headers={"X-Admin-Token": ADMIN_TOKEN})
+
+
+async def health(ctx: BenchContext):
+    return await ctx.client.get("/health")
+
+
+# 情境名稱以「路由模組.動作」命名，依序執行（寫入情境排在讀取情境之後，避免影響讀取的資料量）
+SCENARIOS: Dict[str, Request] = {
+    "health": health,
+    "auth.login": auth_login,
+    "auth.me": auth_me,
+    "auth.google": auth_google,
+    "user_stocks.list": stocks_list,
+    "user_stocks.list_etag": stocks_list_etag,
+    "user_stocks.summary": stocks_summary,
+    "user_stocks.performance": stocks_performance,
+    "user_stocks.export": stocks_export,
+    "mentions": mentions,
+    "leaderboard": leaderboard,
+    "search": search,
+    "admin.profiles": admin_profiles,
+    "admin.usage": admin_usage,
+    "metadata": metadata,
+    "analysis": analysis,
+    "analysis.cached": analysis_cached,
+    "analysis.similar": analysis_similar,
+    "transcript": transcript,
+    "user_stocks.create": stocks_create,
+    "user_stocks.update": stocks_update,
+    "user_stocks.rename": stocks_rename,
+    "user_stocks.import": stocks_import,
+    "user_stocks.delete": stocks_delete,
+}
+
+
+async def run_scenario(ctx: BenchContext, name: str, concurrency: int, total: int) -> Dict[str, Any]:
+    """以 concurrency 個 worker 共送出 total 個請求"""
+    request = SCENARIOS[name]
+    if name == "user_stocks.delete":
+        await ctx.prepare_deletes(total + ctx.args.warmup)
+
+    for _ in range(ctx.args.warmup):
+        await request(ctx)
+
+    counter = iter(range(total))
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    exceptions = 0
+
+    async def worker():
+        nonlocal exceptions
+        for _ in counter:
+            started = time.perf_counter()
+            try:
+                response = await request(ctx)
+            except Exception:
+                exceptions += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    if len(latencies) >= 2:
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    else:
+        quantiles = latencies * 99 or [0.0] * 99
+    errors = exceptions + sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "status_counts": {str(status): count for status, count in sorted(statuses.items())},
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "rss_mb": round(rss_mb(), 1),
+        "rss_delta_mb": round(rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def run_suite(args, app) -> List[Dict[str, Any]]:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with running(app):
+        # 替身服務回應較慢時，請求等待時間可能超過 httpx 預設的 5 秒
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            ctx = BenchContext(client, args)
+            await ctx.seed()
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    result = await run_scenario(ctx, name, concurrency, args.requests)
+                    results.append(result)
+                    print(
+                        f"{name:<26} c={concurrency:<4} {result['throughput_rps']:>9.1f} req/s  "
+                        f"p50 {result['p50_ms']:>8.2f}  p95 {result['p95_ms']:>8.2f}  p99 {result['p99_ms']:>8.2f} ms  "
+                        f"errors {result['errors']:<4} rss {result['rss_mb']:.1f} MB",
+                        flush=True,
+                    )
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str):
+    """與先前的結果比較吞吐量與 p95 延遲（正值表示變快）"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(item["scenario"], item["concurrency"]): item for item in json.load(f)["results"]}
+
+    print(f"\n與 {baseline_path} 比較")
+    for result in results:
+        before = baseline.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+        throughput = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100 if before["throughput_rps"] else 0.0
+        p95 = (1 - result["p95_ms"] / before["p95_ms"]) * 100 if before["p95_ms"] else 0.0
+        print(
+            f"{result['scenario']:<26} c={result['concurrency']:<4} "
+            f"throughput {throughput:+7.1f}%  p95 {p95:+7.1f}%  "
+            f"({before['p95_ms']:.2f} → {result['p95_ms']:.2f} ms)"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="KOLOG 全路由壓測套件")
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")],
+                        default=[1, 10, 50], help="並發數，以逗號分隔（預設 1,10,50）")
+    parser.add_argument("--requests", type=int, default=200, help="每個情境、每個並發數的請求數")
+    parser.add_argument("--warmup", type=int, default=5, help="每輪開始前不計時的暖機請求數")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+                        help=f"要執行的情境，以逗號分隔（可用: {', '.join(SCENARIOS)}）")
+    parser.add_argument("--users", type=int, default=20, help="壓測使用者數量")
+    parser.add_argument("--stocks-per-user", type=int, default=50, help="每位使用者預先追蹤的股票數（最多 500）")
+    parser.add_argument("--import-rows", type=int, default=20, help="匯入情境每次上傳的資料列數")
+    parser.add_argument("--seed", type=int, default=0, help="亂數種子（資料、請求順序與替身服務延遲）")
+    parser.add_argument("--output", help="結果 JSON 檔案路徑")
+    parser.add_argument("--compare", help="用來比較的先前結果 JSON 檔案")
+    fake_upstreams.add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的情境: {', '.join(unknown)}")
+    # 應用會在暫存目錄中執行，先轉成絕對路徑
+    args.output = args.output and os.path.abspath(args.output)
+    args.compare = args.compare and os.path.abspath(args.compare)
+    return args
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    profiles = fake_upstreams.profiles_from_args(args)
+    upstream, base_url = fake_upstreams.start(profiles, args.seed, args.transcript_lines)
+    try:
+        # 壓測由同一個 IP 大量呼叫昂貴路由，關閉請求配額
+        env = {**fake_upstreams.upstream_env(base_url), "ADMIN_TOKEN": ADMIN_TOKEN, "QUOTA_ENABLED": "false"}
+        app = load_app(tempfile.mkdtemp(prefix="kolog-bench-"), env)
+        results = asyncio.run(run_suite(args, app))
+    finally:
+        upstream.terminate()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "upstreams": {name: asdict(profile) for name, profile in profiles.items()},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n結果已寫入 {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
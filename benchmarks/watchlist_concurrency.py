@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+股票追蹤清單並發壓測腳本
+在行程內以 ASGI 直接驅動 FastAPI 應用，量測並發讀寫追蹤清單的吞吐量
+
+使用方式：
+python benchmarks/watchlist_concurrency.py --users 20 --concurrency 50 --requests 2000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+
+def load_app(workdir: str):
+    """在暫存目錄中載入應用，避免寫入正式資料庫"""
+    os.chdir(workdir)
+    sys.path.insert(0, APP_DIR)
+    from main import app
+    return app
+
+
+@asynccontextmanager
+async def running(app):
+    """執行應用的 lifespan（啟動 / 關閉事件）"""
+    async with app.router.lifespan_context(app):
+        yield
+
+
+async def register_users(client, count: int):
+    """建立壓測用的使用者並回傳 Authorization headers"""
+    headers = []
+    for i in range(count):
+        response = await client.post("/api/v1/auth/register", json={
+            "email": f"bench{i}@kolog.com",
+            "password": "bench-password",
+            "full_name": f"壓測用戶 {i}",
+        })
+        response.raise_for_status()
+        headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+    return headers
+
+
+async def run_benchmark(args) -> dict:
+    import httpx
+
+    app = load_app(tempfile.mkdtemp(prefix="kolog-bench-"))
+    transport = httpx.ASGITransport(app=app)
+
+    async with running(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            users = await register_users(client, args.users)
+            counter = iter(range(args.requests))
+            latencies = []
+            errors = 0
+
+            async def worker():
+                nonlocal errors
+                for i in counter:
+                    headers = random.choice(users)
+                    started = time.perf_counter()
+                    if random.random() < args.write_ratio:
+                        response = await client.post("/api/v1/user/stocks/", headers=headers, json={
+                            "symbol": f"S{i}",
+                            "company_name": f"Bench Corp {i}",
+                            "start_tracking_date": "2024-01-01T00:00:00",
+                            "start_price": 100.0,
+                            "currency": "USD",
+                        })
+                    else:
+                        response = await client.get("/api/v1/user/stocks/", headers=headers)
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code >= 400:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KOLOG 追蹤清單並發壓測")
+    parser.add_argument("--users", type=int, default=20, help="壓測使用者數量")
+    parser.add_argument("--concurrency", type=int, default=50, help="同時進行的請求數")
+    parser.add_argument("--requests", type=int, default=2000, help="總請求數")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="新增股票請求的比例")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args))
+    for key, value in result.items():
+        print(f"{key:>15}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+多 worker 擴展性壓測腳本
+以 uvicorn --workers N 啟動實際的伺服器（共用同一個暫存 SQLite 資料庫），由多個壓測行程送出請求，
+量測不同 worker 數下的吞吐量與相對單一 worker 的擴展效率
+
+壓測行程與伺服器共用 CPU，核心數需大於 worker 數 + 壓測行程數才看得出線性擴展
+
+使用方式：
+python benchmarks/worker_scaling.py --workers 1,2,4 --duration 10
+python benchmarks/worker_scaling.py --workers 1,2,4,8 --clients 4 --output scaling.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from suite import APP_DIR, PASSWORD, stock_row  # noqa: E402
+
+# 壓測的路由：認證、讀取資料庫與序列化，以 CPU 為主、不呼叫外部服務
+PATHS = ["/api/v1/user/stocks/", "/api/v1/auth/me", "/api/v1/user/stocks/summary"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, workdir: str) -> subprocess.Popen:
+    """在暫存目錄中以 uvicorn 啟動應用，等待健康檢查通過"""
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'kolog.db')}",
+        "SHARED_STATE_PATH": os.path.join(workdir, "kolog-shared.db"),
+        # 建立大量壓測使用者會超過註冊的請求配額
+        "QUOTA_ENABLED": "false",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", APP_DIR,
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env,
+    )
+    import httpx
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("伺服器啟動逾時")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def seed(base_url: str, users: int, stocks_per_user: int) -> List[Dict[str, str]]:
+    """建立使用者與追蹤清單，回傳 Authorization headers"""
+    import httpx
+    headers = []
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        for i in range(users):
+            response = client.post("/api/v1/auth/register", json={
+                "email": f"scale{i}@kolog.com", "password": PASSWORD, "full_name": f"壓測用戶 {i}",
+            })
+            if response.status_code == 400:
+                # 先前已建立（重複執行同一個資料庫）
+                response = client.post("/api/v1/auth/login", json={"email": f"scale{i}@kolog.com", "password": PASSWORD})
+            response.raise_for_status()
+            user_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            headers.append(user_headers)
+
+            rows = [stock_row(f"S{i}X{j}", i * stocks_per_user + j) for j in range(stocks_per_user)]
+            body = "\n".join(json.dumps(row, ensure_ascii=False) for row in rows)
+            client.post(
+                "/api/v1/user/stocks/import?format=ndjson", headers=user_headers,
+                files={"file": ("seed.ndjson", body.encode(), "application/x-ndjson")},
+            ).raise_for_status()
+    return headers
+
+
+def client_process(base_url: str, headers: List[Dict[str, str]], connections: int, duration: float, queue):
+    """單一壓測行程：以 connections 條連線持續送出請求 duration 秒"""
+    import httpx
+
+    async def run():
+        latencies: List[float] = []
+        errors = 0
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            deadline = time.perf_counter() + duration
+
+            async def worker(offset: int):
+                nonlocal errors
+                i = offset
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    response = await client.get(PATHS[i % len(PATHS)], headers=headers[i % len(headers)])
+                    latencies.append(time.perf_counter() - started)
+                    if response.status_code >= 400:
+                        errors += 1
+                    i += connections
+
+            await asyncio.gather(*(worker(offset) for offset in range(connections)))
+        return latencies, errors
+
+    queue.put(asyncio.run(run()))
+
+
+def measure(base_url: str, headers: List[Dict[str, str]], clients: int, connections: int, duration: float) -> dict:
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=client_process, args=(base_url, headers, connections, duration, queue))
+        for _ in range(clients)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    outputs = [queue.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for output in outputs for latency in output[0])
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "errors": sum(output[1] for output in outputs),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KOLOG 多 worker 擴展性壓測")
+    parser.add_argument("--workers", type=lambda value: [int(count) for count in value.split(",")],
+                        default=[1, 2, 4], help="要比較的 worker 數，以逗號分隔（預設 1,2,4）")
+    parser.add_argument("--clients", type=int, default=2, help="壓測行程數")
+    parser.add_argument("--connections", type=int, default=32, help="每個壓測行程的連線數")
+    parser.add_argument("--duration", type=float, default=10.0, help="每種 worker 數的壓測秒數")
+    parser.add_argument("--users", type=int, default=20, help="壓測使用者數量")
+    parser.add_argument("--stocks-per-user", type=int, default=50, help="每位使用者的追蹤股票數")
+    parser.add_argument("--output", help="結果 JSON 檔案路徑")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="kolog-scaling-")
+    results = []
+    headers = None
+    for workers in args.workers:
+        port = free_port()
+        server = start_server(workers, port, workdir)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            if headers is None:
+                headers = seed(base_url, args.users, args.stocks_per_user)
+            result = {"workers": workers, **measure(base_url, headers, args.clients, args.connections, args.duration)}
+        finally:
+            stop_server(server)
+
+        # 擴展效率：吞吐量 / (單一 worker 吞吐量 × worker 數)，1.0 表示線性擴展
+        baseline = results[0] if results else result
+        result["speedup"] = round(result["throughput_rps"] / baseline["throughput_rps"] * baseline["workers"], 2)
+        result["efficiency"] = round(result["speedup"] / workers, 2)
+        results.append(result)
+        print(
+            f"workers={workers:<3} {result['throughput_rps']:>9.1f} req/s  speedup {result['speedup']:>5.2f}x  "
+            f"efficiency {result['efficiency']:.2f}  p50 {result['p50_ms']:.2f}  p95 {result['p95_ms']:.2f}  "
+            f"p99 {result['p99_ms']:.2f} ms  errors {result['errors']}",
+            flush=True,
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"cpu_count": os.cpu_count(), "args": vars(args), "results": results}, f, indent=2)
+        print(f"\n結果已寫入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+股票代號資料檔建立腳本
+從 Nasdaq Trader 的代號目錄（nasdaqlisted.txt、otherlisted.txt，涵蓋 NASDAQ / NYSE / NYSE American 等交易所）
+取得所有上市代號與公司名稱，連同 app/data/ticker_aliases.csv 的中文簡稱，寫成 API 以 mmap 讀取的資料檔。
+寫入完成後才取代舊檔，執行中的 worker 重新啟動後讀取新檔
+
+使用方式：
+cd kolog-backend
+python build_tickers.py [--nasdaq-listed ./nasdaqlisted.txt] [--other-listed ./otherlisted.txt]
+"""
+
+import argparse
+import csv
+import os
+import sys
+from collections import defaultdict
+from typing import Dict, Iterator, Set, Tuple
+
+# 添加 app 目錄到 Python 路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+
+from services.ticker_service import (
+    SYMBOL_PATTERN, TICKER_UNIVERSE_PATH, TickerUniverse, alias_key, normalize_symbol
+)
+
+NASDAQ_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
+OTHER_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+ALIASES_PATH = os.path.join(os.path.dirname(__file__), "app", "data", "ticker_aliases.csv")
+
+def read_source(source: str) -> str:
+    """本機路徑或 URL"""
+    if source.startswith(("http://", "https://")):
+        import httpx
+        response = httpx.get(source, timeout=30.0, follow_redirects=True)
+        response.raise_for_status()
+        return response.text
+    with open(source, encoding="utf-8") as file:
+        return file.read()
+
+def parse_symbol_directory(text: str, symbol_column: str) -> Iterator[Tuple[str, str]]:
+    """以 | 分隔的代號目錄，回傳 (代號, 公司名稱)；略過測試代號與檔尾的建立時間"""
+    rows = csv.DictReader(text.splitlines(), delimiter="|")
+    for row in rows:
+        symbol = row.get(symbol_column)
+        if not symbol or row[rows.fieldnames[0]].startswith("File Creation Time") or row.get("Test Issue") == "Y":
+            continue
+        # 證券名稱格式為「公司名稱 - 股份說明」
+        yield symbol, row["Security Name"].split(" - ")[0]
+
+def build(nasdaq_listed: str, other_listed: str, aliases_path: str, output: str):
+    symbols: Set[str] = set()
+    name_symbols: Dict[str, Set[str]] = defaultdict(set)
+    listings = [(nasdaq_listed, "Symbol"), (other_listed, "ACT Symbol")]
+    for source, symbol_column in listings:
+        for symbol, name in parse_symbol_directory(read_source(source), symbol_column):
+            symbol = normalize_symbol(symbol)
+            # 特別股、權證等代號（ABR$D、ACAHW= 等）不在分析範圍內
+            if not SYMBOL_PATTERN.fullmatch(symbol):
+                continue
+            symbols.add(symbol)
+            key = alias_key(name)
+            if key:
+                name_symbols[key].add(symbol)
+
+    # 同名的多個代號（例如不同股份類別）無法判斷，不建立別名；手動維護的別名優先
+    aliases = {key: next(iter(matches)) for key, matches in name_symbols.items() if len(matches) == 1}
+    ambiguous = len(name_symbols) - len(aliases)
+    with open(aliases_path, encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            key = alias_key(row["alias"])
+            if key:
+                aliases[key] = normalize_symbol(row["symbol"])
+
+    # 對應的代號不在代號目錄中的別名（已下市或代號變更）不寫入
+    aliases = {key: symbol for key, symbol in aliases.items() if symbol in symbols}
+    content = TickerUniverse.build(symbols, aliases)
+    temporary = f"{output}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(content)
+    os.replace(temporary, output)
+    print(f"代號 {len(symbols)} 支、別名 {len(aliases)} 筆（同名略過 {ambiguous} 筆），{len(content) / 1024:.0f} KB → {output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="建立股票代號與公司別名資料檔")
+    parser.add_argument("--nasdaq-listed", default=NASDAQ_LISTED_URL, help="nasdaqlisted.txt 的路徑或 URL")
+    parser.add_argument("--other-listed", default=OTHER_LISTED_URL, help="otherlisted.txt 的路徑或 URL")
+    parser.add_argument("--aliases", default=ALIASES_PATH, help="手動維護的別名 CSV（symbol,alias）")
+    parser.add_argument("--output", default=TICKER_UNIVERSE_PATH, help="輸出的資料檔（預設為 TICKER_UNIVERSE_PATH）")
+    args = parser.parse_args()
+
+    print("🔧 建立代號資料檔...")
+    build(args.nasdaq_listed, args.other_listed, args.aliases, args.output)
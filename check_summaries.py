@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+追蹤清單彙總一致性檢查腳本
+從 user_stocks 重新計算每位使用者的彙總，與 portfolio_summary_buckets 比對並回報差異
+
+使用方式：
+cd kolog-backend
+python check_summaries.py [--fix] [--chunk-size 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# 添加 app 目錄到 Python 路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./app/kolog.db")
+
+from sqlalchemy import select, delete, insert
+
+from database import WriteSessionLocal, init_db, close_db
+from models import auth_models, analysis_models, market_models
+from models.auth_models import UserStock, PortfolioSummaryBucket
+from services.summary_service import SummaryService
+
+# 金額比對容許的浮點誤差
+TOLERANCE = 1e-6
+
+async def rebuild_expected(db, chunk_size: int):
+    """依 id 分批讀取所有追蹤股票，重新計算每位使用者的彙總"""
+    changes = {}
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(UserStock.id, UserStock.user_id, UserStock.symbol, UserStock.currency,
+                   UserStock.start_price, UserStock.youtube_analysis)
+            .where(UserStock.id > last_id)
+            .order_by(UserStock.id)
+            .limit(chunk_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        for row in rows:
+            changes.setdefault(row.user_id, []).append(
+                (1, SummaryService.buckets(row.symbol, row.currency, row.start_price, row.youtube_analysis))
+            )
+        last_id = rows[-1].id
+
+    return {user_id: SummaryService.aggregate(user_changes) for user_id, user_changes in changes.items()}
+
+async def load_stored(db):
+    """讀取目前儲存的彙總"""
+    stored = {}
+    result = await db.execute(select(PortfolioSummaryBucket))
+    for bucket in result.scalars():
+        stored.setdefault(bucket.user_id, {})[(bucket.dimension, bucket.key)] = [bucket.count, bucket.total_start_price]
+    return stored
+
+def find_drift(expected, stored):
+    """比對兩份彙總，回傳 {user_id: [(維度, 鍵值, 預期, 實際)]}"""
+    drift = {}
+    for user_id in set(expected) | set(stored):
+        user_expected = {key: value for key, value in expected.get(user_id, {}).items() if value[0] > 0}
+        user_stored = stored.get(user_id, {})
+        for bucket_key in set(user_expected) | set(user_stored):
+            want = user_expected.get(bucket_key, [0, 0.0])
+            have = user_stored.get(bucket_key, [0, 0.0])
+            if want[0] != have[0] or abs(want[1] - have[1]) > TOLERANCE:
+                drift.setdefault(user_id, []).append((*bucket_key, want, have))
+    return drift
+
+async def check_summaries(fix: bool, chunk_size: int):
+    await init_db()
+
+    try:
+        async with WriteSessionLocal() as db:
+            expected = await rebuild_expected(db, chunk_size)
+            stored = await load_stored(db)
+            drift = find_drift(expected, stored)
+
+            for user_id, items in sorted(drift.items()):
+                for dimension, key, want, have in items:
+                    print(f"使用者 {user_id} {dimension}/{key}: 預期 {want[0]} 筆 / {want[1]:.4f}，實際 {have[0]} 筆 / {have[1]:.4f}")
+
+            if drift and fix:
+                for user_id in drift:
+                    await db.execute(delete(PortfolioSummaryBucket).where(PortfolioSummaryBucket.user_id == user_id))
+                    rows = [
+                        {"user_id": user_id, "dimension": dimension, "key": key, "count": count, "total_start_price": total}
+                        for (dimension, key), (count, total) in expected.get(user_id, {}).items()
+                        if count > 0
+                    ]
+                    if rows:
+                        await db.execute(insert(PortfolioSummaryBucket), rows)
+                await db.commit()
+    finally:
+        await close_db()
+
+    if not drift:
+        print("✅ 所有使用者彙總一致")
+    elif fix:
+        print(f"\n🔧 已重建 {len(drift)} 位使用者的彙總")
+    else:
+        print(f"\n⚠️ {len(drift)} 位使用者的彙總不一致，使用 --fix 重建")
+    return drift
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="檢查並重建追蹤清單彙總")
+    parser.add_argument("--fix", action="store_true", help="以重新計算的結果覆寫不一致的彙總")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="每批讀取的追蹤股票筆數")
+    args = parser.parse_args()
+
+    drift = asyncio.run(check_summaries(args.fix, args.chunk_size))
+    sys.exit(1 if drift and not args.fix else 0)
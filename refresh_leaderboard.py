@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+KOL 準確度排行榜更新腳本
+評分所有已到期但尚未評分的看多 / 看空判斷，並累加到 channel_scores 排行榜
+（update_prices.py 更新價格後也會自動執行）
+
+使用方式：
+cd kolog-backend
+python refresh_leaderboard.py
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加 app 目錄到 Python 路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./app/kolog.db")
+
+from database import WriteSessionLocal, init_db, close_db
+from models import auth_models, analysis_models, market_models
+from services.leaderboard_service import LeaderboardService
+
+async def refresh_leaderboard():
+    await init_db()
+    try:
+        async with WriteSessionLocal() as db:
+            scored = await LeaderboardService.refresh(db)
+            await db.commit()
+    finally:
+        await close_db()
+
+    print(f"🎉 排行榜更新完成，新增 {scored} 筆判斷評分")
+
+if __name__ == "__main__":
+    print("🔧 更新 KOL 準確度排行榜...")
+    asyncio.run(refresh_leaderboard())
@@ -0,0 +1,125 @@
+"""
+測試共用設定
+
+應用在匯入時讀取環境變數，因此先把資料庫、共用儲存與外部服務指向暫存目錄與本機替身
+（benchmarks/fake_upstreams.py），再匯入 main。整個測試階段共用一個事件迴圈與一次應用啟動流程，
+每個測試以 httpx.AsyncClient 直接呼叫 ASGI 應用
+"""
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+
+import fake_upstreams
+
+TEST_DIR = tempfile.mkdtemp(prefix="kolog-test-")
+atexit.register(shutil.rmtree, TEST_DIR, ignore_errors=True)
+UPSTREAM_URL = f"http://127.0.0.1:{fake_upstreams.free_port()}"
+
+os.environ.update(fake_upstreams.upstream_env(UPSTREAM_URL))
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{TEST_DIR}/kolog.db",
+    "SHARED_STATE_PATH": f"{TEST_DIR}/kolog-shared.db",
+    "PROFILE_DIR": f"{TEST_DIR}/profiles",
+    "PRICE_CSV_PATH": f"{TEST_DIR}/prices.csv",
+    "TICKER_UNIVERSE_PATH": f"{TEST_DIR}/tickers.bin",
+    "SECRET_KEY": "test-secret",
+    "ADMIN_TOKEN": "test-admin",
+    # 配額中介層需在匯入時啟用才會掛載；預設限制放寬，配額測試再調整 quota.LIMITS
+    "QUOTA_ENABLED": "true",
+    "QUOTA_AI": "10000/60",
+    "QUOTA_UPSTREAM": "10000/60",
+    "QUOTA_AUTH": "10000/60",
+    "USAGE_FLUSH_INTERVAL": "0.05",
+})
+
+import httpx  # noqa: E402
+
+from main import app  # noqa: E402
+
+ADMIN_HEADERS = {"X-Admin-Token": "test-admin"}
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+def upstreams():
+    """本機替身服務（不加延遲）"""
+    profiles = fake_upstreams.parse_profiles([], fake_upstreams.UpstreamProfile(0, 0, 0))
+    port = int(UPSTREAM_URL.rsplit(":", 1)[1])
+    process, base_url = fake_upstreams.start(profiles, port=port, transcript_lines=40)
+    yield base_url
+    process.terminate()
+    process.join()
+
+@pytest.fixture(scope="session")
+async def started_app(upstreams):
+    """執行一次應用的啟動與關閉流程（建立資料表、載入代號資料檔、背景工作）"""
+    async with app.router.lifespan_context(app):
+        yield app
+
+@pytest.fixture
+async def client(started_app):
+    transport = httpx.ASGITransport(app=started_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+def unique(prefix: str = "") -> str:
+    return prefix + uuid.uuid4().hex[:12]
+
+def video_id() -> str:
+    """11 碼的 YouTube 影片 ID"""
+    return uuid.uuid4().hex[:11]
+
+@pytest.fixture
+def make_user(client):
+    """註冊新使用者，回傳 Authorization 標頭"""
+
+    async def make_user():
+        response = await client.post(
+            "/api/v1/auth/register", json={"email": f"{unique('u')}@example.com", "password": "password123"}
+        )
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return make_user
+
+@pytest.fixture
+async def auth_headers(make_user):
+    return await make_user()
+
+def stock_payload(symbol: str, **fields) -> dict:
+    payload = {
+        "symbol": symbol,
+        "company_name": f"{symbol} Inc.",
+        "start_tracking_date": "2024-05-01T00:00:00",
+        "start_price": 100.0,
+        "currency": "USD",
+    }
+    payload.update(fields)
+    return payload
+
+def analysis_json(video: str, stocks=(), companies=(), **fields) -> str:
+    """追蹤股票的 youtube_analysis；stocks 為 (代號, 情緒, 信心度)"""
+    analysis = {
+        "video_url": f"https://www.youtube.com/watch?v={video}",
+        "summary": "影片討論資料中心資本支出",
+        "analyzed_at": "2024-05-01T00:00:00",
+        "overall_sentiment": "bullish",
+        "stock_analyses": [
+            {"symbol": symbol, "company_name": f"{symbol} Inc.", "sentiment": sentiment, "confidence": confidence,
+             "mention_type": "PRIMARY", "reasoning": f"{symbol} 營收成長", "key_points": ["需求強勁"]}
+            for symbol, sentiment, confidence in stocks
+        ],
+        "mentioned_companies": [
+            {"company_name": name, "context": "供應鏈提及", "mention_type": "MENTION", "confidence": 30}
+            for name in companies
+        ],
+    }
+    analysis.update(fields)
+    return json.dumps(analysis, ensure_ascii=False)
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine, select
+
+import database
+from conftest import analysis_json, stock_payload, video_id
+from database import WriteSessionLocal
+from models.analysis_models import AnalysisBlob, content_hash
+
+async def ref_count(content: str):
+    async with WriteSessionLocal() as db:
+        return (await db.execute(
+            select(AnalysisBlob.ref_count).where(AnalysisBlob.hash == content_hash(content))
+        )).scalar()
+
+@pytest.mark.anyio
+async def test_identical_analyses_are_stored_once(client, make_user):
+    analysis, other = analysis_json(video_id(), [("NVDA", "bullish", 80)]), analysis_json(video_id())
+    users = [await make_user() for _ in range(3)]
+    stock_ids = []
+    for headers in users:
+        response = await client.post(
+            "/api/v1/user/stocks/", json=stock_payload("NVDA", youtube_analysis=analysis), headers=headers
+        )
+        assert response.json()["youtube_analysis"] == analysis
+        stock_ids.append(response.json()["id"])
+    assert await ref_count(analysis) == 3
+
+    # 改成其他分析時引用移轉
+    await client.put(
+        f"/api/v1/user/stocks/{stock_ids[0]}", json=stock_payload("NVDA", youtube_analysis=other), headers=users[0]
+    )
+    assert (await ref_count(analysis), await ref_count(other)) == (2, 1)
+    listing = await client.get("/api/v1/user/stocks/", params={"fields": "id,youtube_analysis"}, headers=users[0])
+    assert listing.json() == [{"id": stock_ids[0], "youtube_analysis": other}]
+
+    # 引用數歸零時刪除
+    for headers, stock_id in zip(users[1:], stock_ids[1:]):
+        await client.delete(f"/api/v1/user/stocks/{stock_id}", headers=headers)
+    assert await ref_count(analysis) is None
+    assert await ref_count(other) == 1
+
+@pytest.mark.anyio
+async def test_import_counts_every_reference(client, auth_headers):
+    analysis = analysis_json(video_id(), [("AMD", "bearish", 70)])
+    rows = "\n".join(
+        json.dumps(stock_payload(symbol, youtube_analysis=analysis)) for symbol in ("AMD", "INTC", "QCOM")
+    )
+    response = await client.post(
+        "/api/v1/user/stocks/import", params={"format": "ndjson"}, headers=auth_headers,
+        files={"file": ("rows.ndjson", rows.encode(), "application/x-ndjson")},
+    )
+    assert response.json()["imported"] == 3
+    assert await ref_count(analysis) == 3
+
+def test_inline_analyses_are_collapsed_on_upgrade(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    analysis, other = analysis_json(video_id()), analysis_json(video_id())
+    with engine.begin() as conn:
+        database.Base.metadata.create_all(conn)
+        # 舊版 schema：分析 JSON 直接存在 user_stocks
+        conn.exec_driver_sql("ALTER TABLE user_stocks ADD COLUMN youtube_analysis TEXT")
+        conn.exec_driver_sql("INSERT INTO users (id, email) VALUES (1, 'a@example.com'), (2, 'b@example.com')")
+        conn.exec_driver_sql(
+            "INSERT INTO user_stocks (id, user_id, symbol, company_name, start_tracking_date, start_price, currency, "
+            "youtube_analysis) VALUES (?, ?, ?, 'c', '2024-01-01', 1.0, 'USD', ?)",
+            [(1, 1, "NVDA", analysis), (2, 2, "NVDA", analysis), (3, 2, "AMD", other), (4, 2, "TSLA", None)],
+        )
+        conn.exec_driver_sql("PRAGMA user_version = 0")
+
+    with engine.begin() as conn:
+        database._create_schema(conn)
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(user_stocks)")}
+        assert "youtube_analysis" not in columns
+        assert conn.exec_driver_sql("SELECT id, analysis_hash FROM user_stocks ORDER BY id").all() == [
+            (1, content_hash(analysis)), (2, content_hash(analysis)), (3, content_hash(other)), (4, None)
+        ]
+        assert sorted(conn.exec_driver_sql("SELECT content, ref_count FROM analysis_blobs").all()) == sorted(
+            [(analysis, 2), (other, 1)]
+        )
+    engine.dispose()
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from conftest import stock_payload
+
+pytestmark = pytest.mark.anyio
+
+async def test_watchlist_round_trip(client, auth_headers):
+    response = await client.post("/api/v1/user/stocks/", json=stock_payload("NVDA"), headers=auth_headers)
+    assert response.status_code == 200, response.text
+    stock_id = response.json()["id"]
+
+    response = await client.put(
+        f"/api/v1/user/stocks/{stock_id}", json=stock_payload("NVDA", start_price=120.0), headers=auth_headers
+    )
+    assert response.status_code == 200
+    assert response.json()["start_price"] == 120.0
+
+    listing = (await client.get("/api/v1/user/stocks/", headers=auth_headers)).json()
+    assert [(stock["id"], stock["symbol"]) for stock in listing] == [(stock_id, "NVDA")]
+
+    assert (await client.delete(f"/api/v1/user/stocks/{stock_id}", headers=auth_headers)).status_code == 200
+    assert (await client.get("/api/v1/user/stocks/", headers=auth_headers)).json() == []
+
+async def test_concurrent_writes_share_the_single_write_connection(client, auth_headers):
+    symbols = [f"S{index:02d}" for index in range(20)]
+    responses = await asyncio.gather(*[
+        client.post("/api/v1/user/stocks/", json=stock_payload(symbol), headers=auth_headers) for symbol in symbols
+    ], *[
+        client.get("/api/v1/user/stocks/", headers=auth_headers) for _ in range(10)
+    ])
+    assert [response.status_code for response in responses] == [200] * 30
+
+    listing = (await client.get("/api/v1/user/stocks/", headers=auth_headers)).json()
+    assert sorted(stock["symbol"] for stock in listing) == symbols
+
+async def test_duplicate_symbol_is_rejected(client, auth_headers):
+    assert (await client.post("/api/v1/user/stocks/", json=stock_payload("AAPL"), headers=auth_headers)).status_code == 200
+    response = await client.post("/api/v1/user/stocks/", json=stock_payload("AAPL"), headers=auth_headers)
+    assert response.status_code == 400
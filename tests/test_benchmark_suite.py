@@ -0,0 +1,33 @@
+import pytest
+
+import fake_upstreams
+import suite
+
+def test_parse_profiles():
+    default = fake_upstreams.UpstreamProfile(50, 10, 0)
+    profiles = fake_upstreams.parse_profiles(["gemini=800:200:0.05", "youtube_transcript=5"], default)
+    assert profiles["gemini"] == fake_upstreams.UpstreamProfile(800, 200, 0.05)
+    assert profiles["youtube_transcript"] == fake_upstreams.UpstreamProfile(5, 10, 0)
+    assert profiles["google_tokeninfo"] == default
+    with pytest.raises(ValueError):
+        fake_upstreams.parse_profiles(["unknown=1"], default)
+
+def test_parse_args_rejects_unknown_scenarios():
+    assert suite.parse_args(["--scenarios", "health,search"]).scenarios == ["health", "search"]
+    with pytest.raises(SystemExit):
+        suite.parse_args(["--scenarios", "health,unknown"])
+
+@pytest.mark.anyio
+async def test_every_scenario_succeeds(client, monkeypatch):
+    """以少量資料跑完所有情境，確認壓測請求本身沒有錯誤（例如路由改為需要登入）"""
+    monkeypatch.setattr(suite, "ADMIN_TOKEN", "test-admin")
+    args = suite.parse_args([
+        "--users", "2", "--stocks-per-user", "3", "--requests", "3", "--warmup", "0",
+        "--concurrency", "2", "--import-rows", "2",
+    ])
+    ctx = suite.BenchContext(client, args)
+    await ctx.seed()
+    for name in args.scenarios:
+        result = await suite.run_scenario(ctx, name, 2, args.requests)
+        assert result["errors"] == 0, result
+        assert sum(result["status_counts"].values()) == args.requests
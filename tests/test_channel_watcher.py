@@ -0,0 +1,71 @@
+import pytest
+
+from conftest import unique
+from metrics import UPSTREAM_REQUEST_DURATION, WATCHER_POLLS
+from services import channel_watcher_service
+from services.channel_watcher_service import ChannelWatcherService
+from services.gemini_service import GeminiService
+from shared_state import shared_store
+
+pytestmark = pytest.mark.anyio
+
+def upstream_calls(upstream: str) -> int:
+    return sum(
+        int(sum(counts[:-1])) for (name, _), counts in UPSTREAM_REQUEST_DURATION.values.items() if name == upstream
+    )
+
+@pytest.fixture
+def channel(monkeypatch):
+    """監看一個新頻道（替身服務的頻道一開始有 3 支剛上傳的影片）"""
+    channel_id = "UC" + unique()
+    monkeypatch.setattr(channel_watcher_service, "WATCH_CHANNELS", [channel_id])
+    monkeypatch.setattr(channel_watcher_service, "YOUTUBE_API_KEY", "watcher-youtube-key")
+    monkeypatch.setattr(channel_watcher_service, "GEMINI_API_KEY", "watcher-gemini-key")
+    return channel_id
+
+async def test_new_uploads_are_prefetched_once(client, auth_headers, channel):
+    assert await ChannelWatcherService.run_once() == {"analyzed": 3, "prefetched": 0, "failed": 0}
+
+    # 清單沒有變動：以 etag 條件式請求，不再處理
+    not_modified = WATCHER_POLLS.values.get(("not_modified",), 0)
+    assert await ChannelWatcherService.run_once() == {"analyzed": 0, "prefetched": 0, "failed": 0}
+    assert WATCHER_POLLS.values[("not_modified",)] == not_modified + 1
+
+    # 影片的逐字稿已寫入全文索引
+    response = await client.get("/api/v1/search/", params={"q": "資本支出", "limit": 100}, headers=auth_headers)
+    video_ids = {result["video_id"] for result in response.json()}
+    assert len([video for video in video_ids if video.startswith(channel[-4:] + "u")]) == 3
+
+async def test_user_request_hits_the_prefetched_analysis(client, channel):
+    await ChannelWatcherService.run_once()
+    video_url = f"https://www.youtube.com/watch?v={channel[-4:]}u000002"
+    transcript = (await client.post("/api/v1/youtube/transcript", json={"url": video_url})).json()["transcript"]
+    assert await shared_store.get(GeminiService.analysis_cache_key(GeminiService.transcript_hash(transcript)))
+
+    gemini_calls = upstream_calls("gemini")
+    response = await client.post("/api/v1/analysis/gemini", json={
+        "transcript": transcript, "api_key": unique("user-key-"), "video_url": video_url,
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["analysis"]["video_url"] == video_url
+    assert upstream_calls("gemini") == gemini_calls
+
+async def test_cached_analysis_requires_a_valid_key(client, channel):
+    await ChannelWatcherService.run_once()
+    video_url = f"https://www.youtube.com/watch?v={channel[-4:]}u000001"
+    transcript = (await client.post("/api/v1/youtube/transcript", json={"url": video_url})).json()["transcript"]
+
+    response = await client.post("/api/v1/analysis/gemini", json={
+        "transcript": transcript, "api_key": "invalid-key", "video_url": video_url,
+    })
+    assert response.status_code == 400
+
+    # 驗證通過的 key 在 GEMINI_KEY_CHECK_TTL 內不再重新驗證
+    api_key = unique("user-key-")
+    checks = upstream_calls("gemini_key_check")
+    for _ in range(2):
+        response = await client.post("/api/v1/analysis/gemini", json={
+            "transcript": transcript, "api_key": api_key, "video_url": video_url,
+        })
+        assert response.status_code == 200
+    assert upstream_calls("gemini_key_check") == checks + 1
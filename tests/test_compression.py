@@ -0,0 +1,63 @@
+import gzip
+import json
+
+import brotli
+import pytest
+
+from compression import negotiate_encoding
+from conftest import stock_payload
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0.5, br;q=0", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+@pytest.fixture
+async def watchlist(client, auth_headers):
+    """回應大於壓縮門檻的追蹤清單"""
+    for index in range(20):
+        await client.post("/api/v1/user/stocks/", json=stock_payload(f"S{index}"), headers=auth_headers)
+    return auth_headers
+
+async def raw_get(client, url: str, headers: dict):
+    """回傳 (回應, 未解碼的內容)"""
+    async with client.stream("GET", url, headers=headers) as response:
+        return response, b"".join([chunk async for chunk in response.aiter_raw()])
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("encoding, decompress", [("br", brotli.decompress), ("gzip", gzip.decompress)])
+async def test_large_json_is_compressed(client, watchlist, encoding, decompress):
+    response, raw = await raw_get(client, "/api/v1/user/stocks/", {**watchlist, "Accept-Encoding": encoding})
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) == len(raw)
+    stocks = json.loads(decompress(raw))
+    assert len(stocks) == 20
+    assert len(raw) < len(json.dumps(stocks))
+
+@pytest.mark.anyio
+async def test_identity_and_small_responses_are_not_compressed(client, watchlist):
+    response, raw = await raw_get(client, "/api/v1/user/stocks/", {**watchlist, "Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert len(json.loads(raw)) == 20
+
+    response, raw = await raw_get(client, "/health", {"Accept-Encoding": "br, gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert json.loads(raw)["status"] == "healthy"
+
+@pytest.mark.anyio
+async def test_streaming_export_is_compressed_incrementally(client, watchlist):
+    response, raw = await raw_get(client, "/api/v1/user/stocks/export?format=ndjson", {**watchlist, "Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    # 串流回應不知道壓縮後的長度
+    assert "Content-Length" not in response.headers
+    lines = gzip.decompress(raw).decode().splitlines()
+    assert sorted(json.loads(line)["symbol"] for line in lines) == sorted(f"S{index}" for index in range(20))
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from starlette.responses import JSONResponse
+
+import deadline
+from conftest import video_id
+from metrics import REQUEST_CANCELLATIONS, UPSTREAM_CANCELLED, UpstreamCall
+
+pytestmark = pytest.mark.anyio
+
+class SlowRoute:
+    """模擬等待外部服務的路由，記錄是否被取消"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.cancelled = False
+        self.budget = None
+
+    async def __call__(self, scope, receive, send):
+        self.budget = deadline.time_left(30.0)
+        try:
+            with UpstreamCall("test_upstream"):
+                await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        await JSONResponse({"ok": True})(scope, receive, send)
+
+async def call(app, path: str, disconnect_after: float = None):
+    """以 ASGI 直接呼叫，回傳送出的訊息；disconnect_after 秒後模擬用戶端中斷連線"""
+    scope = {"type": "http", "method": "POST", "path": path, "headers": []}
+    sent = []
+    requests = [{"type": "http.request", "body": b"{}", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop(0)
+        await asyncio.sleep(disconnect_after if disconnect_after is not None else 3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return scope, sent
+
+@pytest.fixture
+def slow_path(monkeypatch):
+    monkeypatch.setitem(deadline.ROUTE_DEADLINES, "/slow", 0.05)
+    monkeypatch.setattr(deadline, "DEADLINE_GRACE", 0.05)
+    return "/slow"
+
+async def test_requests_over_the_deadline_get_504(slow_path):
+    route = SlowRoute(5)
+    before = REQUEST_CANCELLATIONS.values.get((slow_path, "deadline"), 0)
+    cancelled = UPSTREAM_CANCELLED.values.get(("test_upstream", "deadline"), 0)
+    _, sent = await call(deadline.DeadlineMiddleware(route), slow_path)
+
+    assert route.cancelled
+    assert 0 < route.budget <= 0.05
+    assert sent[0]["status"] == 504
+    assert REQUEST_CANCELLATIONS.values[(slow_path, "deadline")] == before + 1
+    assert UPSTREAM_CANCELLED.values[("test_upstream", "deadline")] == cancelled + 1
+
+async def test_client_disconnect_cancels_the_route(slow_path):
+    route = SlowRoute(5)
+    scope, sent = await call(deadline.DeadlineMiddleware(route), slow_path, disconnect_after=0.01)
+    assert route.cancelled
+    assert sent == []
+    assert scope["client_disconnected"]
+
+async def test_fast_requests_and_other_routes_are_untouched(slow_path):
+    route = SlowRoute(0)
+    _, sent = await call(deadline.DeadlineMiddleware(route), slow_path)
+    assert sent[0]["status"] == 200
+
+    route = SlowRoute(0.1)
+    _, sent = await call(deadline.DeadlineMiddleware(route), "/other")
+    assert sent[0]["status"] == 200
+    assert route.budget == 30.0
+
+async def test_detached_work_survives_cancellation():
+    finished = asyncio.Event()
+
+    async def fill_cache():
+        await asyncio.sleep(0.05)
+        finished.set()
+
+    caller = asyncio.ensure_future(deadline.detached(fill_cache()))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    await asyncio.wait_for(finished.wait(), 1)
+    assert caller.cancelled()
+
+async def test_upstream_timeouts_follow_the_remaining_budget(client, monkeypatch):
+    # 時限在外部呼叫之前就已用完，服務依剩餘時間設定逾時而直接回傳 504
+    monkeypatch.setitem(deadline.ROUTE_DEADLINES, "/api/v1/youtube/metadata", 1e-9)
+    response = await client.post("/api/v1/youtube/metadata", json={"video_id": video_id(), "api_key": "key"})
+    assert response.status_code == 504
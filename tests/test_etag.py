@@ -0,0 +1,64 @@
+import pytest
+
+from conftest import stock_payload
+
+pytestmark = pytest.mark.anyio
+
+async def test_unchanged_list_returns_304(client, auth_headers):
+    await client.post("/api/v1/user/stocks/", json=stock_payload("NVDA"), headers=auth_headers)
+    first = await client.get("/api/v1/user/stocks/", headers=auth_headers)
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    cached = await client.get("/api/v1/user/stocks/", headers={**auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+    # 弱比對，並接受多個候選值
+    strong = etag.removeprefix("W/")
+    cached = await client.get("/api/v1/user/stocks/", headers={**auth_headers, "If-None-Match": f'"x", {strong}'})
+    assert cached.status_code == 304
+
+async def test_each_representation_has_its_own_etag(client, auth_headers):
+    plain = await client.get("/api/v1/user/stocks/", headers=auth_headers)
+    paged = await client.get("/api/v1/user/stocks/", params={"limit": 1}, headers=auth_headers)
+    fields = await client.get("/api/v1/user/stocks/", params={"fields": "id,symbol"}, headers=auth_headers)
+    assert len({plain.headers["ETag"], paged.headers["ETag"], fields.headers["ETag"]}) == 3
+
+    response = await client.get(
+        "/api/v1/user/stocks/", params={"limit": 1}, headers={**auth_headers, "If-None-Match": plain.headers["ETag"]}
+    )
+    assert response.status_code == 200
+
+async def test_writes_invalidate_the_etag(client, auth_headers):
+    created = await client.post("/api/v1/user/stocks/", json=stock_payload("AMD"), headers=auth_headers)
+    stock_id = created.json()["id"]
+
+    async def changed(etag: str) -> str:
+        response = await client.get("/api/v1/user/stocks/", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        return response.headers["ETag"]
+
+    etag = (await client.get("/api/v1/user/stocks/", headers=auth_headers)).headers["ETag"]
+    await client.patch(f"/api/v1/user/stocks/{stock_id}/name", params={"custom_name": "超微"}, headers=auth_headers)
+    etag = await changed(etag)
+    await client.put(f"/api/v1/user/stocks/{stock_id}", json=stock_payload("AMD", start_price=90.0), headers=auth_headers)
+    etag = await changed(etag)
+    await client.delete(f"/api/v1/user/stocks/{stock_id}", headers=auth_headers)
+    await changed(etag)
+
+async def test_etags_are_per_user(client, make_user):
+    first, second = await make_user(), await make_user()
+    etag = (await client.get("/api/v1/user/stocks/", headers=first)).headers["ETag"]
+    response = await client.get("/api/v1/user/stocks/", headers={**second, "If-None-Match": etag})
+    assert response.status_code == 200
+
+async def test_me_supports_conditional_requests(client, auth_headers):
+    me = await client.get("/api/v1/auth/me", headers=auth_headers)
+    assert me.status_code == 200
+    cached = await client.get("/api/v1/auth/me", headers={**auth_headers, "If-None-Match": me.headers["ETag"]})
+    assert cached.status_code == 304
+    # 與清單的 ETag 不互通
+    listing = await client.get("/api/v1/user/stocks/", headers={**auth_headers, "If-None-Match": me.headers["ETag"]})
+    assert listing.status_code == 200
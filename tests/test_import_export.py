@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+
+import pytest
+
+from conftest import analysis_json, stock_payload, video_id
+from routers import user_stocks
+
+pytestmark = pytest.mark.anyio
+
+HEADER = "symbol,company_name,currency,start_tracking_date,start_price\n"
+
+async def import_file(client, headers, content: str, filename: str, **params):
+    response = await client.post(
+        "/api/v1/user/stocks/import", params=params, files={"file": (filename, content.encode())}, headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+async def test_csv_import_reports_bad_rows_and_writes_the_rest(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(user_stocks, "TRANSFER_BATCH_SIZE", 2)
+    await client.post("/api/v1/user/stocks/", json=stock_payload("MSFT"), headers=auth_headers)
+    content = "﻿" + HEADER + (
+        "NVDA,NVIDIA,USD,2024-05-01T00:00:00,100\n"
+        "AMD,AMD,USD,2024-05-01T00:00:00,not-a-price\n"
+        "NVDA,NVIDIA,USD,2024-05-01T00:00:00,100\n"
+        "MSFT,Microsoft,USD,2024-05-01T00:00:00,300\n"
+        "TSLA,Tesla,USD,2024-05-01T00:00:00,200\n"
+        "AAPL,Apple,USD,2024-05-01T00:00:00,150\n"
+    )
+    result = await import_file(client, auth_headers, content, "watchlist.csv")
+
+    assert result["imported"] == 3
+    assert [(error["row"], error["symbol"]) for error in result["errors"]] == [(2, "AMD"), (3, "NVDA"), (4, "MSFT")]
+    listing = (await client.get("/api/v1/user/stocks/", headers=auth_headers)).json()
+    assert [stock["symbol"] for stock in listing] == ["MSFT", "NVDA", "TSLA", "AAPL"]
+
+async def test_ndjson_import_skips_unparseable_lines(client, auth_headers):
+    lines = [json.dumps(stock_payload("NVDA")), "{broken", "", json.dumps(stock_payload("AMD"))]
+    result = await import_file(client, auth_headers, "\n".join(lines), "watchlist.txt", format="ndjson")
+    assert result["imported"] == 2
+    assert [error["row"] for error in result["errors"]] == [2]
+
+async def test_unknown_format_is_rejected(client, auth_headers):
+    response = await client.post(
+        "/api/v1/user/stocks/import", files={"file": ("watchlist.bin", b"x", "application/octet-stream")},
+        headers=auth_headers
+    )
+    assert response.status_code == 400
+
+async def test_export_streams_every_batch_in_both_formats(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(user_stocks, "TRANSFER_BATCH_SIZE", 2)
+    content = analysis_json(video_id(), [("NVDA", "bullish", 80)])
+    symbols = ["NVDA", "AMD", "TSLA", "AAPL", "MSFT"]
+    for symbol in symbols:
+        await client.post("/api/v1/user/stocks/", json=stock_payload(symbol, youtube_analysis=content), headers=auth_headers)
+
+    response = await client.get("/api/v1/user/stocks/export", params={"format": "csv"}, headers=auth_headers)
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["symbol"] for row in rows] == symbols
+    assert rows[0]["youtube_analysis"] == content
+
+    response = await client.get("/api/v1/user/stocks/export", params={"format": "ndjson"}, headers=auth_headers)
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["symbol"] for record in records] == symbols
+
+async def test_export_round_trips_through_import(client, make_user):
+    source, target = await make_user(), await make_user()
+    for symbol in ["NVDA", "AMD"]:
+        await client.post("/api/v1/user/stocks/", json=stock_payload(symbol, custom_name="核心"), headers=source)
+    exported = (await client.get("/api/v1/user/stocks/export", params={"format": "ndjson"}, headers=source)).text
+
+    result = await import_file(client, target, exported, "watchlist.ndjson")
+    assert result["imported"] == 2
+    listing = (await client.get("/api/v1/user/stocks/", headers=target)).json()
+    assert [(stock["symbol"], stock["custom_name"]) for stock in listing] == [("NVDA", "核心"), ("AMD", "核心")]
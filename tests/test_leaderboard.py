@@ -0,0 +1,103 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from conftest import analysis_json, stock_payload, unique, video_id
+from database import WriteSessionLocal
+from models.analysis_models import ChannelScore
+from services.leaderboard_service import BENCHMARK_SYMBOL, LeaderboardService
+from services.price_service import PriceService
+from services.video_catalog_service import VideoCatalogService
+from update_prices import price_targets
+
+pytestmark = pytest.mark.anyio
+
+PUBLISHED = datetime(2024, 1, 2)
+TODAY = date(2024, 1, 20)
+
+async def channel_score(db, channel_id: str, horizon: int = 7):
+    return (await db.execute(select(ChannelScore).where(
+        ChannelScore.channel_id == channel_id, ChannelScore.horizon_days == horizon
+    ))).scalar_one_or_none()
+
+@pytest.fixture
+async def calls(client, auth_headers):
+    """同一頻道的兩個判斷：看多上漲的股票（命中）、看空上漲的股票（未命中）"""
+    channel_id = unique("UC")
+    rising, other = unique("R").upper(), unique("O").upper()
+    async with WriteSessionLocal() as db:
+        for symbol, start, step in ((rising, 100.0, 2.0), (other, 50.0, 1.0), (BENCHMARK_SYMBOL, 400.0, 1.0)):
+            await PriceService.upsert_prices(db, symbol, [
+                (PUBLISHED.date() + timedelta(days=day), start + step * day) for day in range(15)
+            ])
+        videos = [video_id(), video_id()]
+        for video in videos:
+            await VideoCatalogService.upsert_video(db, {
+                "video_id": video, "channel_id": channel_id, "channel_title": "測試頻道",
+                "published_at": PUBLISHED.isoformat(),
+            })
+        await db.commit()
+
+    for video, stocks in zip(videos, [[(rising, "bullish", 90)], [(other, "bearish", 80), (unique("L").upper(), "bullish", 20)]]):
+        await client.post(
+            "/api/v1/user/stocks/", json=stock_payload(stocks[0][0], youtube_analysis=analysis_json(video, stocks)),
+            headers=auth_headers
+        )
+    return channel_id
+
+async def test_refresh_scores_each_call_once(calls):
+    async with WriteSessionLocal() as db:
+        assert await LeaderboardService.refresh(db, TODAY) >= 2
+        await db.commit()
+        score = await channel_score(db, calls)
+        # 信心度低於門檻的判斷不計入
+        assert (score.calls, score.hits) == (2, 1)
+        assert score.hit_rate == 0.5
+        # 價格只涵蓋 15 天，較長的觀察天數尚未評分
+        assert await channel_score(db, calls, 30) is None
+
+        await LeaderboardService.refresh(db, TODAY)
+        await db.commit()
+        assert (await channel_score(db, calls)).calls == 2
+
+async def test_concurrently_scored_outcomes_are_not_counted_twice(calls):
+    async with WriteSessionLocal() as db:
+        pending = await LeaderboardService._pending_calls(db, 7, TODAY)
+        batch = [call for call in pending if call["channel_id"] == calls]
+        assert len(batch) == 2
+        # 兩個 worker 讀到同一批待評分的判斷
+        assert await LeaderboardService._score_batch(db, batch, 7) == 2
+        assert await LeaderboardService._score_batch(db, batch, 7) == 0
+        await db.commit()
+        assert (await channel_score(db, calls)).calls == 2
+
+async def test_leaderboard_endpoint_reads_precomputed_scores(client, calls):
+    async with WriteSessionLocal() as db:
+        await LeaderboardService.refresh(db, TODAY)
+        await db.commit()
+    response = await client.get("/api/v1/leaderboard/", params={"horizon": 7, "min_calls": 1, "limit": 100})
+    assert response.status_code == 200
+    [entry] = [entry for entry in response.json() if entry["channel_id"] == calls]
+    assert (entry["calls"], entry["hits"], entry["channel_title"]) == (2, 1, "測試頻道")
+
+async def test_prices_are_fetched_for_untracked_mentioned_symbols(client, auth_headers):
+    mentioned, video = unique("U").upper(), video_id()
+    async with WriteSessionLocal() as db:
+        await VideoCatalogService.upsert_video(db, {
+            "video_id": video, "channel_id": unique("UC"), "channel_title": "測試頻道",
+            "published_at": PUBLISHED.isoformat(),
+        })
+        await db.commit()
+    # 追蹤的是另一支股票，被評分的判斷沒有人追蹤
+    await client.post(
+        "/api/v1/user/stocks/",
+        json=stock_payload(unique("T").upper(), youtube_analysis=analysis_json(video, [(mentioned, "bullish", 90)])),
+        headers=auth_headers
+    )
+
+    async with WriteSessionLocal() as db:
+        targets = {symbol: (currency, start) for symbol, currency, start in await price_targets(db)}
+    assert targets[mentioned][0] == "USD"
+    assert targets[mentioned][1] <= PUBLISHED
+    assert BENCHMARK_SYMBOL in targets
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import analysis_json, stock_payload, video_id
+from services.mention_service import MentionService
+
+def test_extract_mentions_accepts_camel_and_snake_case():
+    analysis = {
+        "videoUrl": "https://youtu.be/abcdefghijk",
+        "publishDate": "2024-06-01T12:00:00Z",
+        "stockAnalyses": [{"symbol": " nvda ", "companyName": "NVIDIA", "sentiment": "bullish", "confidence": 90}],
+        "mentioned_companies": [{"company_name": "台積電", "confidence": 30}],
+    }
+    mentions = MentionService.extract_mentions(analysis)
+    assert [(m["source"], m["symbol"], m["company_name"]) for m in mentions] == [
+        ("stock_analysis", "NVDA", "NVIDIA"),
+        ("mentioned_company", None, "台積電"),
+    ]
+    assert {m["video_id"] for m in mentions} == {"abcdefghijk"}
+    assert mentions[0]["mentioned_at"].year == 2024
+
+def test_mention_rows_are_keyed_by_analysis_and_ordinal():
+    content = analysis_json("abcdefghijk", [("NVDA", "bullish", 80), ("AMD", "bearish", 60)], ["台積電"])
+    rows = MentionService.mention_rows("hash", content)
+    assert [(row["analysis_hash"], row["ordinal"]) for row in rows] == [("hash", 0), ("hash", 1), ("hash", 2)]
+    assert MentionService.mention_rows("hash", "not json") == []
+
+@pytest.mark.anyio
+async def test_shared_analysis_is_stored_once(client, make_user):
+    video = video_id()
+    content = analysis_json(video, [("NVDA", "bullish", 80)], ["台積電"])
+    users = [await make_user() for _ in range(3)]
+    stock_ids = []
+    for headers in users:
+        response = await client.post(
+            "/api/v1/user/stocks/", json=stock_payload("NVDA", youtube_analysis=content), headers=headers
+        )
+        stock_ids.append(response.json()["id"])
+
+    async def mentions(**params):
+        response = await client.get("/api/v1/mentions/", params={"video_id": video, **params}, headers=users[0])
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    assert [(m["source"], m["symbol"]) for m in await mentions()] == [
+        ("stock_analysis", "NVDA"), ("mentioned_company", None)
+    ]
+    assert [m["symbol"] for m in await mentions(symbol="nvda", sentiment="bullish", min_confidence=80)] == ["NVDA"]
+    assert await mentions(sentiment="bearish") == []
+
+    # 其他使用者仍引用時保留，最後一個引用刪除後一併移除
+    for headers, stock_id in zip(users[:2], stock_ids[:2]):
+        await client.delete(f"/api/v1/user/stocks/{stock_id}", headers=headers)
+    assert len(await mentions()) == 2
+    await client.delete(f"/api/v1/user/stocks/{stock_ids[2]}", headers=users[2])
+    assert await mentions() == []
+
+@pytest.mark.anyio
+async def test_mentions_require_login(client):
+    assert (await client.get("/api/v1/mentions/")).status_code == 403
@@ -0,0 +1,35 @@
+import pytest
+
+from conftest import stock_payload, video_id
+from metrics import REGISTRY, Histogram
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_duration_seconds", "測試", ("route",), buckets=(0.1, 1.0))
+    REGISTRY.remove(histogram)
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, ("/a",))
+    assert histogram.samples() == [
+        'test_duration_seconds_bucket{route="/a",le="0.1"} 1',
+        'test_duration_seconds_bucket{route="/a",le="1.0"} 3',
+        'test_duration_seconds_bucket{route="/a",le="+Inf"} 4',
+        'test_duration_seconds_sum{route="/a"} 6.05',
+        'test_duration_seconds_count{route="/a"} 4',
+    ]
+
+@pytest.mark.anyio
+async def test_metrics_endpoint(client, auth_headers):
+    await client.post("/api/v1/user/stocks/", json=stock_payload("NVDA"), headers=auth_headers)
+    await client.get(f"/no-such-path/{video_id()}")
+    await client.post("/api/v1/youtube/transcript", json={"url": f"https://www.youtube.com/watch?v={video_id()}"})
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    # 路由以路徑樣板為標籤，未匹配的路徑合併為 unmatched
+    assert 'http_requests_total{method="POST",route="/api/v1/user/stocks/",status="200"}' in text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in text
+    assert 'upstream_request_duration_seconds_count{upstream="youtube_transcript",outcome="ok"}' in text
+    assert 'db_query_duration_seconds_count{engine="write",operation="INSERT"}' in text
+    assert "http_requests_in_progress 1" in text
@@ -0,0 +1,67 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from conftest import stock_payload, unique
+from database import WriteSessionLocal
+from services.performance_service import PerformanceService
+from services.price_service import CsvPriceProvider, PriceProvider, PriceService
+
+def reference(start_price, closes):
+    """逐筆計算的對照結果：(報酬率 %, 最大回撤 %)"""
+    peak, drawdown = start_price, 0.0
+    for close in [start_price, *closes]:
+        peak = max(peak, close)
+        drawdown = min(drawdown, close / peak - 1)
+    return round((closes[-1] / start_price - 1) * 100, 4), round(drawdown * 100, 4)
+
+def test_vectorized_performance_matches_reference():
+    start = date(2024, 1, 1)
+    closes = {"AAA": [110.0, 90.0, 120.0, 100.0], "BBB": [50.0, 55.0, 40.0]}
+    prices = sorted(
+        (symbol, start + timedelta(days=day), close)
+        for symbol, series in closes.items() for day, close in enumerate(series)
+    )
+    stocks = [
+        (1, "AAA", datetime(2024, 1, 1), 100.0),
+        (2, "BBB", datetime(2024, 1, 2), 60.0),
+        (3, "CCC", datetime(2024, 1, 1), 10.0),
+        (4, "AAA", datetime(2024, 1, 3), 0.0),
+    ]
+    results = PerformanceService.compute(stocks, prices, date(2024, 1, 11))
+
+    assert (results[0]["return_pct"], results[0]["max_drawdown_pct"]) == reference(100.0, closes["AAA"])
+    # 起始日之前的價格不列入
+    assert (results[1]["return_pct"], results[1]["max_drawdown_pct"]) == reference(60.0, closes["BBB"][1:])
+    assert results[0]["latest_price_date"] == date(2024, 1, 4)
+    assert [result["days_held"] for result in results] == [10, 9, 10, 8]
+    # 沒有價格資料與起始價為 0 的項目不計算
+    assert results[2]["return_pct"] is None and results[2]["latest_price"] is None
+    assert results[3]["return_pct"] is None
+
+def test_csv_provider_filters_by_symbol_and_range(tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text("symbol,date,close\nnvda,2024-01-02,11\nNVDA,2024-01-01,10\nNVDA,2024-01-05,12\nAMD,2024-01-01,5\n")
+    provider = CsvPriceProvider(str(path))
+    assert provider.fetch_daily_prices("NVDA", date(2024, 1, 1), date(2024, 1, 2)) == [
+        (date(2024, 1, 1), 10.0), (date(2024, 1, 2), 11.0)
+    ]
+
+def test_price_provider_is_abstract():
+    with pytest.raises(TypeError):
+        PriceProvider()
+
+@pytest.mark.anyio
+async def test_performance_endpoint_uses_stored_prices(client, auth_headers):
+    symbol = unique("P").upper()[:8]
+    async with WriteSessionLocal() as db:
+        await PriceService.upsert_prices(db, symbol, [(date(2024, 5, 1), 100.0), (date(2024, 5, 2), 80.0)])
+        # 重複寫入同一天會更新收盤價
+        await PriceService.upsert_prices(db, symbol, [(date(2024, 5, 3), 90.0), (date(2024, 5, 3), 110.0)])
+        await db.commit()
+
+    await client.post("/api/v1/user/stocks/", json=stock_payload(symbol), headers=auth_headers)
+    [performance] = (await client.get("/api/v1/user/stocks/performance", headers=auth_headers)).json()
+    assert performance["latest_price"] == 110.0
+    assert performance["return_pct"] == 10.0
+    assert performance["max_drawdown_pct"] == -20.0
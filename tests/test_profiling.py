@@ -0,0 +1,34 @@
+import pytest
+
+from conftest import ADMIN_HEADERS
+
+pytestmark = pytest.mark.anyio
+
+async def test_profiled_request_can_be_downloaded(client):
+    response = await client.get("/health", headers={"X-Profile": "test-admin"})
+    assert response.status_code == 200
+    name = response.headers["X-Profile-Id"]
+    assert name.endswith("-GET-health.speedscope.json")
+
+    profiles = (await client.get("/api/v1/admin/profiles", headers=ADMIN_HEADERS)).json()
+    [profile] = [profile for profile in profiles if profile["name"] == name]
+    assert profile["format"] == "speedscope"
+
+    download = await client.get(f"/api/v1/admin/profiles/{name}", headers=ADMIN_HEADERS)
+    assert download.status_code == 200
+    speedscope = download.json()
+    assert speedscope["profiles"][0]["name"] == "GET /health"
+    assert speedscope["profiles"][0]["type"] == "sampled"
+
+async def test_requests_without_the_admin_token_are_not_profiled(client):
+    assert "X-Profile-Id" not in (await client.get("/health")).headers
+    assert "X-Profile-Id" not in (await client.get("/health", headers={"X-Profile": "wrong"})).headers
+
+async def test_admin_endpoints_require_the_token(client):
+    assert (await client.get("/api/v1/admin/profiles")).status_code == 403
+    assert (await client.get("/api/v1/admin/profiles", headers={"X-Admin-Token": "wrong"})).status_code == 403
+
+async def test_download_only_serves_profile_files(client):
+    for name in ("missing.speedscope.json", "kolog.db", "..%2Fkolog.db"):
+        response = await client.get(f"/api/v1/admin/profiles/{name}", headers=ADMIN_HEADERS)
+        assert response.status_code == 404
@@ -0,0 +1,100 @@
+import random
+import sqlite3
+
+import httpx
+import pytest
+
+import quota
+from conftest import video_id
+
+def test_parse_limit():
+    assert quota.parse_limit("10/60") == (10, 10 / 60)
+    assert quota.parse_limit("5") == (5, 5 / 60)
+    assert quota.parse_limit("0/60") is None
+    assert quota.parse_limit("") is None
+
+@pytest.fixture
+def tight_limit(monkeypatch):
+    """元數據路由每個呼叫者只能連續送出兩次，之後幾乎不補充"""
+    monkeypatch.setitem(quota.LIMITS, "upstream", (2, 0.01))
+
+@pytest.fixture
+async def connect(started_app):
+    """建立來自指定（預設為隨機）用戶端 IP 的 client"""
+    clients = []
+
+    async def connect(ip: str = None):
+        ip = ip or f"10.{random.randrange(256)}.{random.randrange(256)}.{random.randrange(1, 255)}"
+        transport = httpx.ASGITransport(app=started_app, client=(ip, 50000))
+        client = httpx.AsyncClient(transport=transport, base_url="http://test")
+        clients.append(client)
+        return client
+
+    yield connect
+    for client in clients:
+        await client.aclose()
+
+async def metadata(client, headers: dict = None):
+    return await client.post("/api/v1/youtube/metadata", json={"video_id": video_id(), "api_key": "key"}, headers=headers)
+
+@pytest.mark.anyio
+async def test_requests_over_quota_get_429(connect, tight_limit):
+    client = await connect()
+    first, second, third = [await metadata(client) for _ in range(3)]
+    assert (first.status_code, second.status_code) == (200, 200)
+    assert (first.headers["RateLimit-Limit"], first.headers["RateLimit-Remaining"]) == ("2", "1")
+    assert second.headers["RateLimit-Remaining"] == "0"
+    assert first.headers["RateLimit-Policy"] == "2;w=200"
+
+    assert third.status_code == 429
+    assert third.json()["success"] is False
+    assert third.headers["RateLimit-Remaining"] == "0"
+    assert 0 < int(third.headers["Retry-After"]) <= 100
+
+@pytest.mark.anyio
+async def test_each_caller_has_its_own_bucket(connect, make_user, tight_limit):
+    client = await connect()
+    for _ in range(2):
+        await metadata(client)
+    assert (await metadata(client)).status_code == 429
+    assert (await metadata(await connect())).status_code == 200
+    # 已登入的使用者以使用者計算，不受同一個 IP 的其他呼叫影響
+    assert (await metadata(client, await make_user())).status_code == 200
+
+@pytest.mark.anyio
+async def test_rotating_headers_does_not_reset_the_bucket(connect, tight_limit):
+    client = await connect()
+    for _ in range(2):
+        await metadata(client, {"X-Api-Key": f"key-{random.random()}"})
+    for headers in (
+        {"X-Api-Key": f"key-{random.random()}"},
+        {"X-Forwarded-For": "203.0.113.9"},
+        {"Authorization": "Bearer not-a-token"},
+    ):
+        assert (await metadata(client, headers)).status_code == 429
+
+@pytest.mark.anyio
+async def test_forwarded_address_is_used_behind_a_trusted_proxy(connect, tight_limit, monkeypatch):
+    monkeypatch.setattr(quota, "QUOTA_TRUST_FORWARDED", True)
+    proxy = await connect()
+    for _ in range(2):
+        await metadata(proxy, {"X-Forwarded-For": "203.0.113.10, 10.0.0.1"})
+    assert (await metadata(proxy, {"X-Forwarded-For": "203.0.113.10"})).status_code == 429
+    assert (await metadata(proxy, {"X-Forwarded-For": "203.0.113.11"})).status_code == 200
+
+@pytest.mark.anyio
+async def test_other_routes_are_not_limited(client, auth_headers, tight_limit):
+    response = await client.get("/api/v1/user/stocks/", headers=auth_headers)
+    assert response.status_code == 200
+    assert "RateLimit-Limit" not in response.headers
+
+@pytest.mark.anyio
+async def test_store_errors_fail_open(connect, tight_limit, monkeypatch):
+    async def unavailable(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(quota.shared_store, "take", unavailable)
+    client = await connect()
+    responses = [await metadata(client) for _ in range(3)]
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert "RateLimit-Limit" not in responses[0].headers
@@ -0,0 +1,35 @@
+import json
+from datetime import datetime
+from typing import Optional
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field
+
+from conftest import stock_payload
+from models.schemas import UserStockResponse
+from responses import ModelResponse
+
+class Item(BaseModel):
+    video_id: str = Field(alias="videoId")
+    created_at: datetime
+    score: Optional[float] = None
+
+def test_models_serialize_by_alias():
+    item = Item(videoId="abc", created_at=datetime(2024, 5, 1, 8, 30), score=1.5)
+    response = ModelResponse([item])
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == [{"videoId": "abc", "created_at": "2024-05-01T08:30:00", "score": 1.5}]
+
+def test_non_finite_numbers_become_null():
+    response = ModelResponse({"nan": float("nan"), "inf": float("inf"), "rows": [{"value": 1}]})
+    assert json.loads(response.body) == {"nan": None, "inf": None, "rows": [{"value": 1}]}
+
+@pytest.mark.anyio
+async def test_endpoint_output_matches_response_model(client, auth_headers):
+    response = await client.post("/api/v1/user/stocks/", json=stock_payload("NVDA"), headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    body = response.json()
+    # 與 FastAPI 以 response_model 驗證後輸出的內容相同
+    assert body == jsonable_encoder(UserStockResponse.model_validate(body))
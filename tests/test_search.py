@@ -0,0 +1,62 @@
+import pytest
+
+from conftest import analysis_json, stock_payload, unique, video_id
+
+pytestmark = pytest.mark.anyio
+
+async def search(client, headers, q: str):
+    response = await client.get("/api/v1/search/", params={"q": q, "limit": 100}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+async def add_stock(client, headers, video: str, summary: str) -> int:
+    response = await client.post(
+        "/api/v1/user/stocks/",
+        json=stock_payload("NVDA", youtube_analysis=analysis_json(video, [("NVDA", "bullish", 80)], summary=summary)),
+        headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+async def test_search_requires_login(client):
+    assert (await client.get("/api/v1/search/", params={"q": "NVDA"})).status_code == 403
+
+async def test_analysis_is_searchable_with_cjk_phrases(client, auth_headers):
+    video, token = video_id(), unique("kw")
+    await add_stock(client, auth_headers, video, f"{token} 影片討論資料中心資本支出")
+
+    [result] = await search(client, auth_headers, f"{token} 資料中心")
+    assert result["video_id"] == video
+    assert "<mark>" in result["snippet"]
+    # 中文詞需連續出現才符合
+    assert await search(client, auth_headers, f"{token} 料心") == []
+
+async def test_released_analysis_leaves_the_index(client, make_user):
+    first, second = await make_user(), await make_user()
+    video, token, other_token = video_id(), unique("kw"), unique("kw")
+    first_id = await add_stock(client, first, video, token)
+    second_id = await add_stock(client, second, video, other_token)
+
+    # 同一影片還有其他使用者的分析時，以該分析重新索引
+    await client.delete(f"/api/v1/user/stocks/{second_id}", headers=second)
+    assert [result["video_id"] for result in await search(client, first, token)] == [video]
+    assert await search(client, first, other_token) == []
+
+    await client.delete(f"/api/v1/user/stocks/{first_id}", headers=first)
+    assert await search(client, first, token) == []
+
+async def test_transcript_is_indexed_with_the_analysis(client, auth_headers):
+    video, token = video_id(), unique("kw")
+    response = await client.post("/api/v1/youtube/transcript", json={"url": f"https://www.youtube.com/watch?v={video}"})
+    assert response.status_code == 200, response.text
+    # 未登入取得的逐字稿不進入其他使用者的搜尋結果
+    results = await search(client, auth_headers, "資本支出 伺服器")
+    assert video not in [result["video_id"] for result in results]
+
+    stock_id = await add_stock(client, auth_headers, video, token)
+    assert [result["video_id"] for result in await search(client, auth_headers, f"{token} 資本支出 伺服器")] == [video]
+
+    await client.delete(f"/api/v1/user/stocks/{stock_id}", headers=auth_headers)
+    assert await search(client, auth_headers, token) == []
+    results = await search(client, auth_headers, "資本支出 伺服器")
+    assert video in [result["video_id"] for result in results]
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from conftest import TEST_DIR, unique, video_id
+from database import init_db
+from metrics import UPSTREAM_REQUEST_DURATION
+from shared_state import SharedStore
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def stores():
+    """兩個行程各自開啟同一個檔案"""
+    path = f"{TEST_DIR}/{unique('shared-')}.db"
+    first, second = SharedStore(path), SharedStore(path)
+    yield first, second
+    first.close()
+    second.close()
+
+def upstream_calls(upstream: str) -> int:
+    return sum(
+        int(sum(counts[:-1])) for (name, _), counts in UPSTREAM_REQUEST_DURATION.values.items() if name == upstream
+    )
+
+async def test_values_are_shared_between_instances(stores):
+    first, second = stores
+    await first.set("metadata:a", {"title": "影片"})
+    await first.set_many({"k:1": 1, "k:2": [2]})
+    assert await second.get("metadata:a") == {"title": "影片"}
+    assert await second.get_many(["k:1", "k:2", "k:3"]) == {"k:1": 1, "k:2": [2]}
+    assert await second.scan(["k:"]) == {"k:1": 1, "k:2": [2]}
+
+    await second.delete("metadata:a")
+    assert await first.get("metadata:a") is None
+
+async def test_expired_values_are_hidden(stores):
+    first, second = stores
+    await first.set("short", "x", ttl=0.05)
+    await first.set("long", "y", ttl=60)
+    await asyncio.sleep(0.1)
+    assert await second.get_many(["short", "long"]) == {"long": "y"}
+
+async def test_counters_are_atomic_across_instances(stores):
+    first, second = stores
+    await asyncio.gather(*[store.incr("counter", ttl=60) for store in (first, second) for _ in range(20)])
+    assert await first.get("counter") == 40
+
+    # 過期後從新的視窗重新計算
+    assert await first.incr("window", ttl=0.05) == 1
+    await asyncio.sleep(0.1)
+    assert await second.incr("window", ttl=60) == 1
+
+async def test_token_bucket_is_shared(stores):
+    first, second = stores
+    assert await first.take("bucket", capacity=2, rate=0.001) == (True, 1)
+    allowed, _ = await second.take("bucket", capacity=2, rate=0.001)
+    assert allowed
+    allowed, _ = await first.take("bucket", capacity=2, rate=0.001)
+    assert not allowed
+
+async def test_schema_is_created_once(started_app):
+    # 應用啟動時已建立，schema 沒有變動時其他 worker 略過
+    assert await init_db() is False
+
+async def test_cached_metadata_is_only_served_to_known_keys(client):
+    video = video_id()
+
+    async def metadata(api_key: str):
+        return await client.post("/api/v1/youtube/metadata", json={"video_id": video, "api_key": api_key})
+
+    calls = upstream_calls("youtube_data_api")
+    first = await metadata("key-a")
+    assert first.status_code == 200, first.text
+    assert (await metadata("key-a")).json() == first.json()
+    assert upstream_calls("youtube_data_api") == calls + 1
+
+    # 未呼叫過 API 的 key 不能讀取快取
+    assert (await metadata("invalid-key")).status_code == 403
+    assert (await metadata("key-b")).status_code == 200
+    assert upstream_calls("youtube_data_api") == calls + 3
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from conftest import unique, video_id
+from metrics import UPSTREAM_REQUEST_DURATION
+from services.similarity_service import TranscriptSimilarityService
+
+def random_transcript(length: int = 2000) -> str:
+    """不與其他測試的逐字稿相似的隨機中文（含一個替身服務會分析的代號）"""
+    rng = random.Random(unique())
+    return "NVDA " + "".join(chr(rng.randrange(0x4E00, 0x9FA5)) for _ in range(length))
+
+def upstream_calls(upstream: str) -> int:
+    return sum(
+        int(sum(counts[:-1])) for (name, _), counts in UPSTREAM_REQUEST_DURATION.values.items() if name == upstream
+    )
+
+def test_signature_similarity():
+    similarity = TranscriptSimilarityService.similarity
+    signature = TranscriptSimilarityService.signature
+    transcript = random_transcript()
+    assert similarity(signature(transcript), signature(transcript)) == 1.0
+    # 大小寫、空白與標點不影響
+    assert similarity(signature(transcript), signature(transcript.lower().replace("", " ") + "。")) == 1.0
+    assert similarity(signature(transcript), signature(transcript[:1900] + "第二集片尾")) > 0.8
+    assert similarity(signature(transcript), signature(random_transcript())) < 0.3
+    assert signature("太短") is None
+
+@pytest.mark.anyio
+async def test_near_duplicate_transcripts_reuse_the_analysis(client):
+    original, original_url = random_transcript(), f"https://www.youtube.com/watch?v={video_id()}"
+    reupload_url = f"https://www.youtube.com/watch?v={video_id()}"
+
+    async def analyze(transcript: str, video_url: str, api_key: str = "key", **fields):
+        return await client.post("/api/v1/analysis/gemini", json={
+            "transcript": transcript, "api_key": api_key, "video_url": video_url, **fields
+        })
+
+    calls = upstream_calls("gemini")
+    first = await analyze(original, original_url)
+    assert first.status_code == 200, first.text
+    assert first.json()["reused_from"] is None
+    assert upstream_calls("gemini") == calls + 1
+
+    # 同一影片重新分析不算沿用；逐字稿完全相同的其他影片記錄來源
+    assert (await analyze(original, original_url)).json()["reused_from"] is None
+    response = await analyze(original, reupload_url)
+    assert response.json()["reused_from"] == {"video_url": original_url, "similarity": 1.0}
+    assert response.json()["analysis"]["video_url"] == reupload_url
+    assert upstream_calls("gemini") == calls + 1
+
+    reupload = original[:-50] + "歡迎訂閱頻道"
+    response = await analyze(reupload, reupload_url)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["reused_from"]["video_url"] == original_url
+    assert body["reused_from"]["similarity"] >= 0.8
+    assert body["analysis"]["video_url"] == reupload_url
+    assert body["analysis"]["stock_analyses"] == first.json()["analysis"]["stock_analyses"]
+    assert upstream_calls("gemini") == calls + 1
+
+    # 無效的 key 不能沿用他人付費取得的分析
+    assert (await analyze(reupload, reupload_url, api_key="invalid-key")).status_code == 400
+
+    # 關閉沿用時實際呼叫 Gemini
+    response = await analyze(reupload, reupload_url, allow_similar=False)
+    assert response.json()["reused_from"] is None
+    assert upstream_calls("gemini") == calls + 2
@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import database
+
+pytestmark = pytest.mark.anyio
+
+async def pragma(engine, name: str):
+    async with engine.connect() as conn:
+        return (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+
+async def test_write_connection_uses_the_configured_profile(started_app):
+    assert (await pragma(database.write_engine, "journal_mode")).lower() == database.SQLITE_JOURNAL_MODE.lower()
+    assert await pragma(database.write_engine, "busy_timeout") == database.SQLITE_BUSY_TIMEOUT_MS
+    # NORMAL = 1
+    assert await pragma(database.write_engine, "synchronous") == 1
+    assert await pragma(database.write_engine, "cache_size") == database.SQLITE_CACHE_SIZE
+    assert await pragma(database.write_engine, "query_only") == 0
+
+async def test_read_connections_refuse_writes(started_app):
+    assert await pragma(database.read_engine, "query_only") == 1
+    async with database.read_engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            await conn.execute(text("CREATE TABLE read_only_probe (id INTEGER)"))
+
+def test_engine_pools_are_split():
+    assert database.write_engine.pool.size() == 1
+    assert database.read_engine.pool.size() == database.DB_READ_POOL_SIZE
+
+async def test_schema_is_created_once_per_fingerprint(started_app):
+    # 啟動時已建立 schema 並寫入 user_version，再次初始化會略過
+    assert await database.init_db() is False
@@ -0,0 +1,16 @@
+import startup_profile
+
+# 只在處理請求時才需要的套件，匯入 main 時不應載入
+LAZY_PACKAGES = {"numpy", "httpx", "jose", "passlib", "youtube_transcript_api", "requests", "uvicorn"}
+
+def test_heavy_packages_are_not_imported_at_startup(tmp_path):
+    breakdown = startup_profile.import_breakdown(str(tmp_path))
+    packages = {item["package"] for item in breakdown["packages"]}
+    assert "fastapi" in packages
+    assert packages & LAZY_PACKAGES == set()
+    assert any(item["module"] == "main" for item in breakdown["app_modules"])
+
+def test_measure_phases(tmp_path):
+    phases = startup_profile.measure_phases(str(tmp_path))
+    assert set(phases) == {"import_ms", "lifespan_ms"}
+    assert all(value > 0 for value in phases.values())
@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import create_engine
+
+import database
+from conftest import analysis_json, stock_payload, video_id
+
+@pytest.mark.anyio
+async def test_summary_follows_every_watchlist_change(client, auth_headers):
+    async def summary():
+        response = await client.get("/api/v1/user/stocks/summary", headers=auth_headers)
+        assert response.status_code == 200
+        return response.json()
+
+    assert await summary() == {"stock_count": 0, "currencies": {}, "sentiments": {}}
+
+    bullish = analysis_json(video_id(), [("NVDA", "bullish", 80)])
+    nvda = (await client.post(
+        "/api/v1/user/stocks/", json=stock_payload("NVDA", start_price=100.0, youtube_analysis=bullish),
+        headers=auth_headers
+    )).json()
+    await client.post("/api/v1/user/stocks/", json=stock_payload("AMD", start_price=50.0), headers=auth_headers)
+    await client.post(
+        "/api/v1/user/stocks/", json=stock_payload("2330", start_price=600.0, currency="TWD"), headers=auth_headers
+    )
+    assert await summary() == {
+        "stock_count": 3,
+        "currencies": {"USD": {"count": 2, "total_start_price": 150.0}, "TWD": {"count": 1, "total_start_price": 600.0}},
+        "sentiments": {"bullish": 1, "none": 2},
+    }
+
+    # 更新時扣除舊的貢獻、加上新的貢獻
+    bearish = analysis_json(video_id(), [("NVDA", "bearish", 70)])
+    await client.put(
+        f"/api/v1/user/stocks/{nvda['id']}",
+        json=stock_payload("NVDA", start_price=120.0, currency="TWD", youtube_analysis=bearish), headers=auth_headers
+    )
+    assert await summary() == {
+        "stock_count": 3,
+        "currencies": {"USD": {"count": 1, "total_start_price": 50.0}, "TWD": {"count": 2, "total_start_price": 720.0}},
+        "sentiments": {"bearish": 1, "none": 2},
+    }
+
+    for stock in (await client.get("/api/v1/user/stocks/", headers=auth_headers)).json():
+        await client.delete(f"/api/v1/user/stocks/{stock['id']}", headers=auth_headers)
+    # 歸零的彙總桶刪除，不會留下 0 或負數
+    assert await summary() == {"stock_count": 0, "currencies": {}, "sentiments": {}}
+
+def test_users_without_buckets_are_backfilled_at_startup(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    with engine.begin() as conn:
+        database.Base.metadata.create_all(conn)
+        conn.exec_driver_sql("INSERT INTO users (id, email) VALUES (1, 'a@example.com'), (2, 'b@example.com')")
+        conn.exec_driver_sql(
+            "INSERT INTO user_stocks (user_id, symbol, company_name, start_tracking_date, start_price, currency) "
+            "VALUES (1, 'NVDA', 'c', '2024-01-01', 100, 'USD'), (1, 'AMD', 'c', '2024-01-01', 50, 'USD'), "
+            "(2, 'TSLA', 'c', '2024-01-01', 200, 'USD')"
+        )
+        # 使用者 2 已有彙總，不應被重算
+        conn.exec_driver_sql(
+            "INSERT INTO portfolio_summary_buckets (user_id, dimension, key, count, total_start_price) "
+            "VALUES (2, 'stocks', 'all', 7, 0)"
+        )
+        conn.exec_driver_sql("PRAGMA user_version = 0")
+
+    with engine.begin() as conn:
+        database._create_schema(conn)
+        buckets = conn.exec_driver_sql(
+            "SELECT user_id, dimension, key, count, total_start_price FROM portfolio_summary_buckets ORDER BY 1, 2, 3"
+        ).all()
+    engine.dispose()
+    assert buckets == [
+        (1, "currency", "USD", 2, 150.0),
+        (1, "sentiment", "none", 2, 0.0),
+        (1, "stocks", "all", 2, 150.0),
+        (2, "stocks", "all", 7, 0.0),
+    ]
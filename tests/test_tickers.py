@@ -0,0 +1,94 @@
+import logging
+
+import pytest
+
+import build_tickers
+from services import ticker_service
+from services.ticker_service import TickerService, TickerUniverse, alias_key, normalize_symbol
+
+NASDAQ_LISTED = """Symbol|Security Name|Market Category|Test Issue|Financial Status|Round Lot Size|ETF|NextShares
+NVDA|NVIDIA Corporation - Common Stock|Q|N|N|100|N|N
+AAPL|Apple Inc. - Common Stock|Q|N|N|100|N|N
+GOOGL|Alphabet Inc. - Class A Common Stock|Q|N|N|100|N|N
+GOOG|Alphabet Inc. - Class C Capital Stock|Q|N|N|100|N|N
+ZVZZT|NASDAQ TEST STOCK|G|Y|N|100|N|N
+File Creation Time: 1019202608:00|||||||
+"""
+
+OTHER_LISTED = """ACT Symbol|Security Name|Exchange|CQS Symbol|ETF|Round Lot Size|Test Issue|NASDAQ Symbol
+BRK.B|Berkshire Hathaway Inc. Class B|N|BRK.B|N|100|N|BRK.B
+TSM|Taiwan Semiconductor Manufacturing Company Ltd.|N|TSM|N|100|N|TSM
+ABR$D|Arbor Realty Trust Preferred Series D|N|ABRpD|N|100|N|ABR$D
+File Creation Time: 1019202608:00|||||||
+"""
+
+ALIASES = "symbol,alias\nNVDA,輝達\nTSM,台積電\nDELISTED,已下市公司\n"
+
+@pytest.fixture
+def universe_path(tmp_path):
+    """以本機代號目錄建立資料檔"""
+    (tmp_path / "nasdaqlisted.txt").write_text(NASDAQ_LISTED)
+    (tmp_path / "otherlisted.txt").write_text(OTHER_LISTED)
+    (tmp_path / "aliases.csv").write_text(ALIASES, encoding="utf-8")
+    output = tmp_path / "tickers.bin"
+    build_tickers.build(
+        str(tmp_path / "nasdaqlisted.txt"), str(tmp_path / "otherlisted.txt"), str(tmp_path / "aliases.csv"), str(output)
+    )
+    return str(output)
+
+@pytest.fixture
+def loaded(universe_path, monkeypatch):
+    """讓 TickerService 改用測試資料檔，結束後恢復原本的狀態"""
+    monkeypatch.setattr(ticker_service, "TICKER_UNIVERSE_PATH", universe_path)
+    yield TickerService.load()
+    monkeypatch.undo()
+    TickerService.load()
+
+def test_normalize_symbol_and_alias_key():
+    assert normalize_symbol(" $nvda ") == "NVDA"
+    assert normalize_symbol("NASDAQ:AAPL") == "AAPL"
+    assert normalize_symbol("brk-b") == normalize_symbol("BRK/B") == "BRK.B"
+    assert alias_key("Apple Inc.") == alias_key("APPLE") == "apple"
+    assert alias_key("台積電股份有限公司") == alias_key("台積電") == "台積電"
+
+def test_build_skips_test_issues_and_ambiguous_names(universe_path):
+    universe = TickerUniverse(universe_path)
+    try:
+        assert universe.symbol_count == 6
+        assert all(symbol in universe for symbol in ("NVDA", "AAPL", "GOOG", "GOOGL", "BRK.B", "TSM"))
+        for symbol in ("ZVZZT", "ABR$D", "DELISTED"):
+            assert symbol not in universe
+        assert universe.lookup_alias("NVIDIA Corp") == "NVDA"
+        assert universe.lookup_alias("輝達") == "NVDA"
+        # 同名的多個股份類別無法判斷
+        assert universe.lookup_alias("Alphabet Inc.") is None
+        assert universe.lookup_alias("已下市公司") is None
+    finally:
+        universe.close()
+
+def test_resolve_against_the_universe(loaded):
+    assert loaded.symbol_count == 6
+    assert TickerService.resolve("NVDA") == "NVDA"
+    assert TickerService.resolve("brk-b") == "BRK.B"
+    assert TickerService.resolve("BRKB") == "BRK.B"
+    assert TickerService.resolve("台積電") == "TSM"
+    assert TickerService.resolve("NVD", "NVIDIA Corporation") == "NVDA"
+    assert TickerService.resolve("FAKE") is None
+    assert TickerService.symbol_for_company("Apple") == "AAPL"
+
+def test_without_a_universe_only_the_format_is_checked(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(ticker_service, "TICKER_UNIVERSE_PATH", str(tmp_path / "missing.bin"))
+    with caplog.at_level(logging.WARNING, logger="services.ticker_service"):
+        assert TickerService.load() is None
+    assert "build_tickers.py" in caplog.text
+    assert TickerService.resolve("fake") == "FAKE"
+    assert TickerService.resolve("台積電") is None
+    assert TickerService.symbol_for_company("Apple") is None
+
+def test_invalid_universe_file_is_ignored(tmp_path, monkeypatch, caplog):
+    path = tmp_path / "broken.bin"
+    path.write_bytes(b"not a ticker file" * 4)
+    monkeypatch.setattr(ticker_service, "TICKER_UNIVERSE_PATH", str(path))
+    with caplog.at_level(logging.WARNING, logger="services.ticker_service"):
+        assert TickerService.load() is None
+    assert "無法載入代號資料檔" in caplog.text
@@ -0,0 +1,60 @@
+import pytest
+
+import fake_upstreams
+from conftest import video_id
+from services.transcript_service import SegmentIndex, TranscriptService
+
+@pytest.fixture
+def segments():
+    return SegmentIndex.from_snippets([
+        ("大家好，今天聊輝達", 0.0), ("NVIDIA 的資料中心營收", 4.5), ("再創新高，毛利率 75%", 9.0),
+    ])
+
+def test_timestamps_follow_character_offsets(segments):
+    assert segments.text == "大家好，今天聊輝達\nNVIDIA 的資料中心營收\n再創新高，毛利率 75%"
+    assert segments.timestamp_at(0) == 0.0
+    assert segments.timestamp_at(segments.text.index("資料")) == 4.5
+    assert segments.timestamp_at(len(segments.text)) == 9.0
+
+def test_quotes_are_located_ignoring_spacing_and_punctuation(segments):
+    # 跨段落、大小寫與標點不同
+    assert segments.quote_timestamp("nvidia的資料中心營收再創新高") == 4.5
+    # 整段找不到時以片段定位（Gemini 改寫了後半段）
+    assert segments.quote_timestamp("再創新高、毛利率 75%，非常驚人優於預期") == 9.0
+    assert segments.quote_timestamp("輝達") is None
+    assert segments.quote_timestamp("完全沒有提到的內容") is None
+    assert segments.quote_timestamp(None) is None
+
+def test_encode_round_trip(segments):
+    decoded = SegmentIndex.decode(segments.text, segments.encode())
+    assert (decoded.starts, decoded.offsets) == (segments.starts, segments.offsets)
+
+@pytest.mark.anyio
+async def test_analysis_quotes_link_to_the_video_time(client):
+    video = video_id()
+    video_url = f"https://www.youtube.com/watch?v={video}"
+    transcript = (await client.post("/api/v1/youtube/transcript", json={"url": video_url})).json()["transcript"]
+
+    response = await client.post("/api/v1/analysis/gemini", json={
+        "transcript": transcript, "api_key": "key", "video_url": video_url,
+    })
+    assert response.status_code == 200, response.text
+    analysis = response.json()["analysis"]
+    assert analysis["stock_analyses"]
+    for stock in analysis["stock_analyses"]:
+        # 替身逐字稿每 4 秒一行，依序輪流提到各代號
+        seconds = fake_upstreams.SYMBOLS.index(stock["symbol"]) * 4
+        assert stock["quote_timestamp"] == seconds
+        assert stock["quote_url"] == TranscriptService.deep_link(video, seconds)
+    # 引文不在逐字稿中
+    assert all(company["quote_timestamp"] is None for company in analysis["mentioned_companies"])
+
+@pytest.mark.anyio
+async def test_quotes_are_not_annotated_without_a_saved_transcript(client):
+    transcript = fake_upstreams.TRANSCRIPT_LINE.format(symbol="TSLA") * 3
+    response = await client.post("/api/v1/analysis/gemini", json={
+        "transcript": transcript, "api_key": "key", "video_url": f"https://www.youtube.com/watch?v={video_id()}",
+    })
+    assert response.status_code == 200
+    assert all("quote_timestamp" not in stock or stock["quote_timestamp"] is None
+               for stock in response.json()["analysis"]["stock_analyses"])
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from conftest import ADMIN_HEADERS, unique, video_id
+from services import usage_service
+from services.gemini_service import GeminiService
+from services.usage_service import UsageService
+
+pytestmark = pytest.mark.anyio
+
+def random_transcript() -> str:
+    rng = random.Random(unique())
+    return "AAPL " + "".join(chr(rng.randrange(0x4E00, 0x9FA5)) for _ in range(500))
+
+async def usage(client, group_by: str, key: str):
+    await UsageService.flush()
+    response = await client.get("/api/v1/admin/usage", params={"group_by": group_by, "limit": 1000}, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    return next((row for row in response.json() if row["key"] == key), None)
+
+async def test_gemini_calls_are_recorded_per_user_and_key(client, auth_headers):
+    user_id = (await client.get("/api/v1/auth/me", headers=auth_headers)).json()["id"]
+    api_key, transcript = unique("usage-key-"), random_transcript()
+    request = {"transcript": transcript, "api_key": api_key, "video_url": f"https://youtu.be/{video_id()}"}
+    for _ in range(2):
+        # 第二次命中分析快取，不呼叫 Gemini，也不記錄用量
+        assert (await client.post("/api/v1/analysis/gemini", json=request, headers=auth_headers)).status_code == 200
+
+    by_key = await usage(client, "api_key", UsageService.key_hash(api_key))
+    assert (by_key["calls"], by_key["errors"]) == (1, 0)
+    assert by_key["prompt_tokens"] > len(transcript)
+    assert by_key["total_tokens"] == by_key["prompt_tokens"] + by_key["output_tokens"]
+    assert by_key["estimated_cost"] == pytest.approx(
+        UsageService.estimated_cost(by_key["prompt_tokens"], by_key["output_tokens"], 0)
+    )
+    assert (await usage(client, "user", str(user_id)))["calls"] == 1
+
+    calls = (await client.get("/api/v1/admin/usage/calls", params={"limit": 200}, headers=ADMIN_HEADERS)).json()
+    [call] = [call for call in calls if call["api_key_hash"] == UsageService.key_hash(api_key)]
+    assert call["transcript_hash"] == GeminiService.transcript_hash(transcript)
+    assert (call["transcript_chars"], call["user_id"], call["source"]) == (len(transcript), user_id, "request")
+
+async def test_failed_calls_count_as_errors(client):
+    api_key = unique("invalid-usage-")
+    request = {"transcript": random_transcript(), "api_key": api_key, "video_url": f"https://youtu.be/{video_id()}"}
+    assert (await client.post("/api/v1/analysis/gemini", json=request)).status_code == 400
+
+    by_key = await usage(client, "api_key", UsageService.key_hash(api_key))
+    assert (by_key["calls"], by_key["errors"], by_key["prompt_tokens"]) == (1, 1, 0)
+
+async def test_usage_requires_the_admin_token(client):
+    assert (await client.get("/api/v1/admin/usage")).status_code == 403
+
+async def test_unwritten_records_are_kept_for_the_next_flush(client, monkeypatch):
+    await UsageService.flush()
+
+    def unavailable():
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(usage_service, "WriteSessionLocal", unavailable)
+    UsageService.record({
+        "model": "m", "prompt_version": "v", "source": "request", "outcome": "ok", "latency_ms": 1.0,
+        "api_key_hash": "retry-" + unique(), "transcript_hash": "h", "transcript_chars": 1,
+    })
+    with pytest.raises(RuntimeError):
+        await UsageService.flush()
+    assert len(usage_service._pending) == 1
+
+    monkeypatch.undo()
+    assert await UsageService.flush() == 1
+    assert usage_service._pending == []
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine
+
+import database
+from conftest import stock_payload
+from models.analysis_models import content_hash
+
+async def add_stocks(client, headers, symbols):
+    ids = []
+    for symbol in symbols:
+        response = await client.post("/api/v1/user/stocks/", json=stock_payload(symbol), headers=headers)
+        assert response.status_code == 200, response.text
+        ids.append(response.json()["id"])
+    return ids
+
+@pytest.mark.anyio
+async def test_keyset_pagination_follows_next_after_id(client, auth_headers):
+    ids = await add_stocks(client, auth_headers, ["AAA", "BBB", "CCC", "DDD", "EEE"])
+
+    seen, after_id = [], None
+    while True:
+        params = {"limit": 2, **({"after_id": after_id} if after_id else {})}
+        response = await client.get("/api/v1/user/stocks/", params=params, headers=auth_headers)
+        page = response.json()
+        seen.extend(stock["id"] for stock in page)
+        after_id = response.headers.get("X-Next-After-Id")
+        if after_id is None:
+            break
+        assert int(after_id) == page[-1]["id"]
+    assert seen == ids
+
+@pytest.mark.anyio
+async def test_sparse_fields(client, auth_headers):
+    await add_stocks(client, auth_headers, ["NVDA"])
+    response = await client.get("/api/v1/user/stocks/", params={"fields": "symbol"}, headers=auth_headers)
+    assert [set(stock) for stock in response.json()] == [{"id", "symbol"}]
+
+    response = await client.get("/api/v1/user/stocks/", params={"fields": "symbol,password"}, headers=auth_headers)
+    assert response.status_code == 400
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """已建立 schema、但 (user_id, symbol) 唯一索引尚未存在的舊資料庫"""
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    with engine.begin() as conn:
+        database.Base.metadata.create_all(conn)
+        conn.exec_driver_sql("DROP INDEX ix_user_stocks_user_id_symbol")
+        conn.exec_driver_sql("INSERT INTO users (id, email) VALUES (1, 'a@example.com'), (2, 'b@example.com')")
+    yield engine
+    engine.dispose()
+
+def insert_stocks(conn, rows):
+    conn.exec_driver_sql(
+        "INSERT INTO user_stocks (id, user_id, symbol, company_name, custom_name, start_tracking_date, "
+        "start_price, currency, analysis_hash) VALUES (?, ?, ?, 'c', ?, '2024-01-01', ?, 'USD', ?)",
+        rows,
+    )
+
+def test_duplicate_rows_are_merged_before_the_unique_index(legacy_db):
+    analysis = json.dumps({"summary": "s", "overall_sentiment": "bullish"})
+    digest = content_hash(analysis)
+    with legacy_db.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO analysis_blobs (hash, content, ref_count) VALUES (?, ?, 2)", (digest, analysis))
+        insert_stocks(conn, [
+            (1, 1, "AAPL", None, 10.0, None),
+            (2, 1, "AAPL", "mine", 20.0, digest),
+            (3, 1, "AAPL", None, 30.0, None),
+            (4, 2, "AAPL", None, 40.0, digest),
+        ])
+        conn.exec_driver_sql("PRAGMA user_version = 0")
+
+    with legacy_db.begin() as conn:
+        assert database._create_schema(conn) is True
+        stocks = conn.exec_driver_sql(
+            "SELECT id, user_id, custom_name, start_price, analysis_hash FROM user_stocks ORDER BY id"
+        ).all()
+        # 保留最早的一筆，自訂名稱與分析取自較新的重複項目；分析的引用由刪除的項目移交，引用數不變
+        assert stocks == [(1, 1, "mine", 10.0, digest), (4, 2, None, 40.0, digest)]
+        assert conn.exec_driver_sql("SELECT ref_count FROM analysis_blobs").scalar() == 2
+        assert conn.exec_driver_sql(
+            "SELECT count FROM portfolio_summary_buckets WHERE user_id = 1 AND dimension = 'stocks'"
+        ).scalar() == 1
+        assert conn.exec_driver_sql("SELECT version FROM user_data_versions WHERE user_id = 1").scalar() == 1
+        indexes = {row[1] for row in conn.exec_driver_sql("PRAGMA index_list(user_stocks)")}
+        assert "ix_user_stocks_user_id_symbol" in indexes
+
+def test_remaining_duplicates_stop_startup_with_a_clear_error(legacy_db):
+    with legacy_db.begin() as conn:
+        insert_stocks(conn, [(1, 1, "AAPL", None, 10.0, None), (2, 1, "AAPL", None, 20.0, None)])
+        # 直接補建索引（不經過合併遷移）
+        with pytest.raises(RuntimeError, match="ix_user_stocks_user_id_symbol.*user_id, symbol"):
+            database._create_missing_indexes(conn)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+每日價格更新腳本
+從設定的價格來源（PRICE_PROVIDER）抓取所有被追蹤、或在影片分析中被提及的股票與大盤指標的每日收盤價，寫入 stock_prices 資料表，
+接著更新 KOL 準確度排行榜
+
+使用方式：
+cd kolog-backend
+PRICE_CSV_PATH=./prices.csv python update_prices.py [--since 2024-01-01]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import date
+
+# 添加 app 目錄到 Python 路徑
+sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./app/kolog.db")
+
+from sqlalchemy import select, func
+
+from database import WriteSessionLocal, init_db, close_db
+from models import auth_models, analysis_models, market_models
+from models.auth_models import UserStock
+from models.analysis_models import StockMention, Video
+from services.price_service import PriceService, get_price_provider
+from services.leaderboard_service import LeaderboardService, BENCHMARK_SYMBOL
+
+async def price_targets(db):
+    """
+    需要價格的股票：(代號, 幣別, 起始時間)
+
+    包含被追蹤的股票，以及排行榜會評分、但不一定有人追蹤的個股提及；有任何股票時一併加入大盤指標
+    """
+    result = await db.execute(
+        select(UserStock.symbol, UserStock.currency, func.min(UserStock.start_tracking_date))
+        .group_by(UserStock.symbol, UserStock.currency)
+    )
+    targets = result.all()
+    # 排行榜需要影片發布日之後的價格，可能早於追蹤日
+    earliest_video = (await db.execute(select(func.min(Video.published_at)))).scalar()
+    targets = [
+        (symbol, currency, min(first_tracked, earliest_video or first_tracked))
+        for symbol, currency, first_tracked in targets
+    ]
+
+    if earliest_video is not None:
+        mentioned = (await db.execute(
+            select(StockMention.symbol).distinct()
+            .join(Video, Video.video_id == StockMention.video_id)
+            .where(StockMention.source == "stock_analysis")
+        )).scalars().all()
+        symbols = {symbol for symbol, _, _ in targets}
+        targets.extend((symbol, "USD", earliest_video) for symbol in sorted(set(mentioned) - symbols))
+
+    # 大盤指標用於計算超額報酬
+    if targets and BENCHMARK_SYMBOL not in {symbol for symbol, _, _ in targets}:
+        targets.append((BENCHMARK_SYMBOL, "USD", min(first for _, _, first in targets)))
+    return targets
+
+async def update_prices(since: date = None):
+    """更新每支股票自最早追蹤日或影片發布日（或 --since）起的價格，每支股票一個交易"""
+    await init_db()
+    provider = get_price_provider()
+    today = date.today()
+
+    try:
+        async with WriteSessionLocal() as db:
+            tracked = await price_targets(db)
+
+        for symbol, currency, first in tracked:
+            start = since or first.date()
+            prices = provider.fetch_daily_prices(symbol, start, today)
+            async with WriteSessionLocal() as db:
+                count = await PriceService.upsert_prices(db, symbol, prices, currency)
+                await db.commit()
+            print(f"{symbol}: 寫入 {count} 筆價格")
+
+        async with WriteSessionLocal() as db:
+            scored = await LeaderboardService.refresh(db)
+            await db.commit()
+        print(f"排行榜：新增 {scored} 筆判斷評分")
+    finally:
+        await close_db()
+
+    print(f"\n🎉 價格更新完成，共 {len(tracked)} 支股票")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="更新 stock_prices 每日價格")
+    parser.add_argument("--since", type=date.fromisoformat, default=None, help="起始日期（預設為最早追蹤日）")
+    args = parser.parse_args()
+
+    print("🔧 更新每日價格...")
+    asyncio.run(update_prices(args.since))